@@ -0,0 +1,137 @@
+import os
+import json
+import shutil
+import argparse
+import platform
+import tempfile
+import tracemalloc
+from time import perf_counter
+import numpy as np
+import pandas as pd
+import matplotlib
+
+from cgmprocessing import CGMProcessing
+from cgmsynth import generate
+
+# Stages timed after capture_data and clean_data, each with the dataAnalysis flag that enables it
+STAGES = [('bg_food_response_matplot', 'matplotlib'), ('bg_food_response_bokeh', 'mealStep'),
+          ('bg_exercise_response_bokeh', 'exerciseStep'), ('bg_daily_overview', 'dayOverview'), ('bg_heatmap', 'heat'),
+          ('bg_multi_plot', 'multiplot'), ('bg_long_overview', 'longOverview'), ('bg_metrics', 'metrics'),
+          ('bg_food_profiles', 'foodProfiles'), ('deep_analysis', None)]
+START = pd.Timestamp('2020-07-07')
+
+
+def benchmark_parameters(files, output, days, stages, workers):
+    return {'dataFiles': files,
+            'dateRange': {'initialDay': START.strftime('%m/%d/%Y'), 'finalDay': (START + pd.Timedelta(days=days - 1)).strftime('%m/%d/%Y')},
+            'dataAnalysis': dict({flag: name in stages for name, flag in STAGES if flag},
+                                 calCorrection=False, loadMealResp=True, sleepCorr=True, exerciseCorr=True, biometricCorr=True, supplementCorr=True),
+            'Biometrics': ['Blood Pressure', 'Weight'], 'Supplements': ['Creatine', 'Magnesium'],
+            'adjustments': {'calWindow': 5, 'responseTime': 3, 'minCarbs': 5},
+            'outputFileDirectory': output, 'cacheData': False, 'chunkSize': 0, 'incremental': False,
+            'headless': True, 'renderWorkers': workers}
+
+
+def measure(name, stage, results, traced):
+    if traced:
+        tracemalloc.reset_peak()
+    start = perf_counter()
+    stage()
+    seconds = perf_counter() - start
+    stage_results = results.setdefault(name, {})
+    if traced:
+        stage_results['peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+    else:
+        # the fastest attempt is the least disturbed by the rest of the machine
+        stage_results['seconds'] = round(min(seconds, stage_results.get('seconds', seconds)), 4)
+
+
+def run_pipeline(files, output, days, stages, workers, results, traced):
+    shutil.rmtree(output, ignore_errors=True)
+    os.makedirs(output)
+    instance = CGMProcessing(benchmark_parameters(files, output, days, stages, workers))
+    measure('capture_data', instance.capture_data, results, traced)
+    measure('clean_data', instance.clean_data, results, traced)
+    for name, flag in STAGES:
+        if name in stages:
+            measure(name, getattr(instance, name), results, traced)
+    return instance
+
+
+# Run the pipeline `repeat` times on the generated data, timing every stage, then once more with
+# tracemalloc recording the peak python heap of every stage (numpy and pandas buffers included, render
+# worker processes are not).  Tracing slows the run down so it is kept out of the timings.
+def run_benchmark(days, seed, stages, repeat, workers, memory=True, keep=None):
+    if repeat < 1:
+        raise ValueError("repeat must be at least 1, got " + str(repeat))
+    directory = keep or tempfile.mkdtemp(prefix='cgmbench-')
+    data, output = os.path.join(directory, 'data'), os.path.join(directory, 'output')
+    start = perf_counter()
+    files = generate(data, days, start=START, seed=seed)
+    generated = perf_counter() - start
+    results = {}
+    try:
+        for attempt in range(repeat):
+            instance = run_pipeline(files, output, days, stages, workers, results, False)
+        if memory:
+            tracemalloc.start()
+            try:
+                run_pipeline(files, output, days, stages, workers, results, True)
+            finally:
+                tracemalloc.stop()
+        rows = {key: len(frame) for key, frame in instance.healthData.items() if key in files}
+        rows['CGM grid'] = len(instance.healthData['CGMData'])
+        rows['files written'] = len(instance.manifest['files'])
+    finally:
+        if keep is None:
+            shutil.rmtree(directory, ignore_errors=True)
+    return {'days': days, 'seed': seed, 'repeat': repeat, 'renderWorkers': workers, 'generate_seconds': round(generated, 3),
+            'rows': rows, 'stages': results}
+
+
+def environment():
+    return {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count(),
+            'numpy': np.__version__, 'pandas': pd.__version__}
+
+
+def print_report(report, baseline=None):
+    previous = {(run['days'], run['seed']): run for run in baseline['runs']} if baseline else {}
+    for run in report['runs']:
+        print("\n" + str(run['days']) + " days (seed " + str(run['seed']) + "), " + str(run['rows'].get('CGM grid', 0)) + " CGM samples")
+        before = previous.get((run['days'], run['seed']), {}).get('stages', {})
+        for name, stage in run['stages'].items():
+            line = "  {:<28} {:>10.3f} s {:>10} MB".format(name, stage['seconds'], stage.get('peak_mb', '-'))
+            if name in before and before[name]['seconds'] > 0:
+                line += "   x{:.2f} vs baseline".format(stage['seconds'] / before[name]['seconds'])
+            print(line)
+
+
+# python benchmark.py --days 7 30 365 --repeat 3 --output benchmark.json [--compare previous.json]
+if __name__ == '__main__':
+    matplotlib.use('Agg')
+    parser = argparse.ArgumentParser(description='Time every CGMProcessing stage on generated data')
+    parser.add_argument('--days', type=int, nargs='+', default=[7, 30, 365])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--stages', nargs='+', default=['bg_heatmap', 'bg_multi_plot', 'bg_metrics', 'deep_analysis'],
+                        help='stages after clean_data to time, "all" for every stage: ' + ', '.join(name for name, flag in STAGES))
+    parser.add_argument('--no-memory', action='store_true', help='skip the traced run recording peak memory')
+    parser.add_argument('--workers', type=int, default=1, help='renderWorkers for the page renderers')
+    parser.add_argument('--output', default='benchmark.json')
+    parser.add_argument('--compare', help='an earlier --output file to compare against')
+    parser.add_argument('--keep', help='keep the generated data and outputs in this directory')
+    args = parser.parse_args()
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+
+    stages = [name for name, flag in STAGES] if args.stages == ['all'] else args.stages
+    report = {'environment': environment(), 'stages': stages,
+              'runs': [run_benchmark(days, args.seed, stages, args.repeat, args.workers, not args.no_memory,
+                                     os.path.join(args.keep, str(days)) if args.keep else None) for days in args.days]}
+    with open(args.output, 'w') as stream:
+        json.dump(report, stream, indent=1)
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r') as stream:
+            baseline = json.load(stream)
+    print_report(report, baseline)
@@ -0,0 +1,164 @@
+import os
+import sys
+import json
+import argparse
+import traceback
+import multiprocessing
+from datetime import datetime
+from time import perf_counter
+from multiprocessing.connection import wait
+import yaml
+
+try:
+    import resource
+except ImportError: # not on Windows, users run without a memory limit
+    resource = None
+
+
+# Per user configs of a cohort: every .yaml/.yml file in a directory, or a manifest yaml listing the
+# configs (paths relative to the manifest), either as a list or as a mapping of user name to config.
+# Returns (user, config path) pairs, the user defaulting to the config file name.
+def cohort_configs(path):
+    if os.path.isdir(path):
+        return [(os.path.splitext(name)[0], os.path.join(path, name)) for name in sorted(os.listdir(path))
+                if name.endswith(('.yaml', '.yml'))]
+    with open(path, 'r') as stream:
+        listed = yaml.safe_load(stream)
+    if isinstance(listed, dict):
+        listed = listed.get('users', listed)
+    if isinstance(listed, dict):
+        users = list(listed.items())
+    else:
+        users = [(os.path.splitext(os.path.basename(config))[0], config) for config in listed]
+    folder = os.path.dirname(os.path.abspath(path))
+    return [(str(user), os.path.join(folder, config)) for user, config in users]
+
+
+# Body of one user's process: stdout and stderr go to the user's log, the pipeline runs headless with
+# the given overrides.  Exits non zero when the run fails, the run report is in the user's manifest.json.
+def run_user(config, overrides, log_path, memory_mb):
+    log = open(log_path, 'w', buffering=1)
+    sys.stdout = sys.stderr = log
+    code = 0
+    try:
+        if memory_mb and resource is not None:
+            limit = memory_mb * 2**20
+            resource.setrlimit(resource.RLIMIT_DATA, (limit, limit))
+        from main import validate_yaml
+        from cgmprocessing import CGMProcessing
+        parameters = validate_yaml(config)
+        parameters.update(overrides)
+        manifest = CGMProcessing(parameters).run()
+        code = 1 if manifest['failed'] else 0
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    log.flush()
+    os._exit(code)
+
+
+# Outcome of one user from the process exit code and the manifest.json the run left behind
+def user_result(user, config, output, log_path, code, started, seconds, timed_out=False):
+    result = {'user': user, 'config': config, 'outputFileDirectory': output, 'log': log_path, 'exit_code': code,
+              'seconds': round(seconds, 3), 'status': 'ok' if code == 0 else 'failed', 'error': None}
+    manifest_path = os.path.join(output, 'manifest.json') if output else None
+    manifest = None
+    if manifest_path and os.path.isfile(manifest_path):
+        with open(manifest_path, 'r') as stream:
+            manifest = json.load(stream)
+    if manifest and (manifest['started'] or '') >= started: # not left over from an earlier run
+        result.update(files=len(manifest['files']), failed_files=len(manifest['failed']), cpu_seconds=manifest['cpu_seconds'],
+                      max_rss_mb=manifest['max_rss_mb'], error=manifest['error'])
+    if timed_out:
+        result['status'] = 'timeout'
+        result['error'] = 'stopped after ' + str(round(seconds)) + ' seconds'
+    elif code < 0:
+        result['status'] = 'killed'
+        result['error'] = 'killed by signal ' + str(-code)
+    elif code and result['error'] is None:
+        with open(log_path, 'r') as stream:
+            lines = [line.strip() for line in stream if line.strip()]
+        result['error'] = lines[-1] if lines else 'exit code ' + str(code)
+    return result
+
+
+# Run every user's pipeline in its own process, at most `workers` at a time, so a user whose data
+# fails, crashes the interpreter or runs out of memory stops only their own run.  Each process renders
+# its pages on `render_workers` processes (1 by default, the cores are shared between the users), is
+# limited to `memory_mb` of heap when given and stopped after `timeout` seconds.  Returns the aggregate
+# summary.
+def run_cohort(users, workers=None, render_workers=1, memory_mb=0, log_dir='batchlogs', overrides=None, timeout=0):
+    workers = workers or os.cpu_count()
+    overrides = dict({'headless': True, 'renderWorkers': render_workers, 'stageWorkers': 1}, **(overrides or {}))
+    names = [user for user, config in users]
+    duplicated = {user for user in names if names.count(user) > 1}
+    if duplicated: # the user names key the results and the log files
+        raise ValueError("Users share a name: " + ', '.join(sorted(duplicated)))
+    os.makedirs(log_dir, exist_ok=True)
+    outputs = {}
+    for user, config in users:
+        try:
+            with open(config, 'r') as stream:
+                outputs[user] = os.path.abspath(yaml.safe_load(stream)['outputFileDirectory'])
+        except Exception:
+            outputs[user] = None
+    shared = {output for output in outputs.values() if output and list(outputs.values()).count(output) > 1}
+    if shared:
+        raise ValueError("Users share an outputFileDirectory: " + ', '.join(sorted(shared)))
+
+    context = multiprocessing.get_context('spawn') # a fresh interpreter per user, nothing inherited
+    started = datetime.now().isoformat(timespec='seconds')
+    start = perf_counter()
+    waiting, running, results = list(users), {}, []
+    while waiting or running:
+        while waiting and len(running) < workers:
+            user, config = waiting.pop(0)
+            log_path = os.path.join(log_dir, user + '.log')
+            process = context.Process(target=run_user, args=(config, overrides, log_path, memory_mb), name=user)
+            process.start()
+            running[process.sentinel] = (process, user, config, log_path, datetime.now().isoformat(timespec='seconds'), perf_counter())
+        finished = wait(list(running), timeout=1 if timeout else None)
+        late = [sentinel for sentinel, entry in running.items() if timeout and perf_counter() - entry[-1] > timeout]
+        for sentinel in late:
+            running[sentinel][0].kill()
+        for sentinel in set(finished) | set(late):
+            process, user, config, log_path, user_started, user_start = running.pop(sentinel)
+            process.join()
+            results.append(user_result(user, config, outputs[user], log_path, process.exitcode, user_started, perf_counter() - user_start,
+                                       sentinel in late and sentinel not in finished))
+            print(user + ": " + results[-1]['status'] + " in " + str(results[-1]['seconds']) + " seconds (" + str(len(results)) + "/" + str(len(users)) + ")")
+
+    seconds = perf_counter() - start
+    user_seconds = sum(result['seconds'] for result in results)
+    return {'started': started, 'seconds': round(seconds, 3), 'workers': workers, 'renderWorkers': render_workers, 'memory_mb': memory_mb, 'timeout': timeout,
+            'users': len(results), 'succeeded': sum(result['status'] == 'ok' for result in results),
+            'failed': sorted(result['user'] for result in results if result['status'] != 'ok'),
+            'user_seconds': round(user_seconds, 3), 'speedup': round(user_seconds / seconds, 2) if seconds else None,
+            'files': sum(result.get('files', 0) for result in results),
+            'results': sorted(results, key=lambda result: result['user'])}
+
+
+# python cgmbatch.py <config directory or cohort manifest> [--workers 8] [--memory-mb 4096] [--timeout 3600] [--summary batch.json]
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run CGMProcessing for every user of a cohort')
+    parser.add_argument('configs', help='directory of per user config files, or a yaml manifest listing them')
+    parser.add_argument('--workers', type=int, default=0, help='users processed at once, 0 uses every core')
+    parser.add_argument('--render-workers', type=int, default=1, help='renderWorkers of each user')
+    parser.add_argument('--memory-mb', type=int, default=0, help='heap limit of each user process, 0 for none')
+    parser.add_argument('--timeout', type=int, default=0, help='seconds before a user process is stopped, 0 for none')
+    parser.add_argument('--logs', default='batchlogs', help='directory for the log of each user')
+    parser.add_argument('--summary', default='batch_summary.json')
+    args = parser.parse_args()
+
+    users = cohort_configs(args.configs)
+    if not users:
+        print("No configs found in " + args.configs)
+        sys.exit(1)
+    summary = run_cohort(users, args.workers, args.render_workers, args.memory_mb, args.logs, timeout=args.timeout)
+    with open(args.summary, 'w') as stream:
+        json.dump(summary, stream, indent=1, default=str)
+    print(str(summary['succeeded']) + " of " + str(summary['users']) + " users processed in " + str(summary['seconds']) +
+          " seconds (x" + str(summary['speedup']) + " over one at a time), summary in " + args.summary)
+    if summary['failed']:
+        print("Failed: " + ', '.join(summary['failed']) + ", see the logs in " + args.logs)
+        sys.exit(1)
@@ -0,0 +1,139 @@
+import os
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+from datetime import date
+
+
+def file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as stream:
+        for chunk in iter(lambda: stream.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Fingerprint of a source file read by parser `version`, with `variant` anything else the parsed frame
+# depends on, such as a date window applied while reading
+def source_fingerprint(file, version, variant=''):
+    stat = os.stat(file)
+    return {'path': os.path.abspath(file), 'mtime': stat.st_mtime_ns, 'size': stat.st_size, 'version': version,
+            'variant': variant, 'hash': file_hash(file)}
+
+
+# Whether the file still parses to what was saved with `recorded`: same path and parser version and
+# either the same mtime/size or (after a touch or copy) the same content hash
+def unchanged(recorded, file, version):
+    stat = os.stat(file)
+    if recorded.get('path') != os.path.abspath(file) or recorded.get('version') != version:
+        return False
+    if (recorded.get('mtime'), recorded.get('size')) == (stat.st_mtime_ns, stat.st_size):
+        return True
+    return recorded.get('size') == stat.st_size and recorded.get('hash') == file_hash(file)
+
+
+# On disk cache of cleaned source frames stored as parquet next to a small json fingerprint.
+# A cached frame is reused while the source is unchanged and read with the same variant.
+class SourceCache:
+    def __init__(self, directory, version):
+        self.directory = directory
+        self.version = version
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+    def entry_path(self, file, key):
+        name = key + '-' + hashlib.sha1(os.path.abspath(file).encode('utf-8')).hexdigest()[:12]
+        return os.path.join(self.directory, name)
+
+    def load(self, file, key, variant=''):
+        entry = self.entry_path(file, key)
+        try:
+            with open(entry + '.json', 'r') as stream:
+                cached = json.load(stream)
+        except (OSError, ValueError):
+            return None
+        if cached.get('variant') != variant or not unchanged(cached, file, self.version):
+            return None
+        mtime = os.stat(file).st_mtime_ns
+        if cached['mtime'] != mtime:
+            cached.update(mtime=mtime)
+            with open(entry + '.json', 'w') as stream:
+                json.dump(cached, stream)
+        try:
+            return pd.read_parquet(entry + '.parquet')
+        except Exception as e:
+            print("Unable to read cached " + key + " data, reparsing (" + str(e) + ")")
+            return None
+
+    def store(self, file, key, df, variant=''):
+        entry = self.entry_path(file, key)
+        fingerprint = source_fingerprint(file, self.version, variant)
+        try:
+            df.to_parquet(entry + '.parquet')
+        except Exception as e:
+            print("Unable to cache " + key + " data (" + str(e) + ")")
+            return False
+        with open(entry + '.json', 'w') as stream:
+            json.dump(fingerprint, stream)
+        return True
+
+
+# Digest of every day's rows of a frame: the wrapping sum of the row hashes plus the row count,
+# so adding, removing or editing any row of a day changes that day's digest.
+def day_digests(df):
+    df = df.dropna(how='any', subset=['Datetime'])
+    if df.empty:
+        return {}
+    hashes = pd.util.hash_pandas_object(df.reset_index(drop=True), index=False).values
+    days = df['Datetime'].values.astype('datetime64[D]')
+    order = np.argsort(days, kind='mergesort')
+    days, hashes = days[order], hashes[order]
+    starts = np.flatnonzero(np.r_[True, days[1:] != days[:-1]])
+    sums = np.add.reduceat(hashes, starts)
+    counts = np.diff(np.append(starts, len(days)))
+    return {str(day): format(total, 'x') + '-' + str(count) for day, total, count in zip(days[starts], sums, counts)}
+
+
+# Processed state persisted between incremental runs: the per-day digests of every source and the
+# gap filled CGM grid.  State from a run with a different configuration signature is ignored.
+class ProcessedState:
+    def __init__(self, directory, signature):
+        self.directory = directory
+        self.signature = signature
+        self.previous = None
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        try:
+            with open(os.path.join(self.directory, 'state.json'), 'r') as stream:
+                state = json.load(stream)
+            if state['signature'] == self.signature:
+                self.previous = state
+        except (OSError, ValueError, KeyError):
+            pass
+
+    # Days whose rows were added, changed or removed since the last run, None when there is no usable state
+    def changed_days(self, digests):
+        if self.previous is None:
+            return None
+        changed = set()
+        for key in set(digests) | set(self.previous['digests']):
+            old = self.previous['digests'].get(key, {})
+            new = digests.get(key, {})
+            changed.update(day for day in set(old) | set(new) if old.get(day) != new.get(day))
+        return {date.fromisoformat(day) for day in changed}
+
+    def load_grid(self):
+        if self.previous is None:
+            return None
+        try:
+            grid = pd.read_parquet(os.path.join(self.directory, 'CGMGrid.parquet'))
+        except Exception:
+            return None
+        return grid.set_index('Datetime', drop=False)
+
+    def save(self, digests, grid):
+        grid.reset_index(drop=True).to_parquet(os.path.join(self.directory, 'CGMGrid.parquet'))
+        with open(os.path.join(self.directory, 'state.json'), 'w') as stream:
+            json.dump({'signature': self.signature, 'digests': digests}, stream)
+        self.previous = {'signature': self.signature, 'digests': digests}
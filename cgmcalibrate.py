@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+
+# Spot calibrations in a sorted series of CGM readings: a shift of the glucose level between two
+# readings, the `readings` after it all at least `jump` above (or below) the `readings` before it, while
+# glucose is otherwise steady (the slope fitted to both stretches is under jump / readings a reading).
+# Spikes, compression lows and fast rises after a meal don't shift the level that way.  Only readings at
+# most `max_interval` minutes apart are compared.  Returns the positions of the first reading after
+# each calibration and the size of its step.
+def calibration_steps(times, values, jump=20, max_interval=10, readings=3):
+    values = np.asarray(values, dtype=float)
+    if len(values) < 2 * readings:
+        return np.array([], dtype=int), np.array([])
+    minutes = np.diff(np.asarray(times, dtype='datetime64[ns]').astype(np.int64)) / 6e10
+    windows = np.lib.stride_tricks.sliding_window_view(values, 2 * readings)
+    before, after = windows[:, :readings], windows[:, readings:]
+    offsets = np.arange(readings) - (readings - 1) / 2
+    slope = (before @ offsets + after @ offsets) / (2 * (offsets ** 2).sum())
+    shifted = (after.min(axis=1) - before.max(axis=1) >= jump) | (before.min(axis=1) - after.max(axis=1) >= jump)
+    steady = np.abs(slope) < jump / readings
+    contiguous = np.lib.stride_tricks.sliding_window_view(minutes, 2 * readings - 1).max(axis=1) <= max_interval
+    found = np.flatnonzero(shifted & steady & contiguous)
+    return found + readings, np.median(after[found], axis=1) - np.median(before[found], axis=1)
+
+
+# Correction of every reading at `times` for calibrations stepping the readings by `steps` at the
+# sorted `events`: readings in the `window` (a Timedelta) before a calibration were off by up to its
+# step, the correction ramps from nothing `window` before the calibration to the whole step just
+# before it.  Overlapping ramps add up.  Each reading sums the ramps still ahead of it from cumulative
+# sums over the sorted events, so the cost is linear in the readings plus a binary search per reading.
+def calibration_ramp(times, events, steps, window):
+    times = np.asarray(times, dtype='datetime64[ns]').astype(np.int64).astype(float)
+    events = np.asarray(events, dtype='datetime64[ns]').astype(np.int64).astype(float)
+    window = float(pd.Timedelta(window).value)
+    step_sum = np.r_[0, np.cumsum(steps)]
+    weighted_sum = np.r_[0, np.cumsum(np.asarray(steps) * events)]
+    lo = np.searchsorted(events, times, side='right')
+    hi = np.searchsorted(events, times + window, side='left')
+    return ((times + window) * (step_sum[hi] - step_sum[lo]) - (weighted_sum[hi] - weighted_sum[lo])) / window
+
+
+# Readings of `df` with the drift before every spot calibration corrected over `window` (a Timedelta).
+# The corrected readings replace `value`, the readings as exported are kept in a 'Raw CGMS' column.
+def correct_calibrations(df, window, jump=20, max_interval=10, value='UDT_CGMS'):
+    df = df.iloc[np.argsort(df['Datetime'].values, kind='stable')]
+    measured = df[value].notna().values
+    times, values = df['Datetime'].values[measured], df[value].values[measured]
+    positions, steps = calibration_steps(times, values, jump, max_interval)
+    df = df.assign(**{'Raw CGMS': df[value]})
+    if len(positions):
+        correction = np.zeros(len(df))
+        correction[measured] = calibration_ramp(times, times[positions], steps, window)
+        df[value] = (df[value] + correction).round(decimals=0).astype(df[value].dtype)
+    return df, times[positions]
@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+
+# Daily feature columns, one row per day of `days`.  Days without a record are NaN (missing, not zero)
+# except for activity calories and supplements where no record means none that day.
+
+def sleep_features(sleep, days):
+    features = pd.DataFrame(index=days)
+    if sleep.empty:
+        return features
+    by_day = sleep.groupby(sleep['Datetime'].dt.normalize())
+    for column in ('Sleep Score', 'Readiness Score'):
+        if column in sleep:
+            features[column] = by_day[column].mean().reindex(days)
+    if 'Bedtime Start' in sleep and 'Bedtime End' in sleep:
+        hours = (sleep['Bedtime End'] - sleep['Bedtime Start']).dt.total_seconds() / 3600
+        features['Sleep Hours'] = hours.groupby(sleep['Datetime'].dt.normalize()).sum().reindex(days)
+    return features
+
+
+def exercise_features(exercise, days):
+    features = pd.DataFrame(index=days)
+    if exercise.empty or 'Calories' not in exercise:
+        return features
+    calories = pd.to_numeric(exercise['Calories'].astype(str).str.replace(',', ''), errors='coerce')
+    features['Activity Calories'] = calories.groupby(exercise['Datetime'].dt.normalize()).sum().reindex(days, fill_value=0)
+    if 'Activity Time' in exercise:
+        minutes = pd.to_timedelta(exercise['Activity Time'], errors='coerce').dt.total_seconds() / 60
+        features['Activity Minutes'] = minutes.groupby(exercise['Datetime'].dt.normalize()).sum().reindex(days, fill_value=0)
+    return features
+
+
+# Mean daily value of every biometric whose Metric contains one of `names` (case insensitive).  Values
+# such as blood pressure '120/80' use their first number.
+def biometric_features(bio, names, days):
+    features = pd.DataFrame(index=days)
+    if bio.empty or 'Metric' not in bio or 'Amount' not in bio:
+        return features
+    metric = bio['Metric'].astype(str)
+    amount = pd.to_numeric(bio['Amount'].astype(str).str.extract(r'(-?\d+\.?\d*)', expand=False), errors='coerce')
+    for name in names:
+        matched = metric.str.contains(name, case=False, regex=False)
+        if matched.any():
+            features[name] = amount[matched].groupby(bio['Datetime'][matched].dt.normalize()).mean().reindex(days)
+    return features
+
+
+# 1 on the days a food whose name contains the supplement (case insensitive) was logged, else 0
+def supplement_features(meals, names, days):
+    features = pd.DataFrame(index=days)
+    if meals.empty or 'Food Name' not in meals:
+        return features
+    food = meals['Food Name'].astype(str)
+    for name in names:
+        taken = meals['Datetime'][food.str.contains(name, case=False, regex=False)].dt.normalize().unique()
+        features[name] = days.isin(taken).astype(float)
+    return features
+
+
+# Add the value of every feature on each of the `lags` previous days as '<feature> (lag n)' columns
+def lag_features(features, lags):
+    lagged = [features] + [features.shift(lag).add_suffix(' (lag ' + str(lag) + ')') for lag in range(1, lags + 1)]
+    return pd.concat(lagged, axis=1)
+
+
+# Pearson correlation, least squares slope and p value of every feature against every outcome, using
+# the rows where both are present.  All pairs come out of a handful of masked matrix products, so the
+# cost grows with rows x features x outcomes in BLAS instead of a python loop per pair.
+def correlate(features, outcomes, min_samples=5):
+    x = features.values.astype(float)
+    y = outcomes.values.astype(float)
+    x_seen, y_seen = ~np.isnan(x), ~np.isnan(y)
+    x0, y0 = np.where(x_seen, x, 0), np.where(y_seen, y, 0)
+    x_seen, y_seen = x_seen.astype(float), y_seen.astype(float)
+
+    n = x_seen.T @ y_seen
+    sx, sy = x0.T @ y_seen, x_seen.T @ y0
+    sxx, syy = (x0**2).T @ y_seen, x_seen.T @ y0**2
+    sxy = x0.T @ y0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = n * sxy - sx * sy
+        var_x = n * sxx - sx**2
+        var_y = n * syy - sy**2
+        r = np.clip(cov / np.sqrt(var_x * var_y), -1, 1)
+        slope = cov / var_x
+        t = r * np.sqrt((n - 2) / (1 - r**2))
+    p = 2 * stats.t.sf(np.abs(t), n - 2)
+    unusable = (n < min_samples) | (var_x <= 0) | (var_y <= 0)
+    r[unusable], slope[unusable], p[unusable] = np.nan, np.nan, np.nan
+
+    table = pd.DataFrame({'Feature': np.repeat(features.columns.values, len(outcomes.columns)),
+                          'Outcome': np.tile(outcomes.columns.values, len(features.columns)),
+                          'Samples': n.ravel().astype(int), 'r': r.ravel(), 'Slope': slope.ravel(), 'p': p.ravel()})
+    table = table.dropna(subset=['r'])
+    return table.reindex(table['r'].abs().sort_values(ascending=False).index).reset_index(drop=True)
@@ -0,0 +1,111 @@
+from collections import OrderedDict
+import numpy as np
+from datetime import datetime
+from bokeh.application import Application
+from bokeh.application.handlers.function import FunctionHandler
+from bokeh.layouts import column, row
+from bokeh.models import Button, DatePicker, Div, Select
+from bokeh.server.server import Server
+
+from cgmrender import daily_overview_page, heatmap_page, meal_response_page
+
+
+# The most recently used `size` values, the least recently used is dropped first
+class LRUCache:
+    def __init__(self, size=64):
+        self.size = size
+        self.values = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, build):
+        if key in self.values:
+            self.hits += 1
+            self.values.move_to_end(key)
+            return self.values[key]
+        self.misses += 1
+        value = build()
+        self.values[key] = value
+        if len(self.values) > self.size:
+            self.values.popitem(last=False)
+        return value
+
+
+# Interactive pages served from a local bokeh server instead of written up front.  Only the cleaned
+# data is loaded at start, a day's overview, a meal's step response or the heatmap is prepared the first
+# time it is asked for, using the same items and page builders as the written pages.  Prepared items
+# (plain data, every browser session builds its own bokeh models from them) are kept in an LRU cache.
+class Dashboard:
+    def __init__(self, processing, cache_size=64):
+        self.processing = processing
+        self.cache = LRUCache(cache_size)
+        self.meals = processing.step_response_meals()
+        self.days = processing.dayIndex.days('CGMData')
+
+    def day_page(self, day):
+        return daily_overview_page(self.cache.get(('day', day), lambda: self.processing.daily_overview_item(day, '')))
+
+    def meal_page(self, position):
+        items = self.cache.get(('meal', position), lambda: self.processing.meal_response_items(self.meals.iloc[[position]], ''))
+        if not items:
+            return Div(text="Not enough CGM data after this meal")
+        return meal_response_page(list(items.values())[0])
+
+    def heatmap(self):
+        return heatmap_page(self.cache.get(('heatmap',), self.processing.heatmap_item))
+
+    # Meals of a day (YYYY-MM-DD) as (position, label) options
+    def meal_options(self, day):
+        positions = np.flatnonzero(self.meals['Datetime'].values.astype('datetime64[D]') == np.datetime64(day))
+        meals = self.meals.iloc[positions]
+        return [(str(position), time.strftime('%H:%M') + ' ' + str(name)) for position, time, name in zip(positions, meals['Datetime'], meals['Food Name'])]
+
+    def make_document(self, doc):
+        if not self.days:
+            doc.add_root(Div(text="No CGM data between the dateRange days"))
+            return
+        first, last = str(self.days[0]), str(self.days[-1])
+        day_picker = DatePicker(title='Day', value=last, min_date=first, max_date=last)
+        meal_select = Select(title='Meal', options=[])
+        heatmap_button = Button(label='Heatmap', button_type='primary')
+        status = Div(text='')
+        content = column()
+
+        def show(title, build):
+            start = datetime.now()
+            try:
+                content.children = [build()]
+                status.text = title + " in " + str(round((datetime.now() - start).total_seconds(), 2)) + " s (cache " + \
+                              str(self.cache.hits) + " hits, " + str(self.cache.misses) + " misses)"
+            except Exception as e:
+                content.children = []
+                status.text = "Could not show " + title + ": " + str(e)
+
+        def select_day(attr, old, new):
+            day = str(new)[:10]
+            meal_select.options = self.meal_options(day)
+            meal_select.value = ''
+            show('Daily Overview ' + day, lambda: self.day_page(day))
+
+        def select_meal(attr, old, new):
+            if new:
+                show('Meal response', lambda: self.meal_page(int(new)))
+
+        day_picker.on_change('value', select_day)
+        meal_select.on_change('value', select_meal)
+        heatmap_button.on_click(lambda: show('Heatmap', self.heatmap))
+        doc.add_root(column(row(day_picker, meal_select, heatmap_button), status, content))
+        doc.title = 'CGM Dashboard'
+        select_day('value', None, last)
+
+    def serve(self, port=5006, show=True):
+        server = Server({'/': Application(FunctionHandler(self.make_document))}, port=port, address='localhost',
+                        allow_websocket_origin=['localhost:' + str(port)])
+        server.start()
+        print("Dashboard running at http://localhost:" + str(port) + "/, press Ctrl+C to stop")
+        if show:
+            server.io_loop.add_callback(server.show, '/')
+        try:
+            server.io_loop.start()
+        except KeyboardInterrupt:
+            print("Dashboard stopped")
@@ -0,0 +1,80 @@
+import numpy as np
+
+METHODS = ('lttb', 'minmax')
+
+
+def check_downsampling(method, points):
+    if method not in METHODS:
+        raise ValueError("downsample must be one of " + ', '.join(METHODS) + ", got " + str(method))
+    if not isinstance(points, int) or (points and points < 10):
+        raise ValueError("plotPoints must be 0 (keep every reading) or at least 10, got " + str(points))
+    return method, points
+
+
+# Largest Triangle Three Buckets: keeps the first and last point and, from each of budget - 2 equal
+# buckets in between, the point forming the largest triangle with the point kept from the previous
+# bucket and the mean of the next one.  The loop is over buckets, each bucket is a numpy slice.
+def lttb_indices(x, y, budget):
+    n = len(x)
+    if budget >= n or budget < 3:
+        return np.arange(n)
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, budget - 1).astype(int)
+    mean_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / np.diff(edges)
+    mean_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / np.diff(edges)
+    next_x, next_y = np.append(mean_x[1:], x[-1]), np.append(mean_y[1:], y[-1])
+    chosen = np.empty(budget, dtype=int)
+    chosen[0], chosen[-1] = 0, n - 1
+    a = 0
+    for bucket in range(budget - 2):
+        lo, hi = edges[bucket], edges[bucket + 1]
+        area = np.abs((x[a] - next_x[bucket]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (next_y[bucket] - y[a]))
+        a = lo + int(np.argmax(area))
+        chosen[bucket + 1] = a
+    return chosen
+
+
+# Min-max decimation: the lowest and highest point of each of budget / 2 equal buckets, in time order,
+# so every spike and dip survives
+def min_max_indices(x, y, budget):
+    n = len(x)
+    if budget >= n or budget < 2:
+        return np.arange(n)
+    buckets = budget // 2
+    bucket = np.arange(n) * buckets // n
+    order = np.lexsort((np.asarray(y, dtype=float), bucket))
+    starts = np.searchsorted(bucket[order], np.arange(buckets))
+    ends = np.append(starts[1:], n) - 1
+    return np.unique(np.concatenate([order[starts], order[ends]]))
+
+
+# Rows of `df` (sorted by `x`) to draw `y` with at most about `points` points.  Readings missing from
+# the CGM (NaN) are left out of the downsampling and the first row of every gap is kept, so lines still
+# break at the gaps.  0 points keeps every row.
+def downsample(df, x, y, points, method='lttb'):
+    if not points or len(df) <= points:
+        return df
+    values = df[y].values.astype(float)
+    measured = np.flatnonzero(~np.isnan(values))
+    times = df[x].values
+    if np.issubdtype(times.dtype, np.datetime64):
+        times = times.astype('datetime64[ns]').astype(np.int64)
+    pick = lttb_indices if method == 'lttb' else min_max_indices
+    kept = measured[pick(times[measured], values[measured], points)]
+    gap_starts = np.flatnonzero(np.isnan(values) & ~np.isnan(np.r_[np.nan, values[:-1]]))
+    return df.iloc[np.union1d(kept, gap_starts)]
+
+
+# Lowest, mean and highest measured `y` of `buckets` equal stretches of time, for a band behind a
+# downsampled line.  Empty stretches are left out.
+def envelope(df, x, y, buckets):
+    measured = df.dropna(subset=[y])
+    if measured.empty:
+        return measured.reindex(columns=[x, 'Low', 'Mean', 'High'])
+    times = measured[x].values.astype('datetime64[ns]').astype(np.int64)
+    values = measured[y].values.astype(float)
+    bucket = np.minimum(((times - times[0]) / max(times[-1] - times[0], 1) * buckets).astype(int), buckets - 1)
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    counts = np.diff(np.append(starts, len(values)))
+    return measured.iloc[starts][[x]].reset_index(drop=True).assign(
+        Low=np.minimum.reduceat(values, starts), Mean=np.add.reduceat(values, starts) / counts, High=np.maximum.reduceat(values, starts))
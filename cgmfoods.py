@@ -0,0 +1,148 @@
+import os
+import sys
+import json
+import numpy as np
+import pandas as pd
+
+from cgmmetrics import meal_metrics
+
+
+def food_key(name):
+    return ' '.join(str(name).lower().split())
+
+
+# Zeroed glucose of every response resampled onto `minutes` after the meal, one row per event.  All the
+# events are interpolated in one np.interp call by offsetting each event onto its own stretch of the axis.
+# Minutes before an event's first sample take that sample (the baseline), minutes after its last are NaN.
+def response_curves(responses, minutes, value='ZeroedCGMS'):
+    if responses.empty:
+        return pd.DataFrame(columns=[str(minute) for minute in minutes])
+    events = np.unique(responses['Event'].values)
+    slot = np.searchsorted(events, responses['Event'].values)
+    first = pd.Series(responses['Minutes'].values).groupby(slot).min().values
+    last = pd.Series(responses['Minutes'].values).groupby(slot).max().values
+    stretch = float(max(responses['Minutes'].max(), minutes[-1]) - min(responses['Minutes'].min(), 0) + 1)
+    axis = slot * stretch + responses['Minutes'].values
+    targets = np.arange(len(events))[:, None] * stretch + np.maximum(minutes[None, :], first[:, None])
+    curves = np.interp(targets.ravel(), axis, responses[value].values.astype(float)).reshape(len(events), len(minutes))
+    curves[minutes[None, :] > last[:, None]] = np.nan
+    return pd.DataFrame(curves, index=pd.Index(events, name='Event'), columns=[str(minute) for minute in minutes])
+
+
+# Persistent glycemic response profile of every food, kept in `directory` between runs.  Every processed
+# meal is stored once (reprocessing a stretch of days replaces its meals) and only the foods touched by
+# an update are re-aggregated.  Profiles are sorted by food key, which is the index
+# used for prefix searches.  Without a window the store is opened with the window it was built with.
+class FoodProfiles:
+    CURVE_STATS = {'Mean': None, 'P25': 0.25, 'P50': 0.5, 'P75': 0.75}
+
+    def __init__(self, directory, window=None, period=5):
+        self.directory = directory
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        try:
+            with open(os.path.join(self.directory, 'profiles.json'), 'r') as stream:
+                stored = json.load(stream)
+        except (OSError, ValueError):
+            stored = {'minutes': None}
+        if window is None:
+            self.minutes = np.array(stored['minutes'] or np.arange(0, 180 + period, period))
+        else:
+            self.minutes = np.arange(0, window + period, period)
+        self.curve_columns = [str(minute) for minute in self.minutes]
+        self.meals = pd.DataFrame(columns=['Food', 'Food Name', 'Datetime', 'Net Carbs (g)', 'Peak', 'Delta', 'iAUC'] + self.curve_columns)
+        self.profiles = pd.DataFrame()
+        self.curves = pd.DataFrame()
+        try:
+            if stored['minutes'] == self.minutes.tolist():
+                self.meals = pd.read_parquet(os.path.join(self.directory, 'meals.parquet'))
+                self.profiles = pd.read_parquet(os.path.join(self.directory, 'profiles.parquet'))
+                self.curves = pd.read_parquet(os.path.join(self.directory, 'curves.parquet'))
+            elif stored['minutes'] is not None:
+                print("Food profiles were built with a different response window, rebuilding them")
+        except (OSError, ValueError):
+            pass
+        self.keys = self.profiles.index.values.astype(str)
+
+    # Replace the stored meals between the (start, end) of every span with the meals (rows of `meals` by
+    # position, as in the Event column of `responses`) and refresh the profiles of the foods added or
+    # removed, so meals deleted or moved in a later export drop out.  Returns the number of foods updated.
+    def update(self, meals, responses, spans):
+        summary = meal_metrics(responses)
+        new = pd.DataFrame(columns=self.meals.columns)
+        if not summary.empty:
+            events = meals.iloc[summary.index]
+            names = events['Food Name'].astype(str)
+            new = pd.DataFrame({'Food': names.map(food_key).values, 'Food Name': names.values,
+                                'Datetime': events['Datetime'].values, 'Net Carbs (g)': events['Net Carbs (g)'].values.astype(float),
+                                'Peak': summary['Peak'].values, 'Delta': summary['Delta'].values, 'iAUC': summary['iAUC'].values})
+            new = pd.concat([new, response_curves(responses, self.minutes).loc[summary.index].reset_index(drop=True)], axis=1)
+            new = new.drop_duplicates(['Food', 'Datetime'], keep='last')
+
+        stored_times = pd.to_datetime(self.meals['Datetime'])
+        replaced = pd.MultiIndex.from_frame(self.meals[['Food', 'Datetime']]).isin(pd.MultiIndex.from_frame(new[['Food', 'Datetime']]))
+        for start, end in spans:
+            replaced |= ((stored_times >= pd.Timestamp(start)) & (stored_times <= pd.Timestamp(end))).values
+        foods = pd.unique(np.concatenate([self.meals.loc[replaced, 'Food'].values, new['Food'].values]).astype(str))
+        if not len(foods):
+            return 0
+        self.meals = pd.concat([self.meals.loc[~replaced], new], ignore_index=True).sort_values(['Food', 'Datetime'], kind='mergesort')
+        self.meals = self.meals.reset_index(drop=True)
+
+        profiles, curves = self.aggregate(self.meals.loc[self.meals['Food'].isin(foods)])
+        self.profiles = pd.concat([self.profiles.drop(index=foods, errors='ignore'), profiles]).sort_index()
+        kept = ~self.curves.index.get_level_values('Food').isin(foods) if len(self.curves) else slice(None)
+        self.curves = pd.concat([self.curves.loc[kept], curves]).sort_index()
+        self.keys = self.profiles.index.values.astype(str)
+        self.save()
+        return len(foods)
+
+    def aggregate(self, meals):
+        if meals.empty:
+            return pd.DataFrame(), pd.DataFrame()
+        by_food = meals.groupby('Food', sort=True)
+        profiles = pd.DataFrame({'Food Name': by_food['Food Name'].last(), 'Count': by_food.size(),
+                                 'First': by_food['Datetime'].min(), 'Last': by_food['Datetime'].max(),
+                                 'Net Carbs Mean': by_food['Net Carbs (g)'].mean()})
+        for column in ('Peak', 'Delta', 'iAUC'):
+            profiles[column + ' Mean'] = by_food[column].mean()
+            quantiles = by_food[column].quantile([0.1, 0.5, 0.9]).unstack()
+            for q, label in ((0.1, ' P10'), (0.5, ' P50'), (0.9, ' P90')):
+                profiles[column + label] = quantiles[q]
+        curve_values = meals[['Food'] + self.curve_columns].astype({column: float for column in self.curve_columns}).groupby('Food', sort=True)
+        curves = []
+        for stat, q in self.CURVE_STATS.items():
+            curve = curve_values.mean() if q is None else curve_values.quantile(q)
+            curves.append(curve.assign(Stat=stat).set_index('Stat', append=True))
+        return profiles.round(2), pd.concat(curves).round(2)
+
+    def save(self):
+        self.meals.to_parquet(os.path.join(self.directory, 'meals.parquet'))
+        self.profiles.to_parquet(os.path.join(self.directory, 'profiles.parquet'))
+        self.curves.to_parquet(os.path.join(self.directory, 'curves.parquet'))
+        with open(os.path.join(self.directory, 'profiles.json'), 'w') as stream:
+            json.dump({'minutes': self.minutes.tolist()}, stream)
+
+    def profile(self, name):
+        key = food_key(name)
+        return self.profiles.loc[key] if key in self.profiles.index else None
+
+    # Mean and P25/P50/P75 zeroed response curve of a food, one row per statistic
+    def curve(self, name):
+        key = food_key(name)
+        return self.curves.loc[key] if key in self.profiles.index else None
+
+    def search(self, prefix):
+        key = food_key(prefix)
+        lo, hi = np.searchsorted(self.keys, [key, key + '\uffff'])
+        return self.profiles.iloc[lo:hi]
+
+    def ranking(self, by='Delta P50', min_count=1, ascending=True):
+        return self.profiles.loc[self.profiles['Count'] >= min_count].sort_values(by, ascending=ascending)
+
+
+# python cgmfoods.py <outputFileDirectory>/foodprofiles [food name prefix]
+if __name__ == '__main__':
+    store = FoodProfiles(sys.argv[1])
+    found = store.search(sys.argv[2]) if len(sys.argv) > 2 else store.ranking()
+    print(found[['Food Name', 'Count', 'Peak P50', 'Delta Mean', 'Delta P10', 'Delta P50', 'Delta P90', 'iAUC P50']].to_string())
@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+
+
+# Snap raw CGM readings onto a regular sample grid covering [start, end] in a single pass.
+# Every grid slot takes the nearest reading within `tolerance` minutes.  Slots without a reading are
+# linearly interpolated when the surrounding real readings are no more than `max_gap` minutes apart,
+# otherwise they are left out.  Interpolated slots are flagged in the 'Synthesized' column.
+def build_cgm_grid(df, start, end, period=5, tolerance=2.5, max_gap=60, value='UDT_CGMS'):
+    period = pd.Timedelta(minutes=period)
+    tolerance = pd.Timedelta(minutes=tolerance)
+    max_gap = pd.Timedelta(minutes=max_gap)
+
+    readings = df.reset_index(drop=True).dropna(how='any', subset=[value, 'Datetime'])
+    readings = readings.drop(columns=['Date', 'Time'], errors='ignore')
+    readings = readings.sort_values('Datetime').drop_duplicates('Datetime', keep='last')
+    readings = readings.rename(columns={'Datetime': 'Reading Time'})
+
+    grid = pd.DataFrame({'Datetime': pd.date_range(pd.Timestamp(start).floor(period), pd.Timestamp(end), freq=period)})
+    _df = pd.merge_asof(grid, readings, left_on='Datetime', right_on='Reading Time',
+                        direction='nearest', tolerance=tolerance)
+
+    # a reading can sit within tolerance of two slots, only the closest slot keeps it
+    offset = (_df['Datetime'] - _df['Reading Time']).abs()
+    closest = offset.groupby(_df['Reading Time']).transform('min')
+    _df.loc[offset != closest, readings.columns] = None
+
+    measured = _df[value].notna()
+    seen = _df['Datetime'].where(measured)
+    gap = seen.bfill() - seen.ffill()
+    fillable = ~measured & (gap <= max_gap)
+
+    interpolated = pd.Series(_df[value].values, index=_df['Datetime']).interpolate(method='time', limit_area='inside')
+    _df[value] = interpolated.values
+    _df.loc[~(measured | fillable), value] = None
+    _df['Synthesized'] = fillable
+
+    _df = _df.loc[_df[value].notna()].drop(columns=['Reading Time'])
+    _df[value] = _df[value].round(decimals=0)
+    _df.insert(0, 'Date', _df['Datetime'].dt.normalize())
+    _df.insert(1, 'Time', _df['Datetime'] - _df['Date'])
+
+    return _df.set_index('Datetime', drop=False)
+
+
+# Maximum glucose in every `period` minute slot of `num_days` days starting at the day of `first_day`.
+# The series covers every slot (missing slots are NaN) so it reshapes straight into a days x slots matrix.
+def build_slot_matrix(df, first_day, num_days, period=15, value='UDT_CGMS'):
+    freq = str(period) + 'min'
+    slots = pd.date_range(pd.Timestamp(first_day).normalize(), periods=num_days * (1440 // period), freq=freq)
+    slot_max = df[value].groupby(df['Datetime'].dt.floor(freq).values).max()
+    return slot_max.reindex(slots)
+
+
+DECAY_SHAPES = ('linear', 'exponential')
+
+
+def check_decay(baseline, minutes, shape):
+    if shape not in DECAY_SHAPES:
+        raise ValueError("decayShape must be one of " + ', '.join(DECAY_SHAPES) + ", got " + str(shape))
+    if not isinstance(minutes, (int, float)) or minutes <= 0:
+        raise ValueError("decayTime must be a positive number of minutes, got " + str(minutes))
+    if not isinstance(baseline, (int, float)) or baseline <= 0:
+        raise ValueError("baseline must be a positive glucose value, got " + str(baseline))
+    return baseline, minutes, shape
+
+
+# Fill every missing (NaN) value of a glucose series indexed by time, all gaps in one pass.  Away from a
+# reading glucose returns to `baseline`: linearly, reaching it `minutes` after the reading, or
+# exponentially, within 5% of it after `minutes`.  Gaps before the first and after the last reading
+# decay from the reading next to them, a gap between two readings blends the decay from either side by
+# distance, or is linearly interpolated when it is no more than `max_gap` minutes long.
+def decay_fill(series, baseline=88, minutes=120, shape='linear', max_gap=0):
+    values = series.values.astype(float)
+    missing = np.isnan(values)
+    if not missing.any() or missing.all():
+        return series.copy()
+    n = len(values)
+    times = series.index.values.astype('datetime64[ns]').astype(np.int64) / 6e10
+    positions = np.arange(n)
+    before = np.maximum.accumulate(np.where(missing, -1, positions))
+    after = np.minimum.accumulate(np.where(missing, n, positions)[::-1])[::-1]
+    has_before, has_after = before >= 0, after < n
+    before, after = np.maximum(before, 0), np.minimum(after, n - 1)
+    since, until = times - times[before], times[after] - times
+
+    if shape == 'linear':
+        weight = lambda distance: np.clip(1 - distance / minutes, 0, 1)
+    else:
+        weight = lambda distance: np.exp(-3 * distance / minutes)
+    from_before = baseline + (values[before] - baseline) * weight(since)
+    from_after = baseline + (values[after] - baseline) * weight(until)
+
+    inside = has_before & has_after
+    span = np.where(inside & missing, since + until, 1)
+    blended = (until * from_before + since * from_after) / span
+    interpolated = (until * values[before] + since * values[after]) / span
+    filled = np.where(inside, np.where(span <= max_gap, interpolated, blended), np.where(has_before, from_before, from_after))
+    return pd.Series(np.where(missing, filled, values), index=series.index, name=series.name)
+
+
+# Rebuild only the grid samples near `days` and splice them into a grid built on a previous run.  A
+# changed reading moves the interpolated samples up to max_gap (plus the snap tolerance) away from it,
+# so each run of consecutive days is widened by that margin into its neighbours before splicing, and
+# rebuilt from the readings a further margin out so the samples at the edges see the readings around
+# them.  The spliced grid matches a full rebuild.
+def refill_cgm_grid(df, previous, days, start, end, period=5, tolerance=2.5, max_gap=60, value='UDT_CGMS'):
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    margin = pd.Timedelta(minutes=max_gap + tolerance)
+    days = pd.DatetimeIndex(sorted(days))
+    days = days[(days >= start.normalize()) & (days <= end)]
+
+    # changed stretches widened by the margin, merged where the widened stretches meet
+    stretches = []
+    for day in days:
+        lo, hi = max(day - margin, start), min(day + pd.Timedelta(days=1) + margin, end + pd.Timedelta(microseconds=1))
+        if stretches and lo <= stretches[-1][1]:
+            stretches[-1][1] = max(stretches[-1][1], hi)
+        else:
+            stretches.append([lo, hi])
+
+    readings = df.reset_index(drop=True).sort_values('Datetime')
+    times = readings['Datetime'].values
+    kept = previous.loc[start:end]
+    stale = np.zeros(len(kept), dtype=bool)
+    frames = []
+    for lo, hi in stretches:
+        stale |= ((kept['Datetime'] >= lo) & (kept['Datetime'] < hi)).values
+        first, last = np.searchsorted(times, [np.datetime64(lo - margin), np.datetime64(hi + margin)])
+        if first == last:
+            continue
+        rebuilt = build_cgm_grid(readings.iloc[first:last], lo - margin, hi + margin, period=period,
+                                 tolerance=tolerance, max_gap=max_gap, value=value)
+        frames.append(rebuilt.loc[(rebuilt['Datetime'] >= lo) & (rebuilt['Datetime'] < hi)])
+
+    _df = pd.concat([kept.loc[~stale]] + frames).reset_index(drop=True).sort_values('Datetime')
+    return _df.set_index('Datetime', drop=False)
@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+
+
+# Day partitioned index over the cleaned health data.  Each frame is sorted by Datetime once and the
+# row boundaries of every calendar day are recorded, so a day's rows come back as a positional slice
+# instead of a scan over the full history.
+class DayIndex:
+    def __init__(self):
+        self.frames = {}
+        self.bounds = {}
+
+    def add(self, key, df):
+        df = df.reset_index(drop=True).dropna(how='any', subset=['Datetime']).sort_values('Datetime', kind='mergesort')
+        df = df.set_index('Datetime', drop=False)
+        days = df['Datetime'].values.astype('datetime64[D]')
+        day_keys, starts = np.unique(days, return_index=True)
+        stops = np.append(starts[1:], len(days))
+        self.frames[key] = df
+        self.bounds[key] = {day.item(): (start, stop) for day, start, stop in zip(day_keys, starts, stops)}
+
+    def day(self, key, day):
+        if key not in self.frames:
+            return self.frame(key)
+        start, stop = self.bounds[key].get(pd.Timestamp(day).date(), (0, 0))
+        return self.frames[key].iloc[start:stop]
+
+    def frame(self, key):
+        return self.frames.get(key, pd.DataFrame(columns=['Date', 'Time', 'Datetime']))
+
+    def days(self, key):
+        return list(self.bounds.get(key, {}))
+
+    def keys(self):
+        return list(self.frames)
@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+
+from cgmtime import DATE_FORMATS, TIME_FORMATS, parse_offset_timestamps
+
+
+# Layout of each known export.  'date'/'time' list the candidate column names, the first present in the
+# file is used.  Only 'columns' (all columns when None) are kept, with 'dtypes' and 'categories' applied.
+SOURCE_FORMATS = {
+    'CGMData': {  # xDrip+
+        'sep': ';', 'encoding': None,
+        'date': ['DAY', 'Day', 'Date'], 'time': ['TIME', 'Time'],
+        'date_formats': ['%d.%m.%Y', '%d/%m/%Y', '%d-%m-%Y', '%Y-%m-%d'],
+        'time_formats': ['%H:%M', '%H:%M:%S'],
+        'columns': ['UDT_CGMS'], 'required': ['UDT_CGMS'],
+        'dtypes': {'UDT_CGMS': 'float32'}, 'categories': [],
+    },
+    'mealData': {  # Cronometer servings
+        'sep': ',', 'encoding': 'ISO-8859-1',
+        'date': ['Day', 'Date', 'DAY'], 'time': ['Time', 'TIME'],
+        'date_formats': ['%Y-%m-%d', '%m/%d/%Y'],
+        'time_formats': ['%I:%M %p', '%H:%M', '%H:%M:%S'],
+        'columns': ['Group', 'Food Name', 'Amount', 'Energy (kcal)', 'Carbs (g)', 'Net Carbs (g)'], 'required': [],
+        'dtypes': {'Energy (kcal)': 'float32', 'Carbs (g)': 'float32', 'Net Carbs (g)': 'float32'},
+        'categories': ['Group', 'Food Name'],
+    },
+    'ExData': {  # Garmin activities, 'Date' holds the start time and 'Time' the duration
+        'sep': ',', 'encoding': 'ISO-8859-1',
+        'date': ['Date'], 'time': [],
+        'date_formats': ['%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%m/%d/%Y %H:%M'],
+        'time_formats': [],
+        'columns': ['Activity Type', 'Title', 'Distance', 'Calories', 'Time', 'Avg HR', 'Max HR'], 'required': [],
+        'dtypes': {}, 'categories': ['Activity Type', 'Title'],
+        'rename': {'Time': 'Activity Time'},
+    },
+    'sleepData': {  # Oura
+        'sep': ',', 'encoding': 'ISO-8859-1',
+        'date': ['date', 'Date', 'Day'], 'time': [],
+        'date_formats': ['%Y-%m-%d', '%m/%d/%Y'],
+        'time_formats': [],
+        'columns': ['Sleep Score', 'Readiness Score', 'Bedtime Start', 'Bedtime End'], 'required': [],
+        'dtypes': {'Sleep Score': 'float32', 'Readiness Score': 'float32'}, 'categories': [],
+        'timestamps': ['Bedtime Start', 'Bedtime End'],
+    },
+    'BioData': {  # Cronometer biometrics
+        'sep': ',', 'encoding': 'ISO-8859-1',
+        'date': ['Day', 'Date', 'DAY'], 'time': ['Time', 'TIME'],
+        'date_formats': ['%Y-%m-%d', '%m/%d/%Y'],
+        'time_formats': ['%I:%M %p', '%H:%M', '%H:%M:%S'],
+        'columns': None, 'required': [],
+        'dtypes': {}, 'categories': ['Metric'],
+    },
+}
+
+
+# Read an export in chunks of `chunksize` rows, keeping only the rows between start and end and the
+# columns listed in SOURCE_FORMATS.  Timestamps are parsed by `parser` (a cgmtime.TimestampParser).
+# Returns the same Date/Time/Datetime layout as open_files.
+def stream_source(file, key, start, end, chunksize, parser, timezone=None):
+    spec = SOURCE_FORMATS[key]
+    header = list(pd.read_csv(file, sep=spec['sep'], encoding=spec['encoding'], nrows=0).columns)
+    date_col = next((col for col in spec['date'] if col in header), None)
+    time_col = next((col for col in spec['time'] if col in header), None)
+    if date_col is None:
+        raise ValueError("No date column found in " + file)
+    keep = header if spec['columns'] is None else [col for col in spec['columns'] if col in header]
+    keep = [col for col in keep if col not in (date_col, time_col)]
+    text_cols = [col for col in (date_col, time_col) if col] + spec.get('timestamps', [])
+
+    chunks = []
+    reader = pd.read_csv(file, sep=spec['sep'], encoding=spec['encoding'], usecols=keep + [col for col in (date_col, time_col) if col],
+                         dtype={col: 'object' for col in text_cols if col in header}, chunksize=chunksize)
+    for chunk in reader:
+        chunk = chunk.dropna(how='any', subset=[col for col in spec['required'] if col in chunk])
+        stamp = parser.parse(key, date_col, chunk[date_col], spec['date_formats'] + DATE_FORMATS)
+        if time_col:
+            stamp = stamp + parser.parse_clock(key, time_col, chunk[time_col].fillna('00:00'), spec['time_formats'] + TIME_FORMATS)
+        in_window = (stamp >= start) & (stamp <= end)
+        chunk = chunk.loc[in_window, keep].rename(columns=spec.get('rename', {}))
+        chunk['Datetime'] = stamp[in_window]
+        for col in spec.get('timestamps', []):
+            if col in chunk:
+                chunk[col] = parse_offset_timestamps(chunk[col], timezone)
+        for col, dtype in spec['dtypes'].items():
+            if col in chunk:
+                chunk[col] = pd.to_numeric(chunk[col], errors='coerce').astype(dtype)
+        for col in spec['categories']:
+            if col in chunk:
+                chunk[col] = chunk[col].astype('category')
+        chunks.append(chunk)
+
+    if not chunks:
+        return pd.DataFrame(columns=['Date', 'Time', 'Datetime'])
+    for col in spec['categories']:
+        if col in chunks[0]:
+            categories = pd.unique(np.concatenate([chunk[col].cat.categories.astype(object) for chunk in chunks]))
+            for chunk in chunks:
+                chunk[col] = chunk[col].cat.set_categories(categories)
+    df = pd.concat(chunks, ignore_index=True)
+    df = df.dropna(how='any', subset=['Datetime'])
+    df.insert(0, 'Date', df['Datetime'].dt.normalize())
+    df.insert(1, 'Time', df['Datetime'] - df['Date'])
+    return df
+
+
+# A cleaned source as a compact event table of its own: the timestamps and the SOURCE_FORMATS 'columns'
+# (the columns it has data for when it lists none), with the 'dtypes' and 'categories' of its entry, the
+# same whichever way it was read.
+def event_table(df, key):
+    spec = SOURCE_FORMATS.get(key, {'columns': None, 'dtypes': {}, 'categories': []})
+    if spec['columns'] is not None:
+        kept = ['Date', 'Time'] + [spec.get('rename', {}).get(col, col) for col in spec['columns']] + ['Datetime']
+        df = df[[col for col in kept if col in df]]
+    else:
+        df = df.loc[:, df.notna().any().values | df.columns.isin(['Date', 'Time', 'Datetime'])]
+    typed = {}
+    for col, dtype in spec['dtypes'].items():
+        if col in df and df[col].dtype != dtype:
+            typed[col] = pd.to_numeric(df[col], errors='coerce').astype(dtype)
+    for col in spec['categories']:
+        if col in df and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            typed[col] = df[col].astype('category')
+    return df.assign(**typed)
@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+
+
+# Glucose band edges in mg/dl: very low, low | target range | high, very high
+RANGE_BANDS = (54, 70, 140, 180)
+
+
+def band_labels(bands):
+    very_low, low, high, very_high = bands
+    return ['TBR <' + str(very_low) + ' %', 'TBR ' + str(very_low) + '-' + str(low) + ' %', 'TIR ' + str(low) + '-' + str(high) + ' %',
+            'TAR ' + str(high) + '-' + str(very_high) + ' %', 'TAR >' + str(very_high) + ' %']
+
+
+def check_bands(bands):
+    if len(bands) != 4 or any(not isinstance(edge, (int, float)) for edge in bands) or list(bands) != sorted(set(bands)):
+        raise ValueError("rangeBands must be 4 increasing glucose values (very low, low, high, very high), got " + str(bands))
+    return tuple(bands)
+
+
+# Band of every reading, 0 (below very low) to 4 (above very high).  The target range includes both of
+# its edges, so 70 and 140 count as in range.
+def glucose_bands(glucose, bands):
+    return np.searchsorted(bands[:2], glucose, side='right') + np.searchsorted(bands[2:], glucose, side='left')
+
+
+# Moving average of the last `window` readings of the same day
+def day_moving_average(glucose, day_starts, window):
+    total = np.r_[0, np.cumsum(glucose)]
+    position = np.arange(len(glucose))
+    first = np.maximum(position - window + 1, day_starts)
+    return (total[position + 1] - total[first]) / (position - first + 1)
+
+
+# Per day sums every metric is built from, so rolling metrics over several days pool their samples
+# instead of averaging daily values.  MAGE keeps the sum and count of the day's excursions larger than
+# the day's SD.  Peaks and nadirs are the max/min between successive crossings of a short (5 sample) and
+# long (32 sample) moving average, which keeps sensor noise from splitting excursions.
+def day_sums(cgm, bands=RANGE_BANDS, value='UDT_CGMS'):
+    cgm = cgm.dropna(how='any', subset=[value, 'Datetime'])
+    glucose = cgm[value].values.astype(float)
+    days = cgm['Datetime'].values.astype('datetime64[D]')
+    order = np.argsort(cgm['Datetime'].values, kind='mergesort')
+    glucose, days = glucose[order], days[order]
+    day_keys, day_ids = np.unique(days, return_inverse=True)
+    size = len(day_keys)
+
+    sums = pd.DataFrame(index=pd.DatetimeIndex(day_keys, name='Date'))
+    sums['n'] = np.bincount(day_ids, minlength=size)
+    sums['sum'] = np.bincount(day_ids, glucose, minlength=size)
+    sums['sumsq'] = np.bincount(day_ids, glucose**2, minlength=size)
+    band_counts = np.bincount(day_ids * 5 + glucose_bands(glucose, bands), minlength=size * 5).reshape(size, 5)
+    for band, label in enumerate(band_labels(bands)):
+        sums[label] = band_counts[:, band]
+    if not size:
+        sums['mage_sum'] = sums['mage_n'] = 0
+        return sums
+
+    sd = np.sqrt(np.maximum(sums['sumsq'].values / sums['n'].values - (sums['sum'].values / sums['n'].values)**2, 0))
+    same_day = day_ids[1:] == day_ids[:-1]
+    day_starts = np.flatnonzero(np.r_[True, ~same_day])
+    sample_day_start = day_starts[day_ids]
+    crossing = np.sign(day_moving_average(glucose, sample_day_start, 5) - day_moving_average(glucose, sample_day_start, 32))
+    crossing = pd.Series(crossing).replace(0, np.nan).groupby(day_ids).ffill().fillna(0).values
+    segments = np.flatnonzero(np.r_[True, ~same_day | (crossing[1:] != crossing[:-1])])
+    segment_sign = crossing[segments]
+    extreme = np.where(segment_sign > 0, np.maximum.reduceat(glucose, segments), np.minimum.reduceat(glucose, segments))
+    keep = segment_sign != 0
+    extreme, extreme_days = extreme[keep], day_ids[segments[keep]]
+    amplitude = np.abs(np.diff(extreme))
+    counted = (extreme_days[1:] == extreme_days[:-1]) & (amplitude > sd[extreme_days[1:]])
+    sums['mage_sum'] = np.bincount(extreme_days[1:][counted], amplitude[counted], minlength=size)
+    sums['mage_n'] = np.bincount(extreme_days[1:][counted], minlength=size)
+    return sums
+
+
+# Metrics from (summed) day sums: samples, mean, SD, CV %, GMI % (3.31 + 0.02392 x mean mg/dl), MAGE
+# and the percentage of readings in each band
+def sums_to_metrics(sums, bands=RANGE_BANDS):
+    metrics = pd.DataFrame(index=sums.index)
+    metrics['Samples'] = sums['n']
+    mean = sums['sum'] / sums['n']
+    metrics['Mean'] = mean
+    metrics['SD'] = np.sqrt(np.maximum(sums['sumsq'] / sums['n'] - mean**2, 0))
+    metrics['CV %'] = 100 * metrics['SD'] / mean
+    metrics['GMI %'] = 3.31 + 0.02392 * mean
+    metrics['MAGE'] = sums['mage_sum'] / sums['mage_n'].where(sums['mage_n'] > 0)
+    for label in band_labels(bands):
+        metrics[label] = 100 * sums[label] / sums['n']
+    return metrics.round(2)
+
+
+def day_metrics(cgm, bands=RANGE_BANDS, value='UDT_CGMS'):
+    return sums_to_metrics(day_sums(cgm, bands, value), bands)
+
+
+# Metrics over the `days` calendar days ending on each day (days without data count as empty)
+def rolling_metrics(cgm, days=7, bands=RANGE_BANDS, value='UDT_CGMS'):
+    sums = day_sums(cgm, bands, value)
+    if sums.empty:
+        return sums_to_metrics(sums, bands)
+    calendar = pd.date_range(sums.index[0], sums.index[-1], freq='D', name='Date')
+    rolled = sums.reindex(calendar, fill_value=0).rolling(days, min_periods=1).sum()
+    return sums_to_metrics(rolled.loc[sums.index], bands)
+
+
+# Per event Samples, Baseline, Peak, Delta, minutes to the peak and the incremental area under the curve
+# (mg/dl x minutes above the baseline, by the trapezoid rule) of a response table from extract_responses
+def meal_metrics(responses, value='UDT_CGMS'):
+    if responses.empty:
+        return pd.DataFrame(columns=['Samples', 'Baseline', 'Peak', 'Delta', 'Time to Peak', 'iAUC'])
+    ids = responses['Event'].values
+    minutes = responses['Minutes'].values
+    glucose = responses[value].values.astype(float)
+    starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+    baseline = np.repeat(glucose[starts], np.diff(np.append(starts, len(ids))))
+    above = np.clip(glucose - baseline, 0, None)
+    areas = np.where(ids[1:] == ids[:-1], (above[1:] + above[:-1]) / 2 * np.diff(minutes), 0)
+
+    peak = np.maximum.reduceat(glucose, starts)
+    at_peak = np.flatnonzero(glucose == np.repeat(peak, np.diff(np.append(starts, len(ids)))))
+    first_peak = at_peak[np.r_[True, ids[at_peak][1:] != ids[at_peak][:-1]]]
+    return pd.DataFrame({'Samples': np.diff(np.append(starts, len(ids))), 'Baseline': glucose[starts], 'Peak': peak,
+                         'Delta': peak - glucose[starts], 'Time to Peak': minutes[first_peak],
+                         'iAUC': np.add.reduceat(np.r_[areas, 0], starts).round(1)},
+                        index=pd.Index(ids[starts], name='Event'))
+
+
+# Mean response of the meals eaten in the `days` days up to and including each meal, from the
+# meal_metrics of events starting at `times`
+def rolling_meal_metrics(metrics, times, days=7):
+    columns = ['Baseline', 'Peak', 'Delta', 'Time to Peak', 'iAUC']
+    if metrics.empty:
+        return pd.DataFrame(columns=columns)
+    order = np.argsort(np.asarray(times, dtype='datetime64[ns]'), kind='mergesort')
+    ordered = metrics[columns].iloc[order].astype(float).set_axis(pd.DatetimeIndex(np.asarray(times)[order]), axis=0)
+    rolled = ordered.rolling(str(days) + 'D', min_periods=1).mean()
+    return rolled.set_axis(metrics.index[order], axis=0).loc[metrics.index].round(1)
@@ -0,0 +1,128 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+# One step of the pipeline.  `run` takes no arguments (stages are CGMProcessing methods reading the
+# intermediates they declare through Pipeline.value) and returns the value of its single output, a
+# tuple with one value per output, or nothing when it has no outputs (a graph or report written to
+# disk).  Exclusive stages (the ones drawing with bokeh or matplotlib, whose global state is not thread
+# safe) run one at a time on the calling thread.  `when` is checked as the stage becomes ready, the
+# stage is skipped when it returns False.
+class Stage:
+    def __init__(self, name, run, inputs=(), outputs=(), exclusive=False, when=None):
+        self.name = name
+        self.run = run
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.exclusive = exclusive
+        self.when = when
+
+
+# Runs the stages needed for a set of target stages, in dependency order.  Every output is computed
+# once and kept in `results` for the rest of the run, whether it was scheduled by run or asked for by
+# value.  Stages whose inputs are ready run concurrently on `workers` threads (exclusive ones on the
+# calling thread).  `runner(name, run)` wraps every stage run, CGMProcessing passes run_stage so each
+# stage is timed into the run report.
+class Pipeline:
+    def __init__(self, stages, runner=None, workers=1):
+        self.stages = {stage.name: stage for stage in stages}
+        self.producers = {}
+        for stage in stages:
+            for output in stage.outputs:
+                if output in self.producers:
+                    raise ValueError(output + " is produced by both " + self.producers[output].name + " and " + stage.name)
+                self.producers[output] = stage
+        self.runner = runner or (lambda name, run: run())
+        self.workers = max(1, workers or 1)
+        self.results = {}
+        self.done = set()
+        self.locks = {name: threading.Lock() for name in self.stages}
+
+    # The target stages and every stage producing their inputs, dependencies first
+    def plan(self, targets):
+        order, visiting = [], set()
+
+        def visit(name):
+            if name in order:
+                return
+            if name in visiting:
+                raise ValueError("Stage " + name + " depends on itself")
+            if name not in self.stages:
+                raise ValueError("Unknown stage " + name)
+            visiting.add(name)
+            for needed in self.stages[name].inputs:
+                if needed not in self.producers:
+                    raise ValueError("No stage produces " + needed + " needed by " + name)
+                visit(self.producers[needed].name)
+            visiting.discard(name)
+            order.append(name)
+
+        for target in targets:
+            visit(target)
+        return order
+
+    # Memoized value of an intermediate, running the stage producing it first if needed
+    def value(self, name):
+        if name not in self.results:
+            self.execute(self.producers[name])
+        return self.results[name]
+
+    def execute(self, stage):
+        with self.locks[stage.name]:
+            if stage.name in self.done:
+                return
+            if stage.when is not None and not stage.when():
+                print("Skipping " + stage.name)
+                value = None
+            else:
+                value = self.runner(stage.name, stage.run)
+            values = (value,) if len(stage.outputs) == 1 else (value or (None,) * len(stage.outputs))
+            self.results.update(zip(stage.outputs, values))
+            self.done.add(stage.name)
+
+    # Run the planned stages, each as soon as the stages producing its inputs are done.  After a failure
+    # no new stage is started, the running ones finish and the first error is raised.
+    def run(self, targets):
+        order = self.plan(targets)
+        waiting = {name: {self.producers[needed].name for needed in self.stages[name].inputs} - self.done for name in order}
+        error = None
+        if self.workers == 1:
+            for name in order:
+                self.execute(self.stages[name])
+            return order
+
+        with ThreadPoolExecutor(self.workers) as pool:
+            running = {}
+            while waiting or running:
+                ready = [name for name in order if name in waiting and not waiting[name]] if error is None else []
+                for name in ready:
+                    if not self.stages[name].exclusive:
+                        del waiting[name]
+                        running[pool.submit(self.execute, self.stages[name])] = name
+                exclusive = [name for name in ready if self.stages[name].exclusive]
+                finished = []
+                if exclusive:
+                    name = exclusive[0]
+                    del waiting[name]
+                    try:
+                        self.execute(self.stages[name])
+                        finished.append(name)
+                    except Exception as e:
+                        error = error or e
+                    completed = [future for future in running if future.done()]
+                elif running:
+                    completed = wait(running, return_when=FIRST_COMPLETED)[0]
+                else:
+                    break
+                for future in completed:
+                    name = running.pop(future)
+                    if future.exception() is not None:
+                        error = error or future.exception()
+                    else:
+                        finished.append(name)
+                for name in finished:
+                    for needed in waiting.values():
+                        needed.discard(name)
+        if error is not None:
+            raise error
+        return order
@@ -1,19 +1,61 @@
 import os
+import sys
+import json
+import pstats
+import cProfile
+import threading
+import tracemalloc
 import pandas as pd
 import numpy as np
 from humanfriendly import format_timespan
 import re
-from scipy.signal import savgol_filter 
-from datetime import date, time, datetime, timedelta
-from time import sleep
+from datetime import datetime, timedelta
+from time import perf_counter, process_time
 from matplotlib import pyplot as plt
-import itertools
-from bokeh.layouts import column, row
-from bokeh.io import curdoc, show
-from bokeh.models import Label, Legend, PreText, LegendItem, LabelSet, Span, BoxAnnotation, ColumnDataSource, ColorBar, BasicTicker,  PrintfTickFormatter, LinearColorMapper, Range1d, Grid, LinearAxis, MultiLine, Plot, layouts
-from bokeh.plotting import figure, output_file, show
-from bokeh.sampledata.les_mis import data
-from bokeh.transform import transform
+from bokeh.io import show, save, output_file
+from bokeh.resources import CDN
+
+from cgmdashboard import Dashboard
+from cgmcalibrate import correct_calibrations
+from cgmstore import HealthStore
+from cgmcache import SourceCache, ProcessedState, day_digests, source_fingerprint, unchanged
+from cgmfoods import FoodProfiles
+from cgmdownsample import check_downsampling, downsample, envelope
+from cgmcorrelate import biometric_features, correlate, exercise_features, lag_features, sleep_features, supplement_features
+from cgmgrid import build_cgm_grid, build_slot_matrix, check_decay, decay_fill, refill_cgm_grid
+from cgmindex import DayIndex
+from cgmingest import SOURCE_FORMATS, event_table, stream_source
+from cgmmetrics import RANGE_BANDS, check_bands, day_metrics, meal_metrics, rolling_meal_metrics, rolling_metrics
+from cgmpipeline import Pipeline, Stage
+from cgmrender import RenderScheduler, daily_overview_page, exercise_response_page, heatmap_page, long_overview_page, meal_response_page, multiplot_page
+from cgmresponse import extract_responses, summarize_responses, window_join
+from cgmsmooth import check_smoothing, smooth_windows
+from cgmtime import DATE_FORMATS, TIME_FORMATS, TimestampParser, clock_strings, parse_offset_timestamps
+try:
+    import resource
+except ImportError: # not available on Windows, the run report leaves out max_rss_mb
+    resource = None
+
+# Bump whenever open_files or the clean_* methods change what they produce so cached sources are reparsed
+PARSER_VERSION = 2
+
+# The dataAnalysis flag enabling each graph or analysis stage, deep_analysis always runs
+STAGE_FLAGS = {'bg_food_response_matplot': 'matplotlib', 'bg_food_response_bokeh': 'mealStep',
+               'bg_exercise_response_bokeh': 'exerciseStep', 'bg_daily_overview': 'dayOverview', 'bg_heatmap': 'heat',
+               'bg_multi_plot': 'multiplot', 'bg_long_overview': 'longOverview', 'bg_metrics': 'metrics', 'bg_food_profiles': 'foodProfiles'}
+
+
+# Raised instead of prompting when the run cannot continue, so unattended runs fail with a message
+class CGMProcessingError(Exception):
+    pass
+
+
+class MissingDataError(CGMProcessingError):
+    pass
+
+
+class ConfigError(CGMProcessingError):
+    pass
 
 
 class CGMProcessing:
@@ -25,11 +67,52 @@ class CGMProcessing:
         self.analysis = parameters.get('dataAnalysis', [])
         self.adjustments = parameters.get('adjustments')
         self.calWindow = datetime.strptime(str(self.adjustments['calWindow']), '%H').time()
+        self.calJump = self.adjustments.get('calJump', 20)
         self.resWindow = datetime.strptime(str(self.adjustments['responseTime']), '%H').time()
         self.minCarbs = self.adjustments['minCarbs']
+        self.samplePeriod = self.adjustments.get('samplePeriod', 5)
+        self.snapTolerance = self.adjustments.get('snapTolerance', self.samplePeriod / 2)
+        self.maxGap = self.adjustments.get('maxGap', 60)
+        try:
+            self.smoothWindow, self.smoothOrder = check_smoothing(self.adjustments.get('smoothWindow', 0), self.adjustments.get('smoothOrder', 9))
+            self.rangeBands = check_bands(self.adjustments.get('rangeBands', RANGE_BANDS))
+            self.baseline, self.decayTime, self.decayShape = check_decay(self.adjustments.get('baseline', 88), self.adjustments.get('decayTime', 120),
+                                                                         self.adjustments.get('decayShape', 'linear'))
+            self.downsampleMethod, self.plotPoints = check_downsampling(self.adjustments.get('downsample', 'lttb'), self.adjustments.get('plotPoints', 2000))
+        except ValueError as e:
+            raise ConfigError(str(e))
+        self.metricsWindow = self.adjustments.get('metricsWindow', 7)
+        self.correlationLags = self.adjustments.get('correlationLags', 2)
         self.supplements = parameters['Supplements'] if self.analysis['supplementCorr'] else ''
         self.biometrics = parameters['Biometrics'] if self.analysis['biometricCorr'] else ''
         self.output = parameters['outputFileDirectory']
+        self.chunkSize = parameters.get('chunkSize', 0)
+        self.timezone = parameters.get('timezone')
+        self.cache = SourceCache(self.output + os.path.sep + '.cgmcache', PARSER_VERSION) if parameters.get('cacheData', True) else None
+        self.store = HealthStore(parameters['database']) if parameters.get('database') else None
+        self.timestamps = TimestampParser(self.cache.directory + os.path.sep + 'formats.json' if self.cache is not None else None)
+        self.incremental = None
+        if parameters.get('incremental', False):
+            signature = json.dumps({'version': PARSER_VERSION, 'dataFiles': self.filePaths, 'dataAnalysis': self.analysis,
+                                    'adjustments': self.adjustments}, sort_keys=True, default=str)
+            self.incremental = ProcessedState(self.output + os.path.sep + '.cgmcache', signature)
+        self.renderer = RenderScheduler(parameters.get('renderWorkers', 1))
+        self.dashboardPort = parameters.get('dashboardPort', 5006)
+        self.dashboardCache = parameters.get('dashboardCache', 64)
+        self.headless = parameters.get('headless', False)
+        if self.headless:
+            plt.switch_backend('Agg')
+        self.profile = parameters.get('profile', False)
+        self.traceMemory = parameters.get('traceMemory', False)
+        self.stageState = threading.local() # stages run on several threads, each tracks its own open stages
+        self.manifest = {'outputFileDirectory': self.output, 'headless': self.headless, 'profile': self.profile,
+                         'traceMemory': self.traceMemory, 'started': None, 'seconds': None, 'cpu_seconds': None, 'max_rss_mb': None,
+                         'stages': [], 'files': [], 'failed': [], 'error': None}
+        self.changedDays = None # days with new or changed rows since the last incremental run, None reprocesses everything
+        self.renderDays = None
+        # measurements are per stage, so profiled or traced runs execute one stage at a time
+        workers = 1 if self.profile or self.traceMemory else parameters.get('stageWorkers', 1)
+        self.pipeline = Pipeline(self.pipeline_stages(), self.run_stage, workers)
 
         
     def determine_time(self, startTime, day):
@@ -43,14 +126,193 @@ class CGMProcessing:
                 time = datetime.strptime(startTime + ' 23:59', '%m/%d/%Y %H:%M')
         return time
     
+    # Run the whole pipeline, timing every stage.  Returns the run report (manifest of produced files and
+    # the measurements of every stage), which is also written to outputFileDirectory/manifest.json
+    # (including when a stage fails)
+    def run(self):
+        self.manifest['started'] = datetime.now().isoformat(timespec='seconds')
+        start, cpu = perf_counter(), process_time()
+        tracing = self.traceMemory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        try:
+            self.pipeline.run(['capture_data', 'clean_data'] + self.analysis_targets() + ['deep_analysis'])
+            if self.outputs_stale():
+                self.save_processed_state()
+        finally:
+            if tracing:
+                tracemalloc.stop()
+            self.manifest['seconds'] = round(perf_counter() - start, 3)
+            self.manifest['cpu_seconds'] = round(process_time() - cpu, 3)
+            self.manifest['max_rss_mb'] = self.max_rss_mb()
+            self.save_manifest()
+        return self.manifest
+
+    # Load and clean the data, then serve the pages on localhost as they are asked for instead of writing
+    # them (see cgmdashboard).  Blocks until stopped.
+    def dashboard(self):
+        self.pipeline.run(['capture_data', 'clean_data'])
+        Dashboard(self, self.dashboardCache).serve(self.dashboardPort, show=not self.headless)
+
+    # Run one stage of the pipeline, adding its record to the run report: wall and cpu seconds, the rows
+    # and items the stage counted (see count_rows and count), peak traced memory with traceMemory and a
+    # cProfile dump with profile.  Stages run inside another stage get their own record, the enclosing
+    # stage's profile leaves them out while its time and memory include them.
+    def run_stage(self, name, stage):
+        open_stages = self.open_stages()
+        parent = open_stages[-1] if open_stages else None
+        record = {'stage': name, 'parent': parent['record']['stage'] if parent else None, 'seconds': None, 'cpu_seconds': None,
+                  'rows': 0, 'items': {}}
+        opened = {'record': record, 'peak': 0, 'profiler': None}
+        tracing = self.traceMemory and tracemalloc.is_tracing()
+        if tracing:
+            if parent is not None:
+                parent['peak'] = max(parent['peak'], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        if self.profile:
+            if parent is not None and parent['profiler'] is not None:
+                parent['profiler'].disable()
+            opened['profiler'] = cProfile.Profile()
+        open_stages.append(opened)
+        start, cpu = perf_counter(), process_time()
+        if opened['profiler'] is not None:
+            opened['profiler'].enable()
+        try:
+            return stage()
+        except Exception as e:
+            if self.manifest['error'] is None:
+                self.manifest['error'] = {'stage': name, 'type': type(e).__name__, 'message': str(e)}
+            raise
+        finally:
+            if opened['profiler'] is not None:
+                opened['profiler'].disable()
+            record['seconds'] = round(perf_counter() - start, 3)
+            record['cpu_seconds'] = round(process_time() - cpu, 3)
+            if tracing:
+                record['peak_mb'] = round(max(opened['peak'], tracemalloc.get_traced_memory()[1]) / 2**20, 2)
+            record['max_rss_mb'] = self.max_rss_mb()
+            if opened['profiler'] is not None:
+                record['profile'] = self.save_profile(name, opened['profiler'])
+            open_stages.pop()
+            if parent is not None and parent['profiler'] is not None:
+                parent['profiler'].enable()
+            self.manifest['stages'].append(record)
+            print(name + " finished in " + format_timespan(record['seconds']) +
+                  (", " + str(record['rows']) + " rows" if record['rows'] else "") +
+                  "".join(", " + str(value) + " " + item for item, value in record['items'].items()))
+
+    # The stages open on this thread, innermost last
+    def open_stages(self):
+        if not hasattr(self.stageState, 'open'):
+            self.stageState.open = []
+        return self.stageState.open
+
+    def current_stage(self):
+        open_stages = self.open_stages()
+        return open_stages[-1]['record']['stage'] if open_stages else None
+
+    # Add to the rows the current stage processed
+    def count_rows(self, rows):
+        open_stages = self.open_stages()
+        if open_stages:
+            open_stages[-1]['record']['rows'] += int(rows)
+
+    # Add to one of the current stage's item counts (pages written, days skipped, ...)
+    def count(self, item, number=1):
+        open_stages = self.open_stages()
+        if open_stages:
+            items = open_stages[-1]['record']['items']
+            items[item] = items.get(item, 0) + int(number)
+
+    # High water mark of the process memory in MB (ru_maxrss is KB on linux and bytes on macOS)
+    def max_rss_mb(self):
+        if resource is None:
+            return None
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2**20 if sys.platform == 'darwin' else 2**10), 1)
+
+    # Write the stage's profile to outputFileDirectory/profile/<stage>.prof (open it with pstats or
+    # snakeviz) and return it with the functions that took the most time in the stage itself
+    def save_profile(self, name, profiler, top=15):
+        dir_path = self.output + os.path.sep + 'profile'
+        if not os.path.isdir(dir_path):
+            os.mkdir(dir_path)
+        path = dir_path + os.path.sep + name + '.prof'
+        profiler.dump_stats(path)
+        functions = sorted(pstats.Stats(profiler).stats.items(), key=lambda entry: entry[1][2], reverse=True)[:top]
+        return {'file': path, 'functions': [{'function': pstats.func_std_string(function), 'calls': calls,
+                                             'seconds': round(own, 4), 'cumulative_seconds': round(cumulative, 4)}
+                                            for function, (primitive, calls, own, cumulative, callers) in functions]}
+
+    def save_manifest(self):
+        with open(self.output + os.path.sep + 'manifest.json', 'w') as stream:
+            json.dump(self.manifest, stream, indent=1, default=str)
+
+    def record_file(self, path, seconds):
+        self.manifest['files'].append({'file': path, 'stage': self.current_stage(), 'seconds': round(seconds, 3)})
+        self.count('files written')
+
+    def record_pages(self, results):
+        written, failed = results
+        for path, seconds in written:
+            self.record_file(path, seconds)
+        for path, error in failed:
+            self.manifest['failed'].append({'file': path, 'stage': self.current_stage(), 'error': str(error)})
+        if failed:
+            self.count('files failed', len(failed))
+
+    # Write a bokeh page, opening it in the browser unless running headless
+    def publish(self, layout, path, title):
+        start = perf_counter()
+        if self.headless:
+            save(layout, filename=path, resources=CDN, title=title)
+        else:
+            output_file(path, title=title)
+            show(layout)
+        self.record_file(path, perf_counter() - start)
+
     def capture_data(self):
         for fileType in self.filePaths:
             print("file", self.filePaths[fileType])
             self.open_files(self.filePaths[fileType], fileType)
+            self.count_rows(len(self.healthData[fileType]))
+            self.count(fileType + ' rows', len(self.healthData[fileType]))
 
         return True
 
+    # Load a source into healthData.  With a database, a file unchanged since it was saved there is not
+    # read again: only the rows around the dateRange are queried.  Otherwise the file is read (from the
+    # source cache when it is unchanged) and its rows replace those of the time range it was read for.
     def open_files(self, file, key):
+        streaming = self.chunkSize and key in SOURCE_FORMATS
+        # streamed sources only hold the dateRange window (plus a day either side for prior day features)
+        window_start = pd.Timestamp(self.initialDay.date()) - timedelta(days=1)
+        window_end = pd.Timestamp(self.finalDay.date()) + timedelta(days=2)
+        whole = '@' + self.timezone if self.timezone else ''
+        variant = (str(window_start) + '/' + str(window_end) if streaming else '') + whole
+        if self.store is not None:
+            saved = self.store.source(key)
+            if saved is not None and saved['variant'] in (variant, whole) and unchanged(saved, file, PARSER_VERSION):
+                self.healthData[key] = self.store.query(key, window_start, window_end).reset_index(drop=True)
+                self.count('stored sources')
+                return
+        data = self.read_source(file, key, streaming, variant, window_start, window_end)
+        if self.store is not None and len(data):
+            start, end = (window_start, window_end) if streaming else (data['Datetime'].min(), data['Datetime'].max())
+            self.store.save_source(key, event_table(data, key), start, end, source_fingerprint(file, PARSER_VERSION, variant))
+            self.count('saved sources')
+        self.healthData[key] = data
+
+    def read_source(self, file, key, streaming, variant, window_start, window_end):
+        if self.cache is not None:
+            data = self.cache.load(file, key, variant)
+            if data is not None:
+                self.count('cached sources')
+                return data
+        if streaming:
+            data = stream_source(file, key, window_start, window_end, self.chunkSize, self.timestamps, self.timezone)
+            if self.cache is not None:
+                self.cache.store(file, key, data, variant)
+            return data
         if key == 'CGMData':
             data = pd.read_csv(file, sep=';')
             data = data.dropna(how='any', subset=['UDT_CGMS'])
@@ -60,85 +322,93 @@ class CGMProcessing:
             data = data.rename(columns={'Time': 'Activity Time'})
         if key == "sleepData":
             #convert sleep times from str to DT
-            data['Bedtime Start'] = pd.to_datetime(data['Bedtime Start'], format=('%Y-%m-%dT%H:%M:%S-07:00'))
-            data['Bedtime End'] = pd.to_datetime(data['Bedtime End'], format=('%Y-%m-%dT%H:%M:%S-07:00'))
+            data['Bedtime Start'] = parse_offset_timestamps(data['Bedtime Start'], self.timezone)
+            data['Bedtime End'] = parse_offset_timestamps(data['Bedtime End'], self.timezone)
         data = data.rename(columns={'DAY' or 'Day' or 'date': 'Date'})
         data = data.rename(columns={'TIME': 'Time'})
         data = self.clean_date_column(data, key)
-        data = self.clean_time_column(data)
+        data = self.clean_time_column(data, key)
         data = self.add_datetime(data)
-        self.healthData[key] = data
+        if self.cache is not None:
+            self.cache.store(file, key, data, variant)
+        return data
 
     def clean_date_column(self, df, key):
         #validate date exists
-        date = False
-        cols = list(df)
-        split = False
-        for index, column in enumerate(cols):
-            if re.match(r"(?i)^(Date|Day)", column):
-                date = True
-                date_column_index = index
-                date_column_name = cols[index]
-
-        if not date:
+        date_columns = [column for column in df if re.match(r"(?i)^(Date|Day)", column)]
+        if not date_columns:
             return df
-        #Check formatting (may have '\' instead of '-' or include time as well
-        df.rename(columns={date_column_name:'Date'}, inplace=True)
-        df['Date'] = df.Date.str.replace('/' ,'-')
-        df['Date'] = df.Date.str.replace('.' ,'-')
-        for col in df['Date'].str.contains('\d+-\d+-\d+ \d+', regex=True):  #if time is included col needs to be split
-            if col and not split:
-                df['str_split'] = df['Date'].str.split(' ')
-                df['Date'] = df.str_split.str.get(0)
-                df['Time'] = df.str_split.str.get(1)
-                del df['str_split']
-                split = True
-        if key == 'CGMData':
-            try:
-                df['Date'] = pd.to_datetime(df['Date'], format='%d-%m-%Y', exact=True)
-            except:
-                df['Date'] = pd.to_datetime(df['Date'], infer_datetime_format=True)
-        else:
-            df['Date'] = pd.to_datetime(df['Date'], infer_datetime_format=True)
+        df = df.rename(columns={date_columns[-1]: 'Date'})
+        candidates = SOURCE_FORMATS[key]['date_formats'] + DATE_FORMATS if key in SOURCE_FORMATS else DATE_FORMATS
+        stamp = self.timestamps.parse(key, 'Date', df['Date'], candidates)
+        df['Date'] = stamp.dt.normalize()
+        offset = (stamp - df['Date']).dropna()  #missing dates don't say whether the dates carry a time
+        if (offset != pd.Timedelta(0)).any():  #if time is included it becomes the Time column
+            df['Time'] = stamp - df['Date']
         return df
 
-    def clean_time_column(self, df):
-        if 'Time' in df:
-            df['Time'] = df['Time'].fillna('00:00:00')
-            df['Time'] = pd.to_datetime(df.Time).dt.time
-
-            return df
-        else: #Add datetime 00:00:00
-            df["Time"] = "00:00:00"
-            df['Time'] = pd.to_datetime(df.Time).dt.time
-            return df
+    def clean_time_column(self, df, key):
+        if 'Time' not in df: #Add time 00:00:00
+            df['Time'] = pd.Timedelta(0)
+        elif not pd.api.types.is_timedelta64_dtype(df['Time']):
+            candidates = SOURCE_FORMATS[key]['time_formats'] + TIME_FORMATS if key in SOURCE_FORMATS else TIME_FORMATS
+            df['Time'] = self.timestamps.parse_clock(key, 'Time', df['Time'], candidates).fillna(pd.Timedelta(0))
+        return df
 
     def add_datetime(self, df):
-        df = df.dropna(how='any', subset=['Time'])
-        df['Datetime'] = pd.to_datetime(df['Date'].astype(str)+' '+df['Time'].astype(str))
-        df['Datetime'] = pd.to_datetime(df['Datetime'], format=('%Y-%m-%d %I:%M %p'))
+        df = df.dropna(how='any', subset=['Date', 'Time'])
+        df['Datetime'] = df['Date'] + df['Time']
 
         return df
 
     def clean_data(self):
-        dfs = []
-        for data in self.healthData:
-            if data != 'CGMData':
-                self.healthData[data]['data_set'] = data
-                dfs.append(self.healthData[data])
-            
-        self.healthData['combined_Health'] = pd.concat(dfs, ignore_index=True)
-        self.healthData['combined_Health']['Date'].fillna(self.healthData['combined_Health']['Date'])
-        self.healthData['combined_Health'] = self.healthData['combined_Health'].sort_values(by='Datetime', ascending=True)
-        self.healthData['combined_Health'] = self.healthData['combined_Health'].set_index("Date", drop=False)
+        # every source stays a table of its own, typed and with only its own columns
+        for data in self.filePaths:
+            self.healthData[data] = event_table(self.healthData[data], data)
         self.healthData['CGMData'] = self.healthData['CGMData'].set_index(["Datetime"], drop=False).loc[self.initialDay.strftime('%Y-%m-%d %H:%m:%S'):self.finalDay.strftime('%Y-%m-%d %H:%m:%S'),:]
-        # if self.analysis['calCorrection']:
-        #     self.healthData['CGMData_original'] = self.healthData['CGMData']
-        #     self.healthData['CGMData'] = self.bg_calibration_correction()
-        #     self.healthData['CGMData'] = self.healthData['CGMData'].set_index("Date", drop=False)
-        self.healthData["CGMData"] = self.fill_missing_CGM_data()
+        if self.analysis['calCorrection']:
+            self.healthData['CGMData'] = self.run_stage('bg_calibration_correction', self.bg_calibration_correction)
+        if self.incremental is not None:
+            self.dayDigests = {key: day_digests(self.healthData[key]) for key in self.filePaths}
+            self.changedDays = self.incremental.changed_days(self.dayDigests)
+            if self.changedDays is not None:
+                # responses started late on the previous day run into a changed day
+                self.renderDays = self.changedDays | {day - timedelta(days=1) for day in self.changedDays}
+                print(str(len(self.changedDays)) + " day(s) with new or changed data since the last run")
+        self.count_rows(sum(len(self.healthData[data]) for data in self.filePaths))
+        self.healthData["CGMData"] = self.run_stage('fill_missing_CGM_data', self.fill_missing_CGM_data)
+        self.build_day_index()
         return
 
+    def save_processed_state(self):
+        if self.incremental is not None:
+            self.incremental.save(self.dayDigests, self.healthData['CGMData'])
+
+    # Restrict a frame of events to the days that need rendering on this run
+    def render_events(self, df):
+        if self.renderDays is None:
+            return df
+        return df.loc[df['Datetime'].dt.normalize().isin(pd.to_datetime(list(self.renderDays)))]
+
+    def render_day(self, day):
+        return self.renderDays is None or pd.Timestamp(day).date() in self.renderDays
+
+    # Smoothed `value` of every response window in a long form response table (see cgmresponse)
+    def smooth(self, responses, value='UDT_CGMS'):
+        return smooth_windows(responses[value].values, responses['Event'].values, self.smoothWindow, self.smoothOrder)
+
+    # Rows of a CGM frame to draw `value` with, at most about plotPoints of them
+    def plot_points(self, cgm, value='UDT_CGMS'):
+        return downsample(cgm, 'Datetime', value, self.plotPoints, self.downsampleMethod)
+
+    # Index every source by day.  The indexed (time sorted) tables replace the source frames, so each
+    # source is held once.
+    def build_day_index(self):
+        self.dayIndex = DayIndex()
+        for data in self.filePaths:
+            self.dayIndex.add(data, self.healthData[data])
+            self.healthData[data] = self.dayIndex.frame(data)
+
     def extract_time_from_datetime_str(self, day):
         # String should be of the form "2020-02-02 00:00:00"
         day = day.split(' ')
@@ -160,41 +430,97 @@ class CGMProcessing:
         
         return df
         
-    def process_healthData(self):
-        if self.analysis['matplotlib']:
-            self.bg_food_response_matplot()
-        if self.analysis['mealStep']:    
-            self.bg_food_response_bokeh()
-        if self.analysis['exerciseStep']:    
-            self.bg_exercise_response_bokeh()
-        if self.analysis['dayOverview']:
-            self.bg_daily_overview()
-        if self.analysis['heat']:    
-            self.bg_heatmap()
-        if self.analysis['multiplot']:    
-            self.bg_multi_plot()
+    # Every stage of the pipeline with the intermediates it reads and produces.  run executes the stages
+    # needed by the enabled dataAnalysis flags (see cgmpipeline), the graphs one at a time and the
+    # analysis stages alongside them on stageWorkers threads.  Intermediates are computed once per run
+    # and read with shared, calling a stage directly computes the ones it needs on first use.
+    def pipeline_stages(self):
+        return [Stage('capture_data', self.capture_data, outputs=['sources']),
+                Stage('clean_data', self.clean_data, inputs=['sources'], outputs=['dayIndex']),
+                Stage('period_cgm', self.period_cgm, inputs=['dayIndex'], outputs=['cgm']),
+                Stage('period_meals', self.period_meals, inputs=['dayIndex'], outputs=['meals']),
+                Stage('period_exercise', self.period_exercise, inputs=['dayIndex'], outputs=['exercise']),
+                Stage('meal_responses', self.meal_responses, inputs=['meals', 'cgm'], outputs=['mealResponses']),
+                Stage('meal_summary', self.meal_summary, inputs=['mealResponses'], outputs=['mealMetrics']),
+                Stage('day_summary', self.day_summary, inputs=['cgm'], outputs=['dayMetrics']),
+                Stage('bg_food_response_matplot', self.bg_food_response_matplot, inputs=['dayIndex'], exclusive=True, when=self.outputs_stale),
+                Stage('bg_food_response_bokeh', self.bg_food_response_bokeh, inputs=['cgm', 'exercise'], exclusive=True, when=self.outputs_stale),
+                Stage('bg_exercise_response_bokeh', self.bg_exercise_response_bokeh, inputs=['cgm', 'meals', 'exercise'], exclusive=True,
+                      when=self.outputs_stale),
+                Stage('bg_daily_overview', self.bg_daily_overview, inputs=['dayIndex'], exclusive=True, when=self.outputs_stale),
+                Stage('bg_heatmap', self.bg_heatmap, inputs=['dayIndex'], exclusive=True, when=self.outputs_stale),
+                Stage('bg_multi_plot', self.bg_multi_plot, inputs=['meals', 'mealResponses', 'mealMetrics'], exclusive=True,
+                      when=self.outputs_stale),
+                Stage('bg_long_overview', self.bg_long_overview, inputs=['cgm'], exclusive=True, when=self.outputs_stale),
+                Stage('bg_metrics', self.bg_metrics, inputs=['cgm', 'meals', 'mealMetrics', 'dayMetrics'], when=self.outputs_stale),
+                Stage('bg_food_profiles', self.bg_food_profiles, inputs=['meals', 'mealResponses'], when=self.outputs_stale),
+                Stage('deep_analysis', self.deep_analysis, inputs=['dayIndex', 'meals', 'mealMetrics', 'dayMetrics'], when=self.outputs_stale)]
+
+    def analysis_targets(self):
+        return [name for name, flag in STAGE_FLAGS.items() if self.analysis.get(flag, False)]
+
+    # False on an incremental run without new data, whose outputs are all up to date
+    def outputs_stale(self):
+        return self.renderDays is None or bool(self.renderDays)
+
+    def shared(self, name):
+        return self.pipeline.value(name)
+
+    # Shared intermediates
+    def period_cgm(self):
+        return self.dayIndex.frame('CGMData')
+
+    # Meals of the dateRange with at least minCarbs net carbs, in time order
+    def period_meals(self):
+        response_meals = self.dayIndex.frame('mealData').loc[self.initialDay:self.finalDay]
+        return response_meals.loc[response_meals['Net Carbs (g)'] >= self.minCarbs]
+
+    def period_exercise(self):
+        return self.dayIndex.frame('ExData').loc[self.initialDay:self.finalDay]
+
+    def meal_responses(self):
+        return extract_responses(self.shared('meals'), self.shared('cgm'), timedelta(hours=self.resWindow.hour))
+
+    def meal_summary(self):
+        return meal_metrics(self.shared('mealResponses'))
+
+    def day_summary(self):
+        return day_metrics(self.shared('cgm'), self.rangeBands)
+
+    # The daily overview page of one date (YYYY-MM-DD), written to dir_path
+    def daily_overview_item(self, date, dir_path):
+        item = {'path': dir_path + os.path.sep + 'Daily Overview ' + '(' + date + ')' + '.html', 'title': 'Daily Overview ' + date,
+                'date': date, 'workouts': [], 'meals': [], 'exercise_text': '', 'meal_text': '', 'sleep_text': ''}
+        try:
+            df_date_exercise = self.dayIndex.day('ExData', date)
+            
+            if not df_date_exercise.empty:                
+                item['exercise_text'] = str(df_date_exercise.assign(Time=clock_strings(df_date_exercise['Time']))[["Time", "Activity Type", "Title", "Calories", "Max HR", "Avg HR", "Activity Time"]].to_string())
+                end_times = df_date_exercise['Datetime'] + pd.to_timedelta(df_date_exercise['Activity Time'])
+                item['workouts'] = list(zip(df_date_exercise['Datetime'], end_times))
+        except:
+            print("No exercise data for " + date)
         
+        item['cgm'] = self.plot_points(self.dayIndex.day('CGMData', date)[['Datetime', 'UDT_CGMS']].reset_index(drop=True))
+        try:
+            df_date_meals = self.dayIndex.day('mealData', date)
+            df_date_meals = df_date_meals.loc[df_date_meals['Net Carbs (g)'] >= self.minCarbs]
+            
+            if not df_date_meals.empty:
+                item['meal_text'] = str(df_date_meals.assign(Time=clock_strings(df_date_meals['Time']))[["Time", "Food Name", "Energy (kcal)", "Group", "Net Carbs (g)"]].to_string())
+                item['meals'] = list(zip(df_date_meals['Datetime'], df_date_meals['Datetime'] + timedelta(minutes=20)))
+        except:
+            print("This appears to be a fasting day " + date)
         
-        return
-    
+        df_date_sleep = self.dayIndex.day('sleepData', date)
+        if not df_date_sleep.empty:
+            df_date_sleep = df_date_sleep.filter(["Sleep Score", "Readiness Score", "Bedtime Start", "Bedtime End"]) 
+            sleep_time = df_date_sleep["Bedtime End"].dt.to_pydatetime() - df_date_sleep["Bedtime Start"].dt.to_pydatetime()
+            df_date_sleep["Total Sleep"] = format_timespan(sleep_time[0])  
+            item['sleep_text'] = str(df_date_sleep[["Sleep Score", "Readiness Score", "Bedtime Start", "Bedtime End", "Total Sleep"]].to_string())
+        return item
+
     def bg_daily_overview(self):
-        df_health_data = self.healthData['combined_Health'].set_index("Datetime", drop=False).loc[self.initialDay:self.finalDay,:]
-        df_health_data = df_health_data.set_index("Date", drop=False) 
-        df_health_data.sort_values(['Datetime'], ascending=[True])
-        df_health_data = df_health_data.set_index("Datetime", drop = False)
-        df_period_CGM = self.healthData['CGMData'].set_index("Datetime", drop=False).loc[self.initialDay:self.finalDay,:].set_index(["Datetime"], drop=False)
-        # df_period_CGM = df_period_CGM.interpolate(method='linear', limit_direction='both')
-
-        df_response_meals = df_health_data.loc[(df_health_data['data_set'] == 'mealData') & (df_health_data['Net Carbs (g)'] >= self.adjustments['minCarbs'])]
-        df_response_meals = df_response_meals.dropna(how='any', axis=1)
-        df_response_meals = df_response_meals.sort_values(['Net Carbs (g)'], ascending=[False])
-        
-        df_exercise_data = df_health_data.loc[df_health_data['data_set'] == 'ExData']
-        df_exercise_data = df_exercise_data.dropna(how='any', axis=1).set_index(['Datetime'], drop=False)
-        
-        df_sleep_data = self.healthData['sleepData'].set_index("Datetime", drop=False).loc[self.initialDay.date():self.finalDay.date(),:]
-        # df_sleep_data = df_sleep_data.dropna(how='any', axis=1)
-        
         #create an array for all the dates
         num_days = (self.finalDay.date()-self.initialDay.date()).days + 1 #inclusive of last day
         date_list = [self.initialDay + timedelta(days=x) for x in range(num_days)]
@@ -205,745 +531,387 @@ class CGMProcessing:
         if not os.path.isdir(dir_path):
             os.mkdir(dir_path)
             
-        for date in dates:
-            # output to static HTML file
-            output_file(dir_path + os.path.sep + 'Daily Overview ' + '(' + date + ')' + '.html')
-            columns = []
-            # create a new plot
-            p = figure(
-            tools="pan,box_zoom,reset,save",
-            title="log axis example", x_axis_type='datetime',
-            x_axis_label='Response', y_axis_label='Glucose'
-            )
-            try:
-                df_date_exercise = df_exercise_data[df_exercise_data['Date'].dt.strftime("%Y-%m-%d") == date]
-                
-                if not df_date_exercise.empty:                
-                    exercise_table = PreText(text='', width=500)
-                    exercise_table.text = str(df_date_exercise[["Time", "Activity Type", "Title", "Calories", "Max HR", "Avg HR", "Activity Time"]].to_string())
-                    columns.append(exercise_table)
-                    for time, workout in df_exercise_data.iterrows():
-                        determine_time = workout['Datetime']
-                        end_time = determine_time + pd.to_timedelta(workout['Activity Time'])
-                        exercise_box = BoxAnnotation(left=determine_time, right=end_time, fill_alpha=0.4, fill_color='blue')
-                        p.add_layout(exercise_box)
-            except:
-                print("No exercise data for " + date)
-            
-            
-            df_date_CGM = df_period_CGM[df_period_CGM['Date'].dt.strftime("%Y-%m-%d") == date]
-            try:
-                df_date_meals = df_response_meals[df_response_meals['Date'].dt.strftime("%Y-%m-%d") == date].sort_values(['Time'], ascending=[True])
-                
-                if not df_date_meals.empty:
-                    meal_table = PreText(text='', width=500)
-                    df_date_meals = df_date_meals.filter(["Time", "Food Name", "Energy (kcal)", "Group", "Net Carbs (g)"])
-                    meal_table.text = str(df_date_meals[["Time", "Food Name", "Energy (kcal)", "Group", "Net Carbs (g)"]].to_string())
-                    columns.append(meal_table)
-                    
-                    for time, meal in df_response_meals.iterrows():
-                        determine_time = meal['Datetime']
-                        end_time = determine_time + timedelta(minutes=20)
-                        meal_box = BoxAnnotation(left=determine_time, right=end_time, fill_alpha=0.4, fill_color='red')
-                        p.add_layout(meal_box)
-            except:
-                print("This appears to be a fasting day " + date)
-            
-            sleep_table = PreText(text='', width=500)
-            df_date_sleep = df_sleep_data[df_sleep_data['Date'].dt.strftime("%Y-%m-%d") == date]
-            if not df_date_sleep.empty:
-                df_date_sleep = df_date_sleep.filter(["Sleep Score", "Readiness Score", "Bedtime Start", "Bedtime End"]) 
-                sleep_time = df_date_sleep["Bedtime End"].dt.to_pydatetime() - df_date_sleep["Bedtime Start"].dt.to_pydatetime()
-                df_date_sleep["Total Sleep"] = format_timespan(sleep_time[0])  
-                sleep_table.text = str(df_date_sleep[["Sleep Score", "Readiness Score", "Bedtime Start", "Bedtime End", "Total Sleep"]].to_string())
-                columns.append(sleep_table)
-            
+        items = [self.daily_overview_item(date, dir_path) for date in dates if self.render_day(date)]
 
-            wl = len(df_date_CGM) -1
-            if not wl % 2:
-                wl = len(df_date_CGM) - 2
-            pOrder = 9 if (9 < wl-1) else (wl-1)
-            df_date_CGM_filtered = df_date_CGM[['UDT_CGMS']].apply(savgol_filter, window_length=(wl), polyorder=(pOrder))
-            p.line(df_date_CGM["Datetime"], df_date_CGM.UDT_CGMS, line_width=4, line_color="black")
-
-            # show the results
-            low_box = BoxAnnotation(top=70, fill_alpha=0.1, fill_color='red')
-            mid_box = BoxAnnotation(bottom=70, top=140, fill_alpha=0.1, fill_color='green')
-            high_box = BoxAnnotation(bottom=140, fill_alpha=0.1, fill_color='red')
-
-            p.add_layout(low_box)
-            p.add_layout(mid_box)
-            p.add_layout(high_box)
-
-            # delta = df_meal_CGM.UDT_CGMS.max() - df_meal_CGM.UDT_CGMS[0]
-            height = int(df_date_CGM.UDT_CGMS.max()*.95)
-            height2 = int(df_date_CGM.UDT_CGMS.max()*.93)
-            height3 = int(df_date_CGM.UDT_CGMS.max()*.90)
-            height4 = int(df_date_CGM.UDT_CGMS.max()*.87)
-
-            p.title.text = "Glucose Response Full Day Overview " + date
-            p.title.align = "center"
-            p.xgrid[0].grid_line_color=None
-            p.ygrid[0].grid_line_alpha=0.5
-            p.xaxis.axis_label = date
-            p.yaxis.axis_label = 'mmol/dl'
-            # show(p)
-            show(row(p, column(columns)))
-            # sleep(1)
-
-       
+        self.count_rows(len(items))
+        self.record_pages(self.renderer.run('Daily overviews', daily_overview_page, items))
         print("Daily Overview completed")
-
     def bg_food_response_matplot(self):
+        dir_path = (self.output + os.path.sep + 'matplot_step_responses')
+        if self.headless and not os.path.isdir(dir_path):
+            os.mkdir(dir_path)
         current_date = self.initialDay.date()
         while current_date <= self.finalDay.date():
+            if not self.render_day(current_date):
+                current_date = current_date + timedelta(days=1)
+                continue
             print("Processing Data for " + str(current_date))
-            df_current_day = self.healthData['combined_Health'].set_index("Date", drop=False).loc[current_date,:]
-            df_current_day.sort_values(['Datetime'], ascending=[True])
-            df_current_day = df_current_day.set_index("Datetime", drop = False)
-            df_current_day_CGM = self.healthData['CGMData'].set_index("Date", drop=False).loc[current_date,:]
-            df_current_day_CGM.sort_values(['Datetime'], ascending=[True])
-            df_current_day_CGM = df_current_day_CGM.set_index("Datetime", drop=False)
-
-            response_meals = df_current_day.loc[(df_current_day['data_set'] == 'mealData') & (df_current_day['Net Carbs (g)'] >= self.minCarbs)]
-            sleep_data = df_current_day.loc[df_current_day['data_set'] == 'sleepData']
-            exercise_data = df_current_day.loc[df_current_day['data_set'] == 'ExData']
-            response_meals = response_meals.dropna(how='any', axis=1)
-            sleep_data = sleep_data.dropna(how='any', axis=1)
-            exercise_data = exercise_data.dropna(how='any', axis=1)
+            df_current_day_CGM = self.dayIndex.day('CGMData', current_date)
+
+            response_meals = self.dayIndex.day('mealData', current_date)
+            response_meals = response_meals.loc[response_meals['Net Carbs (g)'] >= self.minCarbs]
+            sleep_data = self.dayIndex.day('sleepData', current_date)
+            exercise_data = self.dayIndex.day('ExData', current_date)
+            if response_meals.empty:
+                current_date = current_date + timedelta(days=1)
+                continue
+            self.count_rows(len(response_meals))
+            self.count('days')
+            response_window = timedelta(hours=self.resWindow.hour)
+            meal_responses = extract_responses(response_meals, df_current_day_CGM, response_window)
+            meal_responses = meal_responses.assign(filtered=self.smooth(meal_responses))
+            meal_exercise = window_join(response_meals, exercise_data, response_window)
+            meal_exercise = {event: exercise_data.iloc[rows['Row']] for event, rows in meal_exercise.groupby('Event')}
             nrows = len(response_meals)
-            extra_row = nrows % 2
-            if extra_row:
-                fig, axes = plt.subplots(nrows//2+1,2)
-            else:
-                fig, axes = plt.subplots(nrows//2,2)
-
-            index = 0
-            for food in response_meals.iterrows():
-                df_meal_data = food[1]
-                period_start = df_meal_data.Datetime.to_pydatetime()
-                period_start_str = self.extract_time_from_datetime_str(str(pd.to_datetime(period_start)))
-                period_end = period_start + timedelta(hours=self.resWindow.hour)
-                period_end_str = self.extract_time_from_datetime_str(str(pd.to_datetime(period_end)))
-                df_CGM_response = df_current_day_CGM.between_time(period_start_str,period_end_str)
-                df_exercise = exercise_data.between_time(period_start_str,period_end_str)
-
-                wl = len(df_CGM_response) -1
-                if not wl % 2:
-                    wl = len(df_CGM_response) - 2
-                pOrder = 9 if (9 < wl-1) else (wl-1)
-                df_CGM_response["filtered"] = df_CGM_response[['UDT_CGMS']].apply(savgol_filter, window_length=(wl), polyorder=(pOrder))
-
-                if len(df_CGM_response) == 0:
-                    continue
-                title = (str(df_CGM_response['Date'].values[0]) + " Time (Day)")
-
-                df_CGM_response.plot(x='Time', y='filtered', ax=axes[index//2,1 if index % 2 else 0], subplots=True)
+            fig, axes = plt.subplots((nrows + 1)//2, 2, squeeze=False)
+
+            for index, (event, df_CGM_response) in enumerate(meal_responses.groupby('Event')):
+                df_meal_data = response_meals.iloc[event]
+                df_exercise = meal_exercise.get(event, exercise_data.iloc[0:0])
+                ax = axes[index//2, 1 if index % 2 else 0]
+
+                df_CGM_response.plot(x='Datetime', y='filtered', ax=ax, subplots=True)
 
                 if not df_exercise.empty:
                     for workout in df_exercise.iterrows():
                         activity_info = workout[1]
-                        activity_time = pd.to_datetime(activity_info['Activity Time'])
-                        activity_time = activity_time.to_pydatetime()
                         determine_time = activity_info.Datetime.to_pydatetime()
-                        end_time = determine_time + timedelta(hours=activity_time.hour, minutes=activity_time.minute)
-                        axes[index//2,1 if index % 2 else 0].axvspan(str(determine_time), str(end_time), color='blue', alpha=0.5)
-                        axes[index//2,1 if index % 2 else 0].annotate(activity_info.Title + '\n' + activity_info['Calories'] + ' Calories Burned', xy=(str(determine_time),df_CGM_response['UDT_CGMS'].median()))
+                        end_time = determine_time + pd.to_timedelta(activity_info['Activity Time']).floor('min')
+                        ax.axvspan(determine_time, end_time, color='blue', alpha=0.5)
+                        ax.annotate(str(activity_info.Title) + '\n' + str(activity_info['Calories']) + ' Calories Burned', xy=(determine_time, df_CGM_response['UDT_CGMS'].median()))
 
-                axes[index//2,1 if index % 2 else 0].set_title('BG Response to ' + df_meal_data.loc['Food Name'])
-                axes[index//2,1 if index % 2 else 0].set_xlabel(str(df_CGM_response['Date'].values[0]) + " Time(Day)")
-                axes[index//2,1 if index % 2 else 0].set_ylabel("Blood Glucose")
-                index += 1
+                ax.set_title('BG Response to ' + df_meal_data.loc['Food Name'])
+                ax.set_xlabel(str(current_date) + " Time(Day)")
+                ax.set_ylabel("Blood Glucose")
 
             plt.tight_layout()
-            plt.show()
+            if self.headless:
+                start = perf_counter()
+                path = dir_path + os.path.sep + 'Meal Responses (' + str(current_date) + ').png'
+                fig.savefig(path)
+                plt.close(fig)
+                self.record_file(path, perf_counter() - start)
+            else:
+                plt.show()
             current_date = current_date + timedelta(days=1)
         return
 
+    # Spread the step of every spot calibration back over the calWindow hours before it (see cgmcalibrate)
+    def bg_calibration_correction(self):
+        _df, calibrations = correct_calibrations(self.healthData['CGMData'], timedelta(hours=self.calWindow.hour), self.calJump,
+                                                 max_interval=2 * self.samplePeriod)
+        print("Corrected the readings before " + str(len(calibrations)) + " spot calibrations")
+        self.count_rows(len(_df))
+        self.count('calibrations', len(calibrations))
+        return _df.set_index(["Datetime"], drop=False)
+
     def fill_missing_CGM_data(self):
-        num_days = (self.finalDay.date()-self.initialDay.date()).days + 1 #inclusive of last day
-        date_list = [self.initialDay.date() + timedelta(days=x) for x in range(num_days)]
         _df = self.healthData["CGMData"]
-        # _df = _df.droplevel(0).reset_index()
-        # _df = _df.resample('5T').ffill().reset_index()
-        for date in date_list:
-            # _df = _df.reset_index()
-            if (date != self.initialDay.date() and date != self.finalDay.date()):
-                df_date_CGM = _df[_df['Date'].dt.strftime("%Y-%m-%d") == date.strftime("%Y-%m-%d")]
-                df_date_CGM = df_date_CGM.reset_index(drop=True)
-                if len(df_date_CGM) < 288:
-                    try:
-                        time = df_date_CGM["Time"][0]
-                        dtime = datetime.combine(date, time)  
-                    except:
-                        try:
-                            dtime = datetime.combine(date, datetime.strptime("00:00:00", format=("%H:%m:%S")))  
-                        except:
-                            input("It appears that you may be missing data for the date range selected.  Please correct and rerun.  Script Terminating!") 
-                            break               
-                    time_list = [dtime + timedelta(minutes=x*5) for x in range(288)]
-                    time_df = pd.DataFrame(time_list, columns=["Datetime"])
-                    for index, datime in time_df.iterrows():
-                        test = _df[_df['Datetime'] == datime['Datetime']]
-                        if test.empty:
-                            new_row = pd.Series([datime['Datetime'].date(), datime['Datetime'].time(), np.nan, np.nan, np.nan, np.nan, np.nan, datime['Datetime'] ], index=_df.columns)
-                            new_row['Datetime'] = pd.to_datetime(new_row['Datetime'])
-                            new_row['Date'] = pd.to_datetime(new_row['Date'], format='%Y-%m-%d', exact=True)
-                            # _df.loc[len(_df.index)] = new_row
-                            _df = _df.append(new_row, ignore_index=True)
-                    _df = _df.sort_values('Datetime')
-        _df = _df.interpolate(method='linear', limit_direction='forward')
-        _df['UDT_CGMS'] = _df['UDT_CGMS'].round(decimals=0)
+        if _df['UDT_CGMS'].dropna().empty:
+            raise MissingDataError("No CGM readings between " + str(self.initialDay) + " and " + str(self.finalDay) + ".  Please correct the dateRange or CGMData file and rerun")
+        previous = self.incremental.load_grid() if self.changedDays is not None else None
+        if previous is not None:
+            _df = refill_cgm_grid(_df, previous, self.changedDays, self.initialDay, self.finalDay, period=self.samplePeriod,
+                                  tolerance=self.snapTolerance, max_gap=self.maxGap)
+        else:
+            _df = build_cgm_grid(_df, self.initialDay, self.finalDay, period=self.samplePeriod,
+                                 tolerance=self.snapTolerance, max_gap=self.maxGap)
+        print("Synthesized " + str(_df['Synthesized'].sum()) + " of " + str(len(_df)) + " CGM samples")
+        self.count_rows(len(_df))
+        self.count('synthesized samples', _df['Synthesized'].sum())
         return _df
         
         
     def bg_exercise_response_bokeh(self):
-        df_health_data = self.healthData['combined_Health'].set_index("Datetime", drop=False).loc[self.initialDay:self.finalDay,:]
-        df_health_data = df_health_data.set_index("Date", drop=False) 
-        df_health_data.sort_values(['Datetime'], ascending=[True])
-        df_health_data = df_health_data.set_index("Datetime", drop = False)
-        df_period_CGM = self.healthData['CGMData'].set_index("Datetime", drop=False).loc[self.initialDay.strftime("%Y-%m-%d"):self.finalDay.strftime("%Y-%m-%d"),:]
-
-        response_meals = df_health_data.loc[(df_health_data['data_set'] == 'mealData') & (df_health_data['Net Carbs (g)'] >= self.adjustments['minCarbs'])]
-        response_meals = response_meals.set_index("Datetime", drop=False)
-        response_meals = response_meals.dropna(how='any', axis=1)
-        # response_meals = response_meals.sort_values(['Carbs (g)'], ascending=[False])
-        exercise_data = df_health_data.loc[df_health_data['data_set'] == 'ExData']
-        exercise_data = exercise_data.set_index("Datetime", drop=False)
-        exercise_data = exercise_data.dropna(how='any', axis=1)
+        df_period_CGM = self.shared('cgm')
+        response_meals = self.shared('meals')
+        exercise_data = self.render_events(self.shared('exercise'))
+
+        # CGM during each workout and over the display window (30 minutes before to an hour past the response window)
+        activity_time = pd.to_timedelta(exercise_data['Activity Time']).dt.floor('min')
+        display_window = timedelta(hours=self.resWindow.hour) + timedelta(hours=1)
+        workout_summary = summarize_responses(extract_responses(exercise_data, df_period_CGM, activity_time))
+        exercise_responses = extract_responses(exercise_data, df_period_CGM, display_window, lead=timedelta(minutes=30))
+        exercise_responses = dict(tuple(exercise_responses.assign(Filtered=self.smooth(exercise_responses)).groupby('Event')))
+        workout_meals = window_join(exercise_data, response_meals, display_window, lead=timedelta(minutes=30))
+        workout_meals = {event: response_meals.iloc[rows['Row']] for event, rows in workout_meals.groupby('Event')}
+        exercise_data = exercise_data.assign(Time=clock_strings(exercise_data['Time']))
+        workout_meals = {event: meals.assign(Time=clock_strings(meals['Time'])) for event, meals in workout_meals.items()}
 
         dir_path = (self.output + os.path.sep + 'bokeh_step_responses_exercise')
         if not os.path.isdir(dir_path):
             os.mkdir(dir_path)
-        for time, workout in exercise_data.iterrows():
-            # output to static HTML file
-            name_string = workout['Title']
-            re.sub('[^a-zA-Z0-9 \n\.]', '', name_string)
-            
-            output_file(dir_path + os.path.sep + name_string + '(' +time.strftime("%Y_%m_%d") + ')' +'.html')
-
-            # create a new plot
-            p = figure(
-            tools="pan,box_zoom,reset,save",
-            title="log axis example", x_axis_type='datetime',
-            x_axis_label='Response', y_axis_label='Glucose'
-            )
-
-
-            # add some renderers
-            activity_time = pd.to_datetime(workout['Activity Time'])
-            activity_time = activity_time.to_pydatetime()
-            ex_start = workout.Datetime
-            ex_end = ex_start + timedelta(hours=activity_time.hour, minutes=activity_time.minute)
-            determine_time = workout.Datetime - timedelta(minutes=30)
-            end_time = determine_time + timedelta(hours=self.resWindow.hour) + timedelta(hours=1)
-            df_workout_CGM = df_period_CGM.loc[ex_start.strftime("%Y-%m-%d %H:%M:%S"):ex_end.strftime("%Y-%m-%d %H:%M:%S"),:]
-            df_exercise_CGM = df_period_CGM.loc[determine_time.strftime("%Y-%m-%d %H:%M:%S"):end_time.strftime("%Y-%m-%d %H:%M:%S"),:]
-            # df_exercise_CGM = self.catch_dt_missing(df_exercise_CGM)
-            df_meal_exercise = response_meals.loc[determine_time:end_time,:]
-            try:
-                the_beginning = pd.to_datetime(df_exercise_CGM.iloc[0]['Datetime']).to_pydatetime()
-            except: #Missing Data at times due to lack of sensor
+        self.count_rows(len(exercise_data))
+        items = {}
+        for event, (time, workout) in enumerate(exercise_data.iterrows()):
+            name_string = re.sub('[^a-zA-Z0-9 \n\.]', '', str(workout['Title']))
+            path = dir_path + os.path.sep + name_string + '(' +time.strftime("%Y_%m_%d") + ')' +'.html'
+
+            df_exercise_CGM = exercise_responses.get(event)
+            df_meal_exercise = workout_meals.get(event, response_meals.iloc[0:0])
+            if df_exercise_CGM is None: #Missing Data at times due to lack of sensor
                 print('Data Failure, abandoning ' + workout['Title'] + ' Date => ' + workout['Date'].strftime("%Y-%m-%d"))
+                self.count('data failures')
                 continue
-            the_beginning = the_beginning.time()
                 
-            #for cases where data is missing, need to fill in data or plot may not load
-            # df_exercise_CGM.set_index("Datetime", drop=False).resample()
-            wl = len(df_exercise_CGM) -1
-            if not wl % 2:
-                wl = len(df_exercise_CGM) - 2
-            pOrder = 9 if (9 < wl-1) else (wl-1)
-            df_exercise_CGM_filtered = df_exercise_CGM[['UDT_CGMS']].apply(savgol_filter, window_length=(wl), polyorder=(pOrder))
-            p.line(df_exercise_CGM["Datetime"], df_exercise_CGM_filtered.UDT_CGMS, line_width=4, line_color="black")
-
-                        
-            exercise_box = BoxAnnotation(left=ex_start, right=ex_end, fill_alpha=0.4, fill_color='blue')
-            columns = []
-            
-            # try:
-            exercise_table = PreText(text='', width=500)
-            exercise_table.text = str(workout[["Time", "Activity Type", "Title", "Calories", "Max HR", "Avg HR", "Activity Time"]].to_string())
-            columns.append(exercise_table)
-            # except:
-            #     print("Problems reading exercise data " + str(time))
-            
+
+            meal_text = ''
             try:
                 df_meals = df_meal_exercise.sort_values(['Time'], ascending=[True]).filter(["Time", "Food Name", "Energy (kcal)", "Group", "Net Carbs (g)"])
                 if not df_meals.empty:
-                    meal_table = PreText(text='', width=500)
-                    meal_table.text = str(df_meals[["Time", "Food Name", "Energy (kcal)", "Group", "Net Carbs (g)"]].to_string())
-                    columns.append(meal_table)
+                    meal_text = str(df_meals[["Time", "Food Name", "Energy (kcal)", "Group", "Net Carbs (g)"]].to_string())
             except:
                 print("This appears to be a fasting day " + str(time))
             
-            for time, meal in df_meal_exercise.iterrows():
-                meal_start = time
-                meal_end = meal_start + timedelta(minutes=20)                
-                meal_box = BoxAnnotation(left=meal_start, right=meal_end, fill_alpha=0.4, fill_color='red')
-                p.add_layout(meal_box)
-            label1 = Label(x=300, y=int(df_exercise_CGM.UDT_CGMS.min()*1.2), x_units='screen', text="Activity = " + str(workout.Title), render_mode='css',
-                border_line_color='black', border_line_alpha=1.0,
-                background_fill_color='white', background_fill_alpha=1.0)
-            label2 = Label(x=300, y=int(df_exercise_CGM.UDT_CGMS.min()*1.1), x_units='screen', text='Calories = ' + str(workout.Calories), render_mode='css',
-                border_line_color='black', border_line_alpha=1.0,
-                background_fill_color='white', background_fill_alpha=1.0)
-            p.add_layout(exercise_box)
-            p.add_layout(label1)
-            p.add_layout(label2)
-            # show the results
-            low_box = BoxAnnotation(top=70, fill_alpha=0.1, fill_color='red')
-            mid_box = BoxAnnotation(bottom=70, top=140, fill_alpha=0.1, fill_color='green')
-            high_box = BoxAnnotation(bottom=140, fill_alpha=0.1, fill_color='red')
-
-            p.add_layout(low_box)
-            p.add_layout(mid_box)
-            p.add_layout(high_box)
-            
-            # df_workout_CGM = df_workout_CGM.reset_index()
-            try:
-                delta = abs(df_workout_CGM['UDT_CGMS'].min() - df_workout_CGM['UDT_CGMS'][0])
-            except:
+            if event in workout_summary.index:
+                delta = abs(workout_summary.loc[event, 'Nadir'] - workout_summary.loc[event, 'Baseline'])
+            else:
+                delta = 'n/a'
                 print("minimal data available for " + workout['Title'])
-            height = int(df_exercise_CGM.UDT_CGMS.max()*.95)
-            height2 = int(df_exercise_CGM.UDT_CGMS.max()*.93)
-            label3 = Label(x=70, y=height, x_units='screen', text="Glucose Delta = " + str(delta), render_mode='css',
-            border_line_color='black', border_line_alpha=1.0,
-            background_fill_color='white', background_fill_alpha=1.0)
-            label4 = Label(x=70, y=height2, x_units='screen', text='Peak = ' + str(df_exercise_CGM.UDT_CGMS.max()) + ' mmol/dl', render_mode='css',
-            border_line_color='black', border_line_alpha=1.0,
-            background_fill_color='white', background_fill_alpha=1.0)
-            
-            p.add_layout(label3)
-            p.add_layout(label4)
-            p.title.text = "Glucose Response of " + workout['Title']
-            p.title.align = "center"
-            p.xgrid[0].grid_line_color=None
-            p.ygrid[0].grid_line_alpha=0.5
-            p.xaxis.axis_label = 'Time (' + workout['Date'].strftime("%Y-%m-%d") + ')'
-            p.yaxis.axis_label = 'mmol/dl'
-            show(row(p, column(columns)))
-            # sleep(1)
-        print('just wait until I finish')
+            # a later workout with the same title on the same day overwrites the page, as it always has
+            items[path] = {'path': path, 'title': str(workout['Title']), 'name': str(workout['Title']), 'calories': workout.Calories,
+                           'date': workout['Date'].strftime("%Y-%m-%d"), 'delta': delta,
+                           'start': workout.Datetime, 'end': workout.Datetime + activity_time.iloc[event],
+                           'meals': list(df_meal_exercise.index), 'meal_length': timedelta(minutes=20),
+                           'workout_text': str(workout[["Time", "Activity Type", "Title", "Calories", "Max HR", "Avg HR", "Activity Time"]].to_string()),
+                           'meal_text': meal_text,
+                           'cgm': self.plot_points(df_exercise_CGM[['Datetime', 'UDT_CGMS', 'Filtered']].reset_index(drop=True), 'Filtered')}
+
+        self.record_pages(self.renderer.run('Exercise responses', exercise_response_page, list(items.values())))
     
-    def bg_heatmap(self):
-
+    # 15 minute heatmap of the whole dateRange, labelled with the meals covering each slot
+    def heatmap_item(self):
         num_days = (self.finalDay.date()-self.initialDay.date()).days + 1 #inclusive of last day
         date_list = [self.initialDay + timedelta(days=x) for x in range(num_days)]
 
         #create an array for all the dates and times to
-        time_index = []
-        min_time = datetime.min.time()
-        min_datetime = datetime.combine(date_list[0], min_time)
-        time_list = [min_datetime + timedelta(minutes=x*15) for x in range(96)]
-        time_index = [time_list[x].strftime("%H:%M:%S") for x in range(len(time_list))]
+        time_index = [(datetime.min + timedelta(minutes=x*15)).strftime("%H:%M:%S") for x in range(96)]
         date_column = [date_list[x].strftime("%Y-%m-%d") for x in range(len(date_list))]
 
-        # Prep matrices for data filling.  All data necessary to fill
-        df_CGM_period_max = self.healthData['CGMData'].set_index(self.healthData['CGMData']['Datetime'])
-        df_CGM_end_test = df_CGM_period_max.loc[df_CGM_period_max['Date'].dt.strftime("%Y-%m-%d") == self.finalDay.date().strftime("%Y-%m-%d")]
-        df_CGM_initial_test = df_CGM_period_max.loc[df_CGM_period_max['Date'] == self.initialDay.date().strftime("%Y-%m-%d")]
-        df_CGM_period_max = df_CGM_period_max.set_index('Datetime', drop=False)
-        df_CGM_period_max = df_CGM_period_max.resample('15Min', base=15, label='right')['UDT_CGMS'].max().sort_values()
-        df_CGM_end_test= df_CGM_end_test.resample('15Min', base=15, label='right')['UDT_CGMS'].max()
-        df_CGM_initial_test= df_CGM_initial_test.resample('15Min', base=15, label='right')['UDT_CGMS'].max()
-
-        # Fill in missing data if necessary
-        if len(df_CGM_end_test.index) < len(time_index):
-            for day in date_list:
-                day = day.date()
-                if day == self.finalDay.date():
-                    for index in time_list:
-                        try:
-                            df_CGM_end_test[datetime.combine(self.finalDay.date(),index.time())]
-                        except:
-                            df_CGM_end_test[datetime.combine(self.finalDay.date(),index.time())] = np.nan
-            df_CGM_end_period_max = self.CGM_fill_decay(df_CGM_end_test, 'forward')
-            df_CGM_period_max = df_CGM_period_max.sort_values().loc[(self.initialDay).strftime("%Y-%m-%d"):(self.finalDay - timedelta(days=1)).strftime("%Y-%m-%d")]
-            df_CGM_period_max = pd.concat([df_CGM_period_max, df_CGM_end_period_max])
-        if len(df_CGM_initial_test.index) < len(time_index):
-            for day in date_list:
-                day = day.date()
-                if day == self.initialDay.date():
-                    for index in time_list:
-                        try:
-                            df_CGM_initial_test[datetime.combine(self.initialDay.date(),index.time())]
-                        except:
-                            df_CGM_initial_test[datetime.combine(self.initialDay.date(),index.time())] = np.nan
-            df_CGM_initial_period_max = self.CGM_fill_decay(df_CGM_initial_test.sort_index(), 'backward')
-            df_CGM_period_max = df_CGM_period_max.sort_values().loc[(self.initialDay + timedelta(days=1)).strftime("%Y-%m-%d"):(self.finalDay).strftime("%Y-%m-%d")]
-            df_CGM_period_max = pd.concat([df_CGM_period_max, df_CGM_initial_period_max])
-        #Remove redundant time indices
-        idx = np.unique( df_CGM_period_max.index.values, return_index = True )[1]
-        df_CGM_period_max = df_CGM_period_max.iloc[idx]
-
-        df_meals = self.healthData['combined_Health'].loc[self.healthData['combined_Health']['data_set'] == 'mealData'].set_index('Datetime', drop=False)
-        df_meals = df_meals.dropna(how='all', axis=1) # drop all fully nan columns as they are not useful here
-        df_dt_matrix_CGM = pd.DataFrame(0, columns=date_column, index=time_index)
-        df_dt_matrix_meals = pd.DataFrame(0, columns=date_column, index=time_index)
-        
-        for date, date_array in df_dt_matrix_CGM.iteritems():
-                
-            date_array = date_array.reset_index()
-            df_meals_day = df_meals.loc[df_meals['Date'] == date] #& (df_current_day['Carbs (g)'] >= 5)
-            df_meals_day = df_meals_day.set_index(df_meals_day['Datetime'])
-
-            for time_i in range(date_array.shape[0]):
-                #df of the current time period for pertinent information
-                current_period_time = pd.to_datetime(date_array.loc[time_i,'index'])
-                current_period_time_str = self.extract_time_from_datetime_str(str(current_period_time))
-                if time_i < date_array.shape[0]-1:
-                    next_period_time = pd.to_datetime(date_array.loc[time_i + 1,'index'])
-                    next_period_time_str = self.extract_time_from_datetime_str(str(next_period_time))
-
-                current_time = current_period_time.to_pydatetime().time()
-                current_dt = datetime.combine(datetime.strptime(date, "%Y-%m-%d") , current_time)
-                next_time = next_period_time.to_pydatetime().time()
-                next_dt = datetime.combine(datetime.strptime(date, "%Y-%m-%d"), next_time)
-                try:
-                    CGM_max = df_CGM_period_max[current_dt]
-                except Exception as e:
-                    try:
-                        CGM_max = df_CGM_period_max[next_dt]
-                    except Exception as e:
-                        CGM_max = df_CGM_period_max[previous_dt]
-                        print("error deriving BG, need bug fix")
-                        continue
-
-                df_dt_matrix_CGM.loc[current_period_time_str, date] = CGM_max
-                meal_string = ''
-                df_meals_day = df_meals_day.sort_values(['Carbs (g)'], ascending=[False])
-                for time, meal in df_meals_day.iterrows():
-                    meal_time = datetime.combine(datetime.strptime(date, "%Y-%m-%d"), meal.Time)
-                    time_diff = meal_time + timedelta(hours=self.resWindow.hour)
-                    if (time_diff > current_dt and current_dt >= meal_time):
-                        meal_string += meal['Food Name'] + ' + '
-                df_dt_matrix_meals.loc[current_period_time_str, date] = meal_string
-
-                previous_dt = current_dt
-            print('Day ' + date + ' finished')
-        df_dt_matrix_CGM = df_dt_matrix_CGM.interpolate(method='linear', limit_direction='forward', axis=1)#method='polynomial', order=2) 
-        print("wait!")
-
-        total_days = df_dt_matrix_CGM.shape[1]
-        
-        xname = [[date_column[j] for i in range(len(time_index))] for j in range(len(date_column))]
-        yname = [[time_index[i] for i in range(len(time_index))] for j in range(len(date_column))]
-        xname = list(itertools.chain.from_iterable(xname))
-        yname = list(itertools.chain.from_iterable(yname))
-        bg_list = list(df_CGM_period_max.interpolate(method='linear', limit_direction='both'))
-        min = df_CGM_period_max.min()
-        def calc_color(bg):
-            colormap = ["#004529", "#006d2c", "#238b45", "#d9f0a3", "#fed976", "#feb24c",
-                    "#fd8d3c", "#fc4e2a", "#e31a1c", "#bd0026", "#800026"]
-            if bg < 60:
-                color = (colormap[0])
-            elif bg > 160:
-                color = (colormap[10])
-            else:
-                color = (colormap[int(((bg-60)/100)*10)])
-            return color
+        # 15 minute max glucose for every day, slots without data decay to baseline from the readings around them
+        df_CGM_period_max = build_slot_matrix(self.healthData['CGMData'], self.initialDay, num_days, period=15)
+        self.count_rows(len(self.healthData['CGMData']))
+        self.count('days', num_days)
+        self.count('filled slots', df_CGM_period_max.isna().sum())
+        df_CGM_period_max = decay_fill(df_CGM_period_max, self.baseline, self.decayTime, self.decayShape, max_gap=self.maxGap)
+        df_dt_matrix_CGM = pd.DataFrame(df_CGM_period_max.values.reshape(num_days, 96).T, index=time_index, columns=date_column)
+        self.healthData['CGMHeatmap'] = df_dt_matrix_CGM
+
+        # label every slot with the meals whose response window covers it, largest carbs first
+        df_meals = self.dayIndex.frame('mealData').sort_values(['Carbs (g)'], ascending=[False])
+        df_slots = pd.DataFrame({'Datetime': df_CGM_period_max.index})
+        meal_slots = window_join(df_meals, df_slots, timedelta(hours=self.resWindow.hour))
+        meal_names = pd.Series(df_meals['Food Name'].astype(str).values[meal_slots['Event']] + ' + ')
+        meal_names = meal_names.groupby(meal_slots['Row'].values, sort=False).agg(''.join)
+        food_list = np.full(len(df_slots), '', dtype=object)
+        food_list[meal_names.index] = meal_names.values
+        food_list = list(food_list)
 
         color_selection = ["#004529", "#006d2c", "#238b45", "#d9f0a3", "#fed976", "#feb24c", "#fd8d3c", "#fc4e2a", "#e31a1c", "#bd0026", "#800026"]
-        mapper = LinearColorMapper(palette=color_selection, low=60, high=180)#low=df_CGM_period_max.min(), high=df_CGM_period_max.min())
-        color = map(calc_color, bg_list)
-        color = list(color)
-        food_list = list(itertools.chain.from_iterable(df_dt_matrix_meals.transpose().values.tolist()))
-        xydata = {'xname': xname, 'yname': yname, 'bg': bg_list, 'foods': food_list}
-        source = ColumnDataSource(xydata)
-        data=dict(
-            xname=xname,
-            yname=yname,
-            colors=color,
-            bg=bg_list,
-            foods=food_list,
-        )
-
-        p = figure(title="Blood Glucose over " + str(total_days) + " days",
-                x_axis_location="above", tools="hover,pan,box_zoom,reset,save",
-                x_range=date_column, y_range=time_index, output_backend="webgl",
-                tooltips=[('Sample', '@yname, @xname'), ('Foods', '@foods'), ('Blood Glucose', '@bg')])
-
-        p.plot_width = 1200
-        p.plot_height = 800
-        p.grid.grid_line_color = None
-        p.axis.axis_line_color = None
-        p.axis.major_tick_line_color = None
-        p.axis.major_label_text_font_size = "7px"
-        p.axis.major_label_standoff = 0
-        p.xaxis.major_label_orientation = np.pi/3
-
-        p.rect('xname', 'yname', 0.9, 0.9, source=data,
-            color='colors',
-            line_color=None,
-            hover_line_color='black', hover_color='colors',
-            )
-
-        output_file(self.output + os.path.sep + "bgheatmap.html", title="BG Heatmap")
-
-        color_bar = ColorBar(color_mapper=mapper, location=(0, 0),
-                            ticker=BasicTicker(desired_num_ticks=len(color_selection)-2),
-                            formatter=PrintfTickFormatter(format="%d"))
-
-        p.add_layout(color_bar, 'right')
-        p.add_layout(color_bar, 'left')
-        show(p) # show the plot
-        print('just wait until I finish')
+        color_index = np.floor(np.clip((df_CGM_period_max.fillna(0).values - 60) / 10, 0, 10)).astype(int)
+        return {'palette': color_selection, 'dates': date_column, 'times': time_index, 'total_days': df_dt_matrix_CGM.shape[1],
+                'xname': list(np.repeat(date_column, len(time_index))), 'yname': list(np.tile(time_index, len(date_column))),
+                'colors': list(np.array(color_selection)[color_index]), 'bg': list(df_CGM_period_max), 'foods': food_list}
+
+    def bg_heatmap(self):
+        self.publish(heatmap_page(self.heatmap_item()), self.output + os.path.sep + "bgheatmap.html", "BG Heatmap") # show the plot
 
     def bg_food_response_bokeh(self):
-        df_health_data = self.healthData['combined_Health'].set_index("Datetime", drop=False).loc[self.initialDay:self.finalDay,:]
-        df_health_data = df_health_data.set_index("Date", drop=False) 
-        df_health_data.sort_values(['Datetime'], ascending=[True])
-        df_health_data = df_health_data.set_index("Datetime", drop = False)
-        df_period_CGM = self.healthData['CGMData'].set_index("Datetime", drop=False).loc[self.initialDay.strftime("%Y-%m-%d"):self.finalDay.strftime("%Y-%m-%d"),:]
-
-        response_meals = df_health_data.loc[(df_health_data['data_set'] == 'mealData') & (df_health_data['Carbs (g)'] >= self.adjustments['minCarbs'])]
-        exercise_data = df_health_data.loc[df_health_data['data_set'] == 'ExData']
-        exercise_data = exercise_data.set_index("Datetime", drop=False)
-        exercise_data = exercise_data.dropna(how='any', axis=1)
-        response_meals = response_meals.dropna(how='any', axis=1)
+        response_meals = self.render_events(self.step_response_meals())
         response_meals = response_meals.sort_values(['Net Carbs (g)'], ascending=[False])
 
         dir_path = (self.output + os.path.sep + 'bokeh_step_responses_meals')
         if not os.path.isdir(dir_path):
             os.mkdir(dir_path)
-        for time, meal in response_meals.iterrows():
-            # output to static HTML file
+        self.count_rows(len(response_meals))
+        items = self.meal_response_items(response_meals, dir_path)
+        self.record_pages(self.renderer.run('Meal responses', meal_response_page, list(items.values())))
+
+    # dateRange meals with at least minCarbs carbs, the ones with a step response page
+    def step_response_meals(self):
+        response_meals = self.dayIndex.frame('mealData').loc[self.initialDay:self.finalDay]
+        return response_meals.loc[response_meals['Carbs (g)'] >= self.minCarbs]
+
+    # Step response page items of the meals in response_meals, by page path
+    def meal_response_items(self, response_meals, dir_path):
+        df_period_CGM = self.shared('cgm')
+        exercise_data = self.shared('exercise')
+        response_window = timedelta(hours=self.resWindow.hour)
+        meal_responses = extract_responses(response_meals, df_period_CGM, response_window)
+        meal_summary = summarize_responses(meal_responses)
+        meal_responses = dict(tuple(meal_responses.assign(Filtered=self.smooth(meal_responses)).groupby('Event')))
+        meal_exercise = window_join(response_meals, exercise_data, response_window)
+        meal_exercise = {event: rows['Row'].values for event, rows in meal_exercise.groupby('Event')}
+        workouts = exercise_data.reindex(columns=['Datetime', 'Activity Time', 'Title', 'Calories'])
+        workouts = list(zip(workouts['Datetime'], workouts['Datetime'] + pd.to_timedelta(workouts['Activity Time']).dt.floor('min'),
+                            workouts['Title'], workouts['Calories']))
+
+        items = {}
+        for event, (time, meal) in enumerate(response_meals.iterrows()):
             name_string = meal['Food Name']
             name_string = re.sub('[^a-zA-Z0-9 \n\.]', '', name_string)
-            
-            output_file(dir_path + os.path.sep + name_string + '(' +time.strftime("%Y_%m_%d") + ')' + '.html')
-
-            # create a new plot
-            p = figure(
-            tools="pan,box_zoom,reset,save",
-            title="log axis example", x_axis_type='datetime',
-            x_axis_label='Response', y_axis_label='Glucose'
-            )
-
-
-            # add some renderers
-            determine_time = meal.Datetime
-            end_time = determine_time + timedelta(hours=self.resWindow.hour)
-            df_meal_CGM = df_period_CGM.loc[determine_time.strftime("%Y-%m-%d %H:%M:%S"):end_time.strftime("%Y-%m-%d %H:%M:%S"),:]
-            if len(df_meal_CGM) < 10:
-                continue
-            wl = (len(df_meal_CGM) - 1) 
-            if not wl % 2:
-                wl = len(df_meal_CGM) - 2
-            pOrder = 9 if (9 < wl-1) else (wl-1)
-            df_meal_CGM_filtered = df_meal_CGM[['UDT_CGMS']].apply(savgol_filter, window_length=(wl), polyorder=(pOrder))
-            df_meal_exercise = exercise_data.loc[determine_time:end_time,:]
-            try:
-                the_beginning = pd.to_datetime(df_meal_CGM.iloc[0]['Datetime']).to_pydatetime()
-            except: #Missing Data at times due to lack of sensor
-                print('Data Failure, abandoning ' + meal['Food Name'] + ' Date => ' + meal['Date'].strftime("%Y-%m-%d"))
-                continue
-            the_beginning = the_beginning.time()
-            df_meal_CGM["Response Time"] = df_meal_CGM.Datetime - timedelta(hours=the_beginning.hour, minutes=the_beginning.minute, seconds=the_beginning.second)
-            df_meal_CGM["Response Time"] = df_meal_CGM["Response Time"].dt.time
-            df_meal_CGM["ZeroedCGMS"] = df_meal_CGM.UDT_CGMS - df_meal_CGM.iloc[0]["UDT_CGMS"]
-            p.line(df_meal_CGM["Datetime"], df_meal_CGM_filtered.UDT_CGMS, line_width=4, line_color="black")
-
-            if not df_meal_exercise.empty:
-                for time, workout in df_meal_exercise.iterrows():
-                    activity_info = workout
-                    activity_time = pd.to_datetime(activity_info['Activity Time'])
-                    activity_time = activity_time.to_pydatetime()
-                    determine_time = activity_info.Datetime.to_pydatetime()
-                    end_time = determine_time + timedelta(hours=activity_time.hour, minutes=activity_time.minute)
-                    exercise_box = BoxAnnotation(left=determine_time, right=end_time, fill_alpha=0.4, fill_color='blue')
-                    label5 = Label(x=300, y=int(df_meal_CGM.UDT_CGMS.min()*1.2), x_units='screen', text="Activity = " + str(workout.Title), render_mode='css',
-                        border_line_color='black', border_line_alpha=1.0,
-                        background_fill_color='white', background_fill_alpha=1.0)
-                    label6 = Label(x=300, y=int(df_meal_CGM.UDT_CGMS.min()*1.1), x_units='screen', text='Calories = ' + str(workout.Calories), render_mode='css',
-                        border_line_color='black', border_line_alpha=1.0,
-                        background_fill_color='white', background_fill_alpha=1.0)
-                    p.add_layout(exercise_box)
-                    p.add_layout(label5)
-                    p.add_layout(label6)
-            # show the results
-            low_box = BoxAnnotation(top=70, fill_alpha=0.1, fill_color='red')
-            mid_box = BoxAnnotation(bottom=70, top=140, fill_alpha=0.1, fill_color='green')
-            high_box = BoxAnnotation(bottom=140, fill_alpha=0.1, fill_color='red')
-
-            p.add_layout(low_box)
-            p.add_layout(mid_box)
-            p.add_layout(high_box)
-
-            delta = df_meal_CGM.UDT_CGMS.max() - df_meal_CGM.UDT_CGMS[0]
-            height = int(df_meal_CGM.UDT_CGMS.max()*.95)
-            height2 = int(df_meal_CGM.UDT_CGMS.max()*.93)
-            height3 = int(df_meal_CGM.UDT_CGMS.max()*.90)
-            height4 = int(df_meal_CGM.UDT_CGMS.max()*.87)
-            label1 = Label(x=70, y=height, x_units='screen', text="Glucose Delta = " + str(delta), render_mode='css',
-            border_line_color='black', border_line_alpha=1.0,
-            background_fill_color='white', background_fill_alpha=1.0)
-            label2 = Label(x=70, y=height2, x_units='screen', text='Peak = ' + str(df_meal_CGM.UDT_CGMS.max()) + ' mmol/dl', render_mode='css',
-            border_line_color='black', border_line_alpha=1.0,
-            background_fill_color='white', background_fill_alpha=1.0)
-            label3 = Label(x=70, y=height3, x_units='screen', text='Total Net Carbs = ' + str(meal['Net Carbs (g)']) + ' g', render_mode='css',
-            border_line_color='black', border_line_alpha=1.0,
-            background_fill_color='white', background_fill_alpha=1.0)
-            label4 = Label(x=70, y=height4, x_units='screen', text='Total Calories = ' + str(meal['Energy (kcal)']), render_mode='css',
-            border_line_color='black', border_line_alpha=1.0,
-            background_fill_color='white', background_fill_alpha=1.0)
-
-            p.add_layout(label1)
-            p.add_layout(label2)
-            p.add_layout(label3)
-            p.add_layout(label4)
-            p.title.text = "Glucose Response of " + meal['Food Name']
-            p.title.align = "center"
-            p.xgrid[0].grid_line_color=None
-            p.ygrid[0].grid_line_alpha=0.5
-            p.xaxis.axis_label = 'Time (' + meal['Date'].strftime("%Y-%m-%d") + ')'
-            p.yaxis.axis_label = 'mmol/dl'
-            show(p)
-            # sleep(1)
-        print('just wait until I finish')
-
-    #This function assuming blocks of missing data moving in universal direction ie front or back of df
-    def CGM_fill_decay(self, _df, _dir):
-        count = _df.isna().sum()
-        baseline = 88   #This is avg baseline Blood Glucose
-        decay_window = 8 #typical decay time is 1 hour
-        i = 0
-        if _dir == 'forward':
-            first_nan = _df.size - count
-            glucose = _df[first_nan-1]
-            decay_rate = (glucose - baseline)/decay_window
-            for index in range(count):
-                new_glucose = glucose - (decay_rate*index)
-                if new_glucose < baseline:
-                    new_glucose = baseline
-                _df[first_nan + index] = int(new_glucose)
-        else:
-            ramp = count - decay_window
-            glucose = _df[count]
-            decay_rate = (glucose - baseline)/decay_window
-            for index in range(count):
-                if index > ramp:
-                    i+=1
-                    new_glucose = baseline + (decay_rate*i)
-                    _df[index] = int(new_glucose)
-                else:
-                    _df[index] = baseline
-        return _df
-        
-    def bg_multi_plot(self):
-        # prepare some data
-        df_health_data = self.healthData['combined_Health'].set_index("Datetime", drop=False).loc[self.initialDay:self.finalDay,:]
-        df_health_data = df_health_data.set_index("Date", drop=False) 
-        df_health_data.sort_values(['Datetime'], ascending=[True])
-        df_health_data = df_health_data.set_index("Datetime", drop = False)
-        df_period_CGM = self.healthData['CGMData'].set_index("Datetime", drop=False).loc[self.initialDay.strftime("%Y-%m-%d"):self.finalDay.strftime("%Y-%m-%d"),:]
-
-        response_meals = df_health_data.loc[(df_health_data['data_set'] == 'mealData') & (df_health_data['Net Carbs (g)'] >= self.adjustments['minCarbs'])]
-        exercise_data = df_health_data.loc[df_health_data['data_set'] == 'ExData']
-        exercise_data = exercise_data.set_index("Datetime", drop=False)
-        exercise_data = exercise_data.dropna(how='any', axis=1)
-        response_meals = response_meals.dropna(how='any', axis=1)
-        response_meals = response_meals.sort_values(['Carbs (g)'], ascending=[False])
-
-
-        p = figure(
-        tools="pan,box_zoom,hover,reset,save",
-        title="Multiline CGM", x_axis_type='datetime',
-        x_axis_label='Response', y_axis_label='Glucose',
-        y_range = (-100, 120), y_axis_location='right',
-        tooltips=[('Sample', '@xname, @yname'), ('Glucose Delta', '@GD'), ('Max Blood Glucose', '@bg'),
-                    ('Total Calories', '@cal'),('Total Carbs', '@carb'),('Food', '@Food')],
-        y_minor_ticks=2,output_backend="webgl"
-        )
-        # current_date = current_date + timedelta(days=1)
-        output_file(self.output + os.path.sep +'Multiplot.html')
-        df_plot_data = pd.DataFrame(columns=['Date','Meal','Time','Glucose'])
-        df_data_summary = pd.DataFrame(columns=['Date','Time','Meal','Peak Glucose','Glucose Delta', 'Calories','Carbs'])
-        for meal_time, meal in response_meals.iterrows():
-            # output to static HTML file
-            name_string = meal['Food Name']
-            name_string = name_string.split(', ')
-            determine_time = meal.Datetime
-            end_time = determine_time + timedelta(hours=self.resWindow.hour)
-            df_meal_CGM = df_period_CGM.loc[determine_time:end_time,:]
-            df_meal_exercise = exercise_data.loc[determine_time:end_time,:]
+            path = dir_path + os.path.sep + name_string + '(' +time.strftime("%Y_%m_%d") + ')' + '.html'
 
-            try:
-                the_beginning = pd.to_datetime(df_meal_CGM.iloc[0]['Datetime']).to_pydatetime()
-            except: #Missing Data at times due to lack of sensor
+            df_meal_CGM = meal_responses.get(event)
+            if df_meal_CGM is None: #Missing Data at times due to lack of sensor
                 print('Data Failure, abandoning ' + meal['Food Name'] + ' Date => ' + meal['Date'].strftime("%Y-%m-%d"))
+                self.count('data failures')
                 continue
-            the_beginning = the_beginning.time()
-            df_meal_CGM["Response Time"] = df_meal_CGM.Datetime - timedelta(hours=the_beginning.hour, minutes=the_beginning.minute, seconds=the_beginning.second)
-            df_meal_CGM["Response Time"] = df_meal_CGM["Response Time"].dt.time
-            df_meal_CGM["ZeroedCGMS"] = df_meal_CGM.UDT_CGMS - df_meal_CGM.iloc[0]["UDT_CGMS"]
             if len(df_meal_CGM) < 10:
+                self.count('short responses')
                 continue
-            wl = len(df_meal_CGM) -1
-            if not wl % 2:
-                wl = len(df_meal_CGM) - 2
-            pOrder = 9 if (9 < wl-1) else (wl-1)
-            df_meal_CGM["filtered"] = df_meal_CGM[['ZeroedCGMS']].apply(savgol_filter, window_length=(wl), polyorder=(pOrder))
-            
-            df_temp = pd.DataFrame({'Date':[meal_time],'Meal':[name_string[0]],'Time':[list(df_meal_CGM["Response Time"])],'Glucose':[list(df_meal_CGM.ZeroedCGMS)]})
-            df_plot_data = df_plot_data.append(df_temp)
-            meal['Delta'] = df_meal_CGM.UDT_CGMS.max() - df_meal_CGM.UDT_CGMS[0]
-            meal['Peak'] = df_meal_CGM.UDT_CGMS.max()
-            xydata = {'RespTime': df_meal_CGM["Response Time"], 'zg': df_meal_CGM.filtered,
-                    'xname': [meal['Date'].strftime("%Y-%m-%d") for i in range(len(df_meal_CGM.ZeroedCGMS))],
-                    'yname': [meal['Time'].strftime("%H:%M:%S") for i in range(len(df_meal_CGM.ZeroedCGMS))],
-                    'bg': [str(int(meal['Peak'])) for i in range(len(df_meal_CGM.ZeroedCGMS))],
-                    'GD': [str(int(meal['Delta'])) for i in range(len(df_meal_CGM.ZeroedCGMS))],
-                    'cal': [str(int(meal['Energy (kcal)'])) for i in range(len(df_meal_CGM.ZeroedCGMS))],
-                    'carb': [str(int(meal['Net Carbs (g)'])) for i in range(len(df_meal_CGM.ZeroedCGMS))],
-                    'Food': [meal['Food Name'] for i in range(len(df_meal_CGM.ZeroedCGMS))]}
-            source = ColumnDataSource(xydata)
-            line = p.line('RespTime', 'zg', line_width=4, color='grey', alpha=0.05,
-                            muted_color='#e82317', muted_alpha=0.9, legend_label=name_string[0], source=source)
-            df_data_summary = df_data_summary.append({'Date': meal['Date'],
-                                    'Time': meal['Time'],
-                                    'Meal': meal['Food Name'],
-                                    'Peak Glucose': meal['Peak'],
-                                    'Glucose Delta': meal['Delta'],
-                                    'Calories': meal['Energy (kcal)'],
-                                    'Carbs': meal['Net Carbs (g)']},ignore_index=True)
-
-        # show the results
-        hour_one = 10800000/3
-        response_hour = Span(location=hour_one,
-                                    dimension='height', line_color='black',
-                                    line_dash='dashed', line_width=3)
-        p.add_layout(response_hour)
-
-        hour_two = (10800000/3)*2
-        response_hour_2 = Span(location=hour_two,
-                                dimension='height', line_color='black',
-                                line_dash='dashed', line_width=3)
-        p.add_layout(response_hour_2)
-        p.title.text = "Glucose Response"
-        p.xgrid[0].grid_line_color=None
-        p.ygrid[0].grid_line_alpha=0.5
-        p.xaxis.axis_label = 'Time'
-        p.yaxis.axis_label = 'mmol/dl'
-        p.yaxis.ticker = [-100, -50, 0, 50, 100, 120]
-        p.plot_width = 3200
-        p.plot_height = 3100
-        p.legend.click_policy="mute"
-        temp_list = list(df_plot_data['Meal'])
-
-        mid_box = BoxAnnotation(bottom=-100, top=40, fill_alpha=0.1, fill_color='green')
-        high_box = BoxAnnotation(bottom=40, top=140, fill_alpha=0.1, fill_color='red')
-
-        p.add_layout(mid_box)
-        p.add_layout(high_box)
-
-        p.add_layout(p.legend[0], 'left')
-        show(p)
+
+            # a later meal with the same name on the same day overwrites the page, as it always has
+            items[path] = {'path': path, 'title': str(meal['Food Name']), 'name': str(meal['Food Name']),
+                           'date': meal['Date'].strftime("%Y-%m-%d"), 'delta': meal_summary.loc[event, 'Delta'],
+                           'carbs': meal['Net Carbs (g)'], 'energy': meal['Energy (kcal)'],
+                           'workouts': [workouts[row] for row in meal_exercise.get(event, [])],
+                           'cgm': self.plot_points(df_meal_CGM[['Datetime', 'UDT_CGMS', 'Filtered']].reset_index(drop=True), 'Filtered')}
+        return items
+
+    # Glucose over the whole dateRange on one page.  The line is downsampled to plotPoints and the band
+    # behind it has plotPoints / 2 stretches, so the page is the same size for a week or for years.
+    def bg_long_overview(self):
+        cgm = self.shared('cgm')[['Datetime', 'UDT_CGMS']].reset_index(drop=True)
+        points = self.plotPoints or len(cgm)
+        item = {'cgm': self.plot_points(cgm), 'band': envelope(cgm, 'Datetime', 'UDT_CGMS', max(points // 2, 1)),
+                'start': self.initialDay.strftime("%Y-%m-%d"), 'end': self.finalDay.strftime("%Y-%m-%d"), 'readings': int(cgm['UDT_CGMS'].count())}
+        self.count_rows(len(cgm))
+        self.count('points drawn', len(item['cgm']) + len(item['band']))
+        self.publish(long_overview_page(item), self.output + os.path.sep + 'Glucose Overview.html', 'Glucose Overview')
+
+    # Glycemic metrics per day and per meal, each with rolling versions over metricsWindow days
+    def bg_metrics(self):
+        df_period_CGM = self.shared('cgm')
+        response_meals = self.shared('meals')
+
+        df_meals = self.shared('mealMetrics').copy()
+        summary_meals = response_meals.iloc[df_meals.index]
+        df_meals.insert(0, 'Date', summary_meals['Date'].values)
+        df_meals.insert(1, 'Time', clock_strings(summary_meals['Time']).values)
+        df_meals.insert(2, 'Meal', summary_meals['Food Name'].astype(str).values)
+        df_meals.insert(3, 'Net Carbs (g)', summary_meals['Net Carbs (g)'].values)
+        df_meals.insert(4, 'Energy (kcal)', summary_meals['Energy (kcal)'].values)
+        df_rolling_meals = rolling_meal_metrics(self.shared('mealMetrics'), summary_meals['Datetime'].values, self.metricsWindow)
+        df_meals = df_meals.join(df_rolling_meals.add_suffix(' (' + str(self.metricsWindow) + 'd)'))
+
+        df_daily = self.shared('dayMetrics').copy()
+        df_daily['Meal iAUC'] = df_meals.groupby('Date')['iAUC'].sum().reindex(df_daily.index, fill_value=0)
+        df_rolling = rolling_metrics(df_period_CGM, self.metricsWindow, self.rangeBands)
+        df_daily = df_daily.join(df_rolling.drop(columns=['Samples']).add_suffix(' (' + str(self.metricsWindow) + 'd)'))
+        self.healthData['DailyMetrics'] = df_daily
+        self.healthData['MealMetrics'] = df_meals
+        self.count_rows(len(df_period_CGM))
+        self.count('days', len(df_daily))
+        self.count('meals', len(df_meals))
+
+        for name, df in (('MetricsDaily.csv', df_daily.reset_index()), ('MetricsMeals.csv', df_meals)):
+            start = perf_counter()
+            df.assign(Date=df['Date'].dt.strftime('%Y-%m-%d')).to_csv(self.output + os.path.sep + name, index=False)
+            self.record_file(self.output + os.path.sep + name, perf_counter() - start)
+        print("Metrics for " + str(len(df_daily)) + " days and " + str(len(df_meals)) + " meals")
+
+    # Replace the dateRange meals (only the re-rendered days on an incremental run) of the food profile store kept
+    # in outputFileDirectory/foodprofiles with this run's
+    def bg_food_profiles(self):
+        store = FoodProfiles(self.output + os.path.sep + 'foodprofiles', self.resWindow.hour * 60, self.samplePeriod)
+        response_meals = self.shared('meals')
+        responses = self.shared('mealResponses')
+        spans = [(self.initialDay, self.finalDay)]
+        if self.renderDays is not None:
+            rendered = np.flatnonzero(response_meals['Datetime'].dt.normalize().isin(pd.to_datetime(list(self.renderDays))))
+            responses = responses.loc[responses['Event'].isin(rendered)]
+            spans = [(max(pd.Timestamp(day), pd.Timestamp(self.initialDay)), min(pd.Timestamp(day) + pd.Timedelta(days=1) - pd.Timedelta(1), pd.Timestamp(self.finalDay)))
+                     for day in self.renderDays]
+        updated = store.update(response_meals, responses, spans)
+        self.count_rows(responses['Event'].nunique())
+        self.count('foods updated', updated)
+        print("Updated the profiles of " + str(updated) + " foods, " + str(len(store.profiles)) + " foods profiled")
+
+    def bg_multi_plot(self):
+        # prepare some data
+        response_meals = self.shared('meals')
+        meal_responses = self.shared('mealResponses')
+        meal_summary = self.shared('mealMetrics')
+        for event in np.setdiff1d(np.arange(len(response_meals)), meal_summary.index): #Missing Data at times due to lack of sensor
+            meal = response_meals.iloc[event]
+            print('Data Failure, abandoning ' + meal['Food Name'] + ' Date => ' + meal['Date'].strftime("%Y-%m-%d"))
+            self.count('data failures')
+        meal_summary = meal_summary.loc[meal_summary['Samples'] >= 10]
+        # largest carbs first, for the drawing order and MealResponse.csv
+        meal_summary = meal_summary.iloc[np.argsort(-response_meals['Carbs (g)'].values[meal_summary.index].astype(float), kind='mergesort')]
+        self.count_rows(len(response_meals))
+        self.count('responses plotted', len(meal_summary))
+        meal_responses = meal_responses.loc[meal_responses['Event'].isin(meal_summary.index)]
+        meal_responses = meal_responses.assign(RespTime=meal_responses['Minutes'] * 60000, # ms since the meal for the datetime axis
+                                               filtered=self.smooth(meal_responses, 'ZeroedCGMS'))
+
+        # one row per meal with its response samples as arrays
+        summary_meals = response_meals.iloc[meal_summary.index]
+        bounds = np.flatnonzero(np.diff(meal_responses['Event'].values)) + 1
+        xs = dict(zip(pd.unique(meal_responses['Event']), np.split(meal_responses['RespTime'].values, bounds)))
+        ys = dict(zip(pd.unique(meal_responses['Event']), np.split(meal_responses['filtered'].values, bounds)))
+        df_multiplot = pd.DataFrame({'xs': [xs[event] for event in meal_summary.index], 'ys': [ys[event] for event in meal_summary.index],
+                                     'Food': summary_meals['Food Name'].astype(str).values,
+                                     'Group': summary_meals['Food Name'].astype(str).str.split(', ').str[0].values,
+                                     'xname': summary_meals['Date'].dt.strftime("%Y-%m-%d").values,
+                                     'yname': summary_meals['Datetime'].dt.strftime("%H:%M:%S").values,
+                                     'bg': meal_summary['Peak'].astype(int).astype(str).values,
+                                     'GD': meal_summary['Delta'].astype(int).astype(str).values,
+                                     'cal': summary_meals['Energy (kcal)'].astype(int).astype(str).values,
+                                     'carb': summary_meals['Net Carbs (g)'].astype(int).astype(str).values})
+
+        df_data_summary = pd.DataFrame({'Date': summary_meals['Date'].values,
+                                    'Time': clock_strings(summary_meals['Time']).values,
+                                    'Meal': summary_meals['Food Name'].values,
+                                    'Peak Glucose': meal_summary['Peak'].values,
+                                    'Glucose Delta': meal_summary['Delta'].values,
+                                    'Calories': summary_meals['Energy (kcal)'].values,
+                                    'Carbs': summary_meals['Net Carbs (g)'].values})
+
+        p = multiplot_page({'responses': df_multiplot})
+        self.publish(p, self.output + os.path.sep + 'Multiplot.html', 'Multiplot')
+        start = perf_counter()
         df_data_summary.to_csv(self.output + os.path.sep + 'MealResponse.csv', index=False)
-        print('just wait until I finish')
+        self.record_file(self.output + os.path.sep + 'MealResponse.csv', perf_counter() - start)
 
     # Methods to perform deeper correlational analysis
+    # Correlates the enabled daily features (and their values on the correlationLags previous days) with
+    # the glycemic metrics of each day and the response of each meal
     def deep_analysis(self):
-        for analysis in self.analysis:
-            print("deep analysis", analysis)
\ No newline at end of file
+        days = pd.date_range(self.initialDay.date(), self.finalDay.date(), freq='D', name='Date')
+        features = []
+        if self.analysis.get('sleepCorr'):
+            features.append(sleep_features(self.dayIndex.frame('sleepData'), days))
+        if self.analysis.get('exerciseCorr'):
+            features.append(exercise_features(self.dayIndex.frame('ExData'), days))
+        if self.analysis.get('biometricCorr'):
+            features.append(biometric_features(self.dayIndex.frame('BioData'), self.biometrics, days))
+        if self.analysis.get('supplementCorr'):
+            features.append(supplement_features(self.dayIndex.frame('mealData'), self.supplements, days))
+        df_features = pd.concat([pd.DataFrame(index=days)] + features, axis=1)
+        if df_features.empty or not len(df_features.columns):
+            print("No correlation features available, skipping deep analysis")
+            return
+        df_features = lag_features(df_features, self.correlationLags)
+
+        df_daily = self.shared('dayMetrics').reindex(days)
+        response_meals = self.shared('meals')
+        df_meals = self.shared('mealMetrics')
+        meal_days = response_meals['Date'].values[df_meals.index]
+
+        day_outcomes = ['Mean', 'SD', 'CV %', 'MAGE', [label for label in df_daily if label.startswith('TIR')][0]]
+        df_correlations = pd.concat([
+            correlate(df_features, df_daily[day_outcomes]).assign(Level='Day'),
+            correlate(df_features.reindex(meal_days), df_meals[['Peak', 'Delta', 'iAUC', 'Time to Peak']]).assign(Level='Meal')],
+            ignore_index=True)
+        self.healthData['Correlations'] = df_correlations
+        self.count_rows(len(days) + len(df_meals))
+        self.count('features', len(df_features.columns))
+        self.count('correlations', len(df_correlations))
+
+        start = perf_counter()
+        df_correlations.round(4).to_csv(self.output + os.path.sep + 'Correlations.csv', index=False)
+        self.record_file(self.output + os.path.sep + 'Correlations.csv', perf_counter() - start)
+        print("Strongest correlations over " + str(len(days)) + " days and " + str(len(df_meals)) + " meals")
+        print(df_correlations.loc[df_correlations['p'] < 0.05].head(10).round(3).to_string(index=False))
@@ -0,0 +1,251 @@
+import os
+import numpy as np
+from time import perf_counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from bokeh.io import save
+from bokeh.layouts import column, row
+from bokeh.models import BasicTicker, BoxAnnotation, CDSView, ColorBar, ColumnDataSource, IndexFilter, Label, LinearColorMapper, PreText, PrintfTickFormatter, Span
+from bokeh.plotting import figure
+from bokeh.resources import CDN
+
+
+# Writes one standalone html page per prepared item.  Items are plain dicts (small frames, strings and
+# numbers) built up front by CGMProcessing so they can be shipped to a pool of worker processes, every
+# item carries the 'path' and 'title' of its page.  A page that fails is reported and skipped.
+# run returns the (path, seconds) of every page written and the (path, error) of every page that failed.
+class RenderScheduler:
+    def __init__(self, workers=1):
+        self.workers = workers if workers else os.cpu_count()
+
+    def run(self, name, builder, items):
+        written, failed = [], []
+        total = len(items)
+        if not total:
+            print(name + ": nothing to render")
+            return written, failed
+        step = max(1, total // 10)
+
+        def collect(item, seconds, error):
+            if error is None:
+                written.append((item['path'], seconds))
+            else:
+                failed.append((item['path'], error))
+                print("Failed to render " + item['path'] + " (" + str(error) + ")")
+            done = len(written) + len(failed)
+            if done % step == 0 or done == total:
+                print(name + ": " + str(done) + "/" + str(total) + " pages")
+
+        if self.workers > 1 and total > 1:
+            with ProcessPoolExecutor(max_workers=min(self.workers, total)) as pool:
+                futures = {pool.submit(render_page, builder, item): item for item in items}
+                for future in as_completed(futures):
+                    error = future.exception()
+                    collect(futures[future], None if error else future.result(), error)
+        else:
+            for item in items:
+                try:
+                    collect(item, render_page(builder, item), None)
+                except Exception as e:
+                    collect(item, None, e)
+        if failed:
+            print(name + ": " + str(len(failed)) + " of " + str(total) + " pages failed")
+        return written, failed
+
+
+def render_page(builder, item):
+    start = perf_counter()
+    save(builder(item), filename=item['path'], resources=CDN, title=item['title'])
+    return perf_counter() - start
+
+
+def response_figure():
+    return figure(
+    tools="pan,box_zoom,reset,save",
+    title="log axis example", x_axis_type='datetime',
+    x_axis_label='Response', y_axis_label='Glucose'
+    )
+
+
+def glucose_bands(p):
+    p.add_layout(BoxAnnotation(top=70, fill_alpha=0.1, fill_color='red'))
+    p.add_layout(BoxAnnotation(bottom=70, top=140, fill_alpha=0.1, fill_color='green'))
+    p.add_layout(BoxAnnotation(bottom=140, fill_alpha=0.1, fill_color='red'))
+
+
+def boxed_label(x, y, text):
+    return Label(x=x, y=y, x_units='screen', text=text, render_mode='css',
+        border_line_color='black', border_line_alpha=1.0,
+        background_fill_color='white', background_fill_alpha=1.0)
+
+
+def text_table(text):
+    return PreText(text=text, width=500)
+
+
+def finish_figure(p, title, x_label):
+    p.title.text = title
+    p.title.align = "center"
+    p.xgrid[0].grid_line_color=None
+    p.ygrid[0].grid_line_alpha=0.5
+    p.xaxis.axis_label = x_label
+    p.yaxis.axis_label = 'mmol/dl'
+
+
+# Step response of one meal.  item: cgm (Datetime, UDT_CGMS, Filtered), workouts [(start, end, title, calories)],
+# name, date, delta, carbs, energy
+def meal_response_page(item):
+    p = response_figure()
+    cgm = item['cgm']
+    p.line(cgm['Datetime'], cgm['Filtered'], line_width=4, line_color="black")
+
+    for start, end, title, calories in item['workouts']:
+        p.add_layout(BoxAnnotation(left=start, right=end, fill_alpha=0.4, fill_color='blue'))
+        p.add_layout(boxed_label(300, int(cgm.UDT_CGMS.min()*1.2), "Activity = " + str(title)))
+        p.add_layout(boxed_label(300, int(cgm.UDT_CGMS.min()*1.1), 'Calories = ' + str(calories)))
+    glucose_bands(p)
+
+    peak = cgm.UDT_CGMS.max()
+    p.add_layout(boxed_label(70, int(peak*.95), "Glucose Delta = " + str(item['delta'])))
+    p.add_layout(boxed_label(70, int(peak*.93), 'Peak = ' + str(peak) + ' mmol/dl'))
+    p.add_layout(boxed_label(70, int(peak*.90), 'Total Net Carbs = ' + str(item['carbs']) + ' g'))
+    p.add_layout(boxed_label(70, int(peak*.87), 'Total Calories = ' + str(item['energy'])))
+    finish_figure(p, "Glucose Response of " + item['name'], 'Time (' + item['date'] + ')')
+    return p
+
+
+# Glucose around one workout.  item: cgm (Datetime, UDT_CGMS, Filtered), start, end, meals [meal start],
+# meal_length, workout_text, meal_text, name, calories, delta, date
+def exercise_response_page(item):
+    p = response_figure()
+    cgm = item['cgm']
+    p.line(cgm['Datetime'], cgm['Filtered'], line_width=4, line_color="black")
+
+    columns = [text_table(item['workout_text'])]
+    if item['meal_text']:
+        columns.append(text_table(item['meal_text']))
+    for meal_start in item['meals']:
+        p.add_layout(BoxAnnotation(left=meal_start, right=meal_start + item['meal_length'], fill_alpha=0.4, fill_color='red'))
+    p.add_layout(BoxAnnotation(left=item['start'], right=item['end'], fill_alpha=0.4, fill_color='blue'))
+    p.add_layout(boxed_label(300, int(cgm.UDT_CGMS.min()*1.2), "Activity = " + str(item['name'])))
+    p.add_layout(boxed_label(300, int(cgm.UDT_CGMS.min()*1.1), 'Calories = ' + str(item['calories'])))
+    glucose_bands(p)
+
+    peak = cgm.UDT_CGMS.max()
+    p.add_layout(boxed_label(70, int(peak*.95), "Glucose Delta = " + str(item['delta'])))
+    p.add_layout(boxed_label(70, int(peak*.93), 'Peak = ' + str(peak) + ' mmol/dl'))
+    finish_figure(p, "Glucose Response of " + item['name'], 'Time (' + item['date'] + ')')
+    return row(p, column(columns))
+
+
+# Full day of glucose with workouts and meals marked.  item: cgm (Datetime, UDT_CGMS), workouts and meals
+# [(start, end)], exercise_text, meal_text, sleep_text, date
+def daily_overview_page(item):
+    p = response_figure()
+    cgm = item['cgm']
+    columns = [text_table(item[text]) for text in ('exercise_text', 'meal_text', 'sleep_text') if item[text]]
+    for start, end in item['workouts']:
+        p.add_layout(BoxAnnotation(left=start, right=end, fill_alpha=0.4, fill_color='blue'))
+    for start, end in item['meals']:
+        p.add_layout(BoxAnnotation(left=start, right=end, fill_alpha=0.4, fill_color='red'))
+    p.line(cgm["Datetime"], cgm.UDT_CGMS, line_width=4, line_color="black")
+    glucose_bands(p)
+
+    finish_figure(p, "Glucose Response Full Day Overview " + item['date'], item['date'])
+    return row(p, column(columns))
+
+
+# Zeroed response of every meal on one graph.  item: responses, one row per meal with xs (ms since the
+# meal) and ys (zeroed, smoothed glucose) arrays plus the meal's Food, Group (legend entry), xname (date),
+# yname (time), bg (peak), GD (delta), cal and carb.  All meals share one source holding every sample
+# once and the meal details once per meal.  Each legend entry draws its meals through an index view of
+# that source, so clicking it still highlights them.
+def multiplot_page(item):
+    p = figure(
+    tools="pan,box_zoom,hover,reset,save",
+    title="Multiline CGM", x_axis_type='datetime',
+    x_axis_label='Response', y_axis_label='Glucose',
+    y_range = (-100, 120), y_axis_location='right',
+    tooltips=[('Sample', '@xname, @yname'), ('Glucose Delta', '@GD'), ('Max Blood Glucose', '@bg'),
+                ('Total Calories', '@cal'),('Total Carbs', '@carb'),('Food', '@Food')],
+    y_minor_ticks=2,output_backend="webgl"
+    )
+    responses = item['responses']
+    source = ColumnDataSource({column: list(responses[column]) if column in ('xs', 'ys') else responses[column].values
+                               for column in ('xs', 'ys', 'Food', 'xname', 'yname', 'bg', 'GD', 'cal', 'carb')})
+    for group, rows in responses.groupby('Group', sort=False).indices.items():
+        p.multi_line('xs', 'ys', source=source, view=CDSView(source=source, filters=[IndexFilter(rows.tolist())]),
+                     line_width=4, color='grey', alpha=0.05, muted_color='#e82317', muted_alpha=0.9, legend_label=group)
+
+    for hour in (1, 2):
+        p.add_layout(Span(location=3600000 * hour, dimension='height', line_color='black', line_dash='dashed', line_width=3))
+    p.title.text = "Glucose Response"
+    p.xgrid[0].grid_line_color=None
+    p.ygrid[0].grid_line_alpha=0.5
+    p.xaxis.axis_label = 'Time'
+    p.yaxis.axis_label = 'mmol/dl'
+    p.yaxis.ticker = [-100, -50, 0, 50, 100, 120]
+    p.plot_width = 3200
+    p.plot_height = 3100
+    p.add_layout(BoxAnnotation(bottom=-100, top=40, fill_alpha=0.1, fill_color='green'))
+    p.add_layout(BoxAnnotation(bottom=40, top=140, fill_alpha=0.1, fill_color='red'))
+    if p.legend:
+        p.legend.click_policy="mute"
+        p.add_layout(p.legend[0], 'left')
+    return p
+
+
+# Glucose over a long date range.  item: cgm (Datetime, UDT_CGMS) already downsampled, band (Datetime, Low,
+# High) the range of each stretch of time, start, end (dates) and readings (count before downsampling)
+def long_overview_page(item):
+    p = figure(tools="xpan,xwheel_zoom,box_zoom,reset,save", x_axis_type='datetime', output_backend="webgl")
+    band = item['band']
+    p.varea(band['Datetime'], band['Low'], band['High'], fill_color='grey', fill_alpha=0.3)
+    cgm = item['cgm']
+    p.line(cgm['Datetime'], cgm['UDT_CGMS'], line_width=2, line_color="black")
+    glucose_bands(p)
+    p.plot_width = 1600
+    p.plot_height = 600
+    finish_figure(p, "Glucose " + item['start'] + " to " + item['end'] + " (" + str(len(cgm)) + " of " + str(item['readings']) + " readings drawn)",
+                  'Date')
+    return p
+
+
+# Max glucose of every 15 minute slot, one column per day.  item: dates, times (the axis labels), one entry
+# per slot in xname (date), yname (time), colors, bg and foods, palette, total_days
+def heatmap_page(item):
+    mapper = LinearColorMapper(palette=item['palette'], low=60, high=180)#low=df_CGM_period_max.min(), high=df_CGM_period_max.min())
+    data=dict(
+        xname=item['xname'],
+        yname=item['yname'],
+        colors=item['colors'],
+        bg=item['bg'],
+        foods=item['foods'],
+    )
+
+    p = figure(title="Blood Glucose over " + str(item['total_days']) + " days",
+            x_axis_location="above", tools="hover,pan,box_zoom,reset,save",
+            x_range=item['dates'], y_range=item['times'], output_backend="webgl",
+            tooltips=[('Sample', '@yname, @xname'), ('Foods', '@foods'), ('Blood Glucose', '@bg')])
+
+    p.plot_width = 1200
+    p.plot_height = 800
+    p.grid.grid_line_color = None
+    p.axis.axis_line_color = None
+    p.axis.major_tick_line_color = None
+    p.axis.major_label_text_font_size = "7px"
+    p.axis.major_label_standoff = 0
+    p.xaxis.major_label_orientation = np.pi/3
+
+    p.rect('xname', 'yname', 0.9, 0.9, source=data,
+        color='colors',
+        line_color=None,
+        hover_line_color='black', hover_color='colors',
+        )
+
+    color_bar = ColorBar(color_mapper=mapper, location=(0, 0),
+                        ticker=BasicTicker(desired_num_ticks=len(item['palette'])-2),
+                        formatter=PrintfTickFormatter(format="%d"))
+
+    p.add_layout(color_bar, 'right')
+    p.add_layout(color_bar, 'left')
+    return p
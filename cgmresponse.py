@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+
+# Row bounds [lo, hi) of the sorted `times` falling inside each [starts, ends] window.  A window with a
+# missing (NaT) start or end is empty, NaT would otherwise sort after every time.
+def window_bounds(times, starts, ends):
+    times = np.asarray(times, dtype='datetime64[ns]')
+    starts = np.asarray(starts, dtype='datetime64[ns]')
+    ends = np.asarray(ends, dtype='datetime64[ns]')
+    lo = np.searchsorted(times, starts, side='left')
+    hi = np.searchsorted(times, ends, side='right')
+    return lo, np.where(np.isnat(starts) | np.isnat(ends), lo, np.maximum(hi, lo))
+
+
+# Expand per-window bounds into (window id, row position) pairs without a python loop
+def expand_bounds(lo, hi):
+    counts = hi - lo
+    ids = np.repeat(np.arange(len(lo)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return ids, lo[ids] + offsets
+
+
+# Start and end of every event window.  `lead` moves the window start before the event and `window`
+# is the length after that start.  Both accept a single timedelta or one value per event.
+def event_windows(events, window, lead=pd.Timedelta(0)):
+    event_times = events['Datetime'].values.astype('datetime64[ns]')
+    starts = event_times - np.asarray(pd.to_timedelta(lead), dtype='timedelta64[ns]')
+    ends = starts + np.asarray(pd.to_timedelta(window), dtype='timedelta64[ns]')
+    return starts, ends
+
+
+# Pair every event with the rows of `other` (sorted by Datetime) that fall inside its window.
+# Returns a frame of 'Event' (position in events) and 'Row' (position in other).
+def window_join(events, other, window, lead=pd.Timedelta(0)):
+    starts, ends = event_windows(events, window, lead)
+    lo, hi = window_bounds(other['Datetime'].values, starts, ends)
+    ids, rows = expand_bounds(lo, hi)
+    return pd.DataFrame({'Event': ids, 'Row': rows})
+
+
+# Long form table of the CGM response to every event in one sorted merge pass.  Each row holds the
+# event id (position in events), the sample time, the minutes since the event, the glucose reading
+# and the glucose zeroed on the first sample of that event's window.
+def extract_responses(events, cgm, window, lead=pd.Timedelta(0), value='UDT_CGMS'):
+    starts, ends = event_windows(events, window, lead)
+    cgm_times = cgm['Datetime'].values.astype('datetime64[ns]')
+    lo, hi = window_bounds(cgm_times, starts, ends)
+    ids, rows = expand_bounds(lo, hi)
+
+    glucose = cgm[value].values.astype(float)
+    first = glucose[lo[ids]]
+    event_times = events['Datetime'].values.astype('datetime64[ns]')
+    minutes = (cgm_times[rows] - event_times[ids]) / np.timedelta64(1, 'm')
+
+    return pd.DataFrame({'Event': ids,
+                         'Datetime': cgm_times[rows],
+                         'Minutes': minutes,
+                         value: glucose[rows],
+                         'ZeroedCGMS': glucose[rows] - first})
+
+
+# Per event Samples, Baseline (first sample), Peak, Nadir and Delta (peak minus baseline) of a response table
+def summarize_responses(responses, value='UDT_CGMS'):
+    if responses.empty:
+        return pd.DataFrame(columns=['Samples', 'Baseline', 'Peak', 'Nadir', 'Delta'])
+    ids = responses['Event'].values
+    starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+    glucose = responses[value].values
+    peak = np.maximum.reduceat(glucose, starts)
+    samples = np.diff(np.append(starts, len(ids)))
+    return pd.DataFrame({'Samples': samples, 'Baseline': glucose[starts], 'Peak': peak,
+                         'Nadir': np.minimum.reduceat(glucose, starts), 'Delta': peak - glucose[starts]},
+                        index=pd.Index(ids[starts], name='Event'))
@@ -0,0 +1,46 @@
+import numpy as np
+from scipy.signal import savgol_filter
+
+
+# Validate the configured Savitzky-Golay window (an odd number of samples, 0 spans each whole response)
+# and polynomial order
+def check_smoothing(window, order):
+    if isinstance(window, bool) or not isinstance(window, int) or window < 0:
+        raise ValueError("smoothWindow must be 0 or a positive odd number of samples, got " + str(window))
+    if window and not window % 2:
+        raise ValueError("smoothWindow must be odd, got " + str(window))
+    if isinstance(order, bool) or not isinstance(order, int) or order < 0:
+        raise ValueError("smoothOrder must be a non negative whole number, got " + str(order))
+    if window and order >= window:
+        raise ValueError("smoothOrder (" + str(order) + ") must be less than smoothWindow (" + str(window) + ")")
+    return window, order
+
+
+# Window and order used on responses of `length` samples.  The window never runs past the longest odd
+# span shorter than the response (the span a window of 0 asks for) and the order stays below the window.
+def fit_window(length, window, order):
+    span = length - 1 if (length - 1) % 2 else length - 2
+    if not window or window > span:
+        window = span
+    return window, min(order, window - 1)
+
+
+# Savitzky-Golay filter every window of a long form response table in a few vectorized calls.  `ids`
+# gives the window of every value, with each window's values contiguous (as extract_responses returns
+# them).  Windows are bucketed by length and every bucket is filtered as one 2-D array.  Windows of
+# fewer than 3 samples are too short to smooth and keep their values.
+def smooth_windows(values, ids, window=0, order=9):
+    values = np.asarray(values, dtype=float)
+    ids = np.asarray(ids)
+    smoothed = values.copy()
+    if not len(values):
+        return smoothed
+    starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+    lengths = np.diff(np.append(starts, len(ids)))
+    for length in np.unique(lengths):
+        if length < 3:
+            continue
+        rows = starts[lengths == length][:, None] + np.arange(length)
+        window_length, polyorder = fit_window(length, window, order)
+        smoothed[rows] = savgol_filter(values[rows], window_length, polyorder, axis=1)
+    return smoothed
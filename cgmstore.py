@@ -0,0 +1,152 @@
+import sys
+import json
+import sqlite3
+import argparse
+import threading
+import numpy as np
+import pandas as pd
+
+NAT = np.iinfo(np.int64).min # the integer of NaT, what missing timestamps and durations are read back as
+
+
+def quoted(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+# Column values as sqlite can store them: timestamps and durations as integer nanoseconds (UTC for
+# timezone aware timestamps), missing values as NULL
+def encode(series):
+    if isinstance(series.dtype, pd.DatetimeTZDtype):
+        series = series.dt.tz_convert('UTC').dt.tz_localize(None)
+    if pd.api.types.is_datetime64_any_dtype(series) or pd.api.types.is_timedelta64_dtype(series):
+        values = series.values.astype('int64').astype(object)
+        values[series.isna().values] = None
+        return values
+    values = series.values.astype(object) # numpy numbers become python ones sqlite can bind
+    values[series.isna().values] = None
+    return values
+
+
+def is_time(dtype):
+    return dtype.startswith(('datetime64', 'timedelta64'))
+
+
+# A column read back from sqlite with the dtype it was saved with.  Timestamps and durations are read
+# with NULL as NAT, so they stay exact integers instead of going through float.
+def decode(series, dtype):
+    if is_time(dtype):
+        values = series.values.astype('int64')
+        if dtype.startswith('timedelta64'):
+            return pd.Series(values.view('timedelta64[ns]'), index=series.index)
+        stamps = pd.Series(values.view('datetime64[ns]'), index=series.index)
+        return stamps.dt.tz_localize('UTC').dt.tz_convert(dtype.split(',', 1)[1].strip(' ]')) if ',' in dtype else stamps
+    if dtype == 'object':
+        return series.where(series.notna(), np.nan)
+    try:
+        return series.astype(dtype)
+    except (TypeError, ValueError): # integers or booleans with missing values
+        return series.astype(float)
+
+
+# Cleaned health data kept in an embedded SQLite database, one table per data set (CGMData, mealData,
+# ExData, ...) indexed on Datetime, with the pandas dtype of every column recorded next to it.  Saving a
+# source replaces the rows of the time range it was read for, so the database builds up the whole
+# history across exports while a query only reads the rows of its time range.  Safe to use from the
+# pipeline's stage threads.
+class HealthStore:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS columns (data_set TEXT, name TEXT, dtype TEXT, '
+                                    'PRIMARY KEY (data_set, name))')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS sources (data_set TEXT PRIMARY KEY, fingerprint TEXT)')
+
+    def data_sets(self):
+        with self.lock:
+            return [row[0] for row in self.connection.execute('SELECT DISTINCT data_set FROM columns ORDER BY data_set')]
+
+    def dtypes(self, key):
+        return dict(self.connection.execute('SELECT name, dtype FROM columns WHERE data_set = ? ORDER BY rowid', (key,)).fetchall())
+
+    # Replace the rows of `key` between start and end (inclusive) with the rows of df in that range
+    def save(self, key, df, start, end):
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        df = df.loc[(df['Datetime'] >= start) & (df['Datetime'] <= end)]
+        table = quoted(key)
+        with self.lock, self.connection:
+            known = self.dtypes(key)
+            if not known:
+                self.connection.execute('CREATE TABLE IF NOT EXISTS ' + table + ' ("Datetime" INTEGER)')
+                self.connection.execute('CREATE INDEX IF NOT EXISTS ' + quoted(key + '_Datetime') + ' ON ' + table + ' ("Datetime")')
+                known = {'Datetime': None}
+            for column in df.columns:
+                if column not in known:
+                    self.connection.execute('ALTER TABLE ' + table + ' ADD COLUMN ' + quoted(column))
+                self.connection.execute('INSERT OR REPLACE INTO columns VALUES (?, ?, ?)', (key, column, str(df[column].dtype)))
+            self.connection.execute('DELETE FROM ' + table + ' WHERE "Datetime" >= ? AND "Datetime" <= ?', (start.value, end.value))
+            self.connection.executemany('INSERT INTO ' + table + ' (' + ', '.join(quoted(column) for column in df.columns) + ') VALUES (' +
+                                        ', '.join('?' * len(df.columns)) + ')', zip(*[encode(df[column]) for column in df.columns]))
+        return len(df)
+
+    # Fingerprint (see cgmcache.source_fingerprint) of the file the rows of `key` were last saved from
+    def source(self, key):
+        with self.lock:
+            row = self.connection.execute('SELECT fingerprint FROM sources WHERE data_set = ?', (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    # Save the rows of a source file read between start and end, recording the file's fingerprint
+    def save_source(self, key, df, start, end, fingerprint):
+        rows = self.save(key, df, start, end)
+        with self.lock, self.connection:
+            self.connection.execute('INSERT OR REPLACE INTO sources VALUES (?, ?)', (key, json.dumps(fingerprint)))
+        return rows
+
+    # Rows of `key` between start and end (inclusive, either may be None), only the ones with `column`
+    # at least `minimum` when given, in time order and indexed by Datetime like the DayIndex frames
+    def query(self, key, start=None, end=None, column=None, minimum=None):
+        conditions, parameters = [], []
+        if start is not None:
+            conditions.append('"Datetime" >= ?')
+            parameters.append(pd.Timestamp(start).value)
+        if end is not None:
+            conditions.append('"Datetime" <= ?')
+            parameters.append(pd.Timestamp(end).value)
+        if column is not None:
+            conditions.append(quoted(column) + ' >= ?')
+            parameters.append(minimum)
+        with self.lock:
+            dtypes = self.dtypes(key)
+            if not dtypes:
+                return pd.DataFrame(columns=['Date', 'Time', 'Datetime'])
+            sql = 'SELECT ' + ', '.join('coalesce(' + quoted(name) + ', ' + str(NAT) + ') AS ' + quoted(name) if is_time(dtype) else quoted(name)
+                                        for name, dtype in dtypes.items()) + ' FROM ' + quoted(key)
+            sql += (' WHERE ' + ' AND '.join(conditions) if conditions else '') + ' ORDER BY "Datetime"'
+            df = pd.read_sql_query(sql, self.connection, params=parameters)
+        for name, dtype in dtypes.items():
+            df[name] = decode(df[name], dtype)
+        return df.set_index('Datetime', drop=False)
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+# python cgmstore.py C:\CGMOutputData\health.sqlite mealData 07/01/2020 08/01/2020 --column "Net Carbs (g)" --minimum 5
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Query the cleaned health data saved by CGMProcessing')
+    parser.add_argument('database')
+    parser.add_argument('data_set', nargs='?', help='data set to query, the data sets in the database are listed without it')
+    parser.add_argument('start', nargs='?')
+    parser.add_argument('end', nargs='?')
+    parser.add_argument('--column', help='only rows with this column at least --minimum')
+    parser.add_argument('--minimum', type=float, default=0)
+    args = parser.parse_args()
+
+    store = HealthStore(args.database)
+    if args.data_set is None:
+        print('\n'.join(store.data_sets()))
+        sys.exit(0)
+    rows = store.query(args.data_set, args.start, args.end, args.column, args.minimum if args.column else None)
+    print(rows.drop(columns=['Datetime']).to_string(index=False) if not rows.empty else "No rows")
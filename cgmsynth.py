@@ -0,0 +1,138 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+
+# Foods logged by the generator: name, group, net carbs and kcal per serving, glucose rise per gram of carbs
+FOODS = [
+    ('Oatmeal, Rolled', 'Breakfast', 27.0, 150.0, 1.1), ('Banana, Raw', 'Breakfast', 24.0, 105.0, 1.4),
+    ('Eggs, Scrambled', 'Breakfast', 2.0, 180.0, 0.5), ('Greek Yogurt', 'Breakfast', 7.0, 130.0, 0.8),
+    ('Rice, White', 'Lunch', 44.0, 205.0, 1.6), ('Sandwich, Turkey', 'Lunch', 32.0, 320.0, 1.2),
+    ('Salad, Mixed Greens', 'Lunch', 4.0, 60.0, 0.4), ('Lentil Soup', 'Lunch', 20.0, 180.0, 0.7),
+    ('Chicken Breast', 'Dinner', 0.0, 198.0, 0.3), ('Pasta, Cooked', 'Dinner', 40.0, 220.0, 1.3),
+    ('Sweet Potato, Baked', 'Dinner', 21.0, 103.0, 1.0), ('Salmon, Atlantic', 'Dinner', 0.0, 233.0, 0.2),
+    ('Apple, Raw', 'Snacks', 20.0, 95.0, 0.9), ('Dark Chocolate', 'Snacks', 10.0, 170.0, 0.8),
+    ('Almonds', 'Snacks', 3.0, 164.0, 0.3), ('Ice Cream, Vanilla', 'Snacks', 28.0, 270.0, 1.5),
+]
+SUPPLEMENTS = ['Creatine Monohydrate', 'Magnesium Glycinate']
+ACTIVITIES = [('Running', 'Morning Run', 10.0), ('Cycling', 'Evening Ride', 8.0), ('Strength Training', 'Strength', 6.0),
+              ('Walking', 'Walk', 4.0)]
+# Meal slots: group, earliest hour, latest hour, probability of a meal in the slot
+SLOTS = [('Breakfast', 6.5, 9.5, 0.9), ('Lunch', 11.5, 14.0, 0.9), ('Dinner', 17.5, 20.5, 0.95), ('Snacks', 15.0, 22.0, 0.5)]
+
+
+# Write a deterministic set of exports (the same seed and arguments always give the same files) in the
+# layouts open_files reads: xDrip (semicolon separated, DAY dd.mm.yyyy and TIME), Cronometer servings and
+# biometrics, Garmin activities and Oura sleep.  The CGM trace follows the logged meals, workouts and
+# sleep, with sensor gaps (about `gap_rate` per day plus a warm up gap every 10 days) and a
+# `duplicate_rate` fraction of repeated readings.  Returns the dataFiles paths.
+def generate(directory, days, start='2020-07-07', seed=0, gap_rate=0.5, duplicate_rate=0.002):
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp(start).normalize()
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    day_starts = pd.date_range(start, periods=days, freq='D')
+
+    # Oura sleep, the record of a day is the night ending that morning
+    sleep_score = rng.integers(50, 96, days)
+    readiness = np.clip(sleep_score + rng.integers(-10, 11, days), 40, 100)
+    bedtime_start = day_starts - pd.to_timedelta(rng.integers(0, 150, days) + 30, unit='m')
+    bedtime_end = bedtime_start + pd.to_timedelta(rng.integers(330, 570, days), unit='m')
+    sleep = pd.DataFrame({'date': day_starts.strftime('%Y-%m-%d'), 'Sleep Score': sleep_score, 'Readiness Score': readiness,
+                          'Bedtime Start': bedtime_start.strftime('%Y-%m-%dT%H:%M:%S-07:00'),
+                          'Bedtime End': bedtime_end.strftime('%Y-%m-%dT%H:%M:%S-07:00')})
+
+    # Cronometer servings, a meal in every slot taken plus supplements with breakfast
+    meal_days, meal_minutes, meal_foods = [], [], []
+    for group, earliest, latest, chance in SLOTS:
+        taken = np.flatnonzero(rng.random(days) < chance)
+        choices = [index for index, food in enumerate(FOODS) if food[1] == group]
+        meal_days.append(taken)
+        meal_minutes.append(rng.integers(int(earliest * 60), int(latest * 60), len(taken)))
+        meal_foods.append(rng.choice(choices, len(taken)))
+    meal_days, meal_minutes, meal_foods = np.concatenate(meal_days), np.concatenate(meal_minutes), np.concatenate(meal_foods)
+    servings = rng.choice([1.0, 1.0, 1.5, 2.0], len(meal_foods))
+    order = np.lexsort((meal_minutes, meal_days))
+    meal_days, meal_minutes, meal_foods, servings = meal_days[order], meal_minutes[order], meal_foods[order], servings[order]
+    meal_times = day_starts[meal_days] + pd.to_timedelta(meal_minutes, unit='m')
+    net_carbs = np.array([FOODS[index][2] for index in meal_foods]) * servings
+    meals = pd.DataFrame({'Day': meal_times.strftime('%Y-%m-%d'), 'Time': meal_times.strftime('%I:%M %p'),
+                          'Group': [FOODS[index][1] for index in meal_foods], 'Food Name': [FOODS[index][0] for index in meal_foods],
+                          'Amount': [str(serving) + ' serving' for serving in servings],
+                          'Energy (kcal)': (np.array([FOODS[index][3] for index in meal_foods]) * servings).round(1),
+                          'Carbs (g)': (net_carbs + rng.integers(0, 6, len(net_carbs))).round(1), 'Net Carbs (g)': net_carbs.round(1)})
+    supplement_rows = []
+    for supplement in SUPPLEMENTS:
+        taken = np.flatnonzero(rng.random(days) < 0.5)
+        times = day_starts[taken] + pd.to_timedelta(rng.integers(420, 540, len(taken)), unit='m')
+        supplement_rows.append(pd.DataFrame({'Day': times.strftime('%Y-%m-%d'), 'Time': times.strftime('%I:%M %p'), 'Group': 'Breakfast',
+                                             'Food Name': supplement, 'Amount': '5 g', 'Energy (kcal)': 0.0, 'Carbs (g)': 0.0, 'Net Carbs (g)': 0.0}))
+    meals = pd.concat([meals] + supplement_rows).sort_values(['Day'], kind='mergesort')
+
+    # Garmin activities on about half the days
+    workout_days = np.flatnonzero(rng.random(days) < 0.5)
+    activity = rng.integers(0, len(ACTIVITIES), len(workout_days))
+    duration = rng.integers(20, 100, len(workout_days))
+    workout_times = day_starts[workout_days] + pd.to_timedelta(rng.integers(360, 1200, len(workout_days)), unit='m')
+    calories = (duration * np.array([ACTIVITIES[index][2] for index in activity]) * rng.uniform(0.8, 1.2, len(duration))).astype(int)
+    exercise = pd.DataFrame({'Activity Type': [ACTIVITIES[index][0] for index in activity], 'Date': workout_times.strftime('%Y-%m-%d %H:%M:%S'),
+                             'Title': [ACTIVITIES[index][1] for index in activity], 'Distance': (duration / 10).round(2),
+                             'Calories': ['{:,}'.format(calorie) for calorie in calories],
+                             'Time': pd.to_timedelta(duration, unit='m').map(lambda span: str(span).split(' ')[-1]),
+                             'Avg HR': rng.integers(100, 150, len(duration)), 'Max HR': rng.integers(150, 190, len(duration))})
+
+    # Cronometer biometrics every morning
+    bio_times = day_starts + pd.to_timedelta(rng.integers(360, 480, days), unit='m')
+    systolic, diastolic = rng.integers(105, 140, days), rng.integers(65, 90, days)
+    weight = (180 + np.cumsum(rng.normal(0, 0.3, days))).round(1)
+    bio = pd.concat([
+        pd.DataFrame({'Day': bio_times.strftime('%Y-%m-%d'), 'Time': bio_times.strftime('%I:%M %p'), 'Group': 'Biometrics',
+                      'Metric': 'Blood Pressure', 'Unit': 'mmHg', 'Amount': [str(s) + '/' + str(d) for s, d in zip(systolic, diastolic)]}),
+        pd.DataFrame({'Day': bio_times.strftime('%Y-%m-%d'), 'Time': bio_times.strftime('%I:%M %p'), 'Group': 'Biometrics',
+                      'Metric': 'Weight', 'Unit': 'lbs', 'Amount': weight})]).sort_values(['Day'], kind='mergesort')
+
+    # xDrip CGM on a 5 minute grid: baseline with a dawn rise, worse after short nights, plus meal rises and
+    # workout dips spread over time by convolution, plus sensor noise
+    samples = days * 288
+    minutes = np.arange(samples) * 5.0
+    hours = minutes / 60 % 24
+    glucose = 92 + 8 * np.sin(2 * np.pi * (hours - 4) / 24) + np.repeat((80 - sleep_score) * 0.15, 288)
+    meal_slots = (meal_days * 288 + meal_minutes // 5).astype(int)
+    impulses = np.bincount(meal_slots, net_carbs * np.array([FOODS[index][4] for index in meal_foods]), minlength=samples)[:samples]
+    kernel_minutes = np.arange(0, 240, 5.0)
+    glucose += np.convolve(impulses, (kernel_minutes / 45) * np.exp(1 - kernel_minutes / 45), mode='full')[:samples]
+    workout_slots = (workout_days * 288 + (workout_times - day_starts[workout_days]).total_seconds().values // 300).astype(int)
+    dips = np.bincount(workout_slots, calories * 0.04, minlength=samples)[:samples]
+    glucose -= np.convolve(dips, np.sin(np.pi * np.arange(0, 120, 5.0) / 120), mode='full')[:samples]
+    glucose += np.convolve(rng.normal(0, 2.5, samples), np.ones(3) / 3, mode='same')
+    glucose = np.clip(glucose, 40, 400).round()
+
+    keep = np.ones(samples, dtype=bool)
+    gap_starts = rng.integers(0, samples, rng.poisson(gap_rate * days))
+    for gap_start, length in zip(gap_starts, rng.integers(3, 36, len(gap_starts))):
+        keep[gap_start:gap_start + length] = False
+    for warm_up in range(0, samples, 2880):
+        keep[warm_up:warm_up + 24] = False
+    readings = np.flatnonzero(keep)
+    readings = np.sort(np.concatenate([readings, rng.choice(readings, int(len(readings) * duplicate_rate))]))
+    reading_times = start + pd.to_timedelta(minutes[readings] * 60 + rng.integers(0, 60, len(readings)), unit='s')
+    cgm = pd.DataFrame({'DAY': reading_times.strftime('%d.%m.%Y'), 'TIME': reading_times.strftime('%H:%M'),
+                        'UDT_CGMS': glucose[readings].astype(int), 'BG_LEVEL': '', 'CH_GR': '', 'BOLUS': '', 'REMARK': ''})
+
+    files = {'CGMData': os.path.join(directory, 'xdrip.csv'), 'mealData': os.path.join(directory, 'servings.csv'),
+             'ExData': os.path.join(directory, 'activities.csv'), 'sleepData': os.path.join(directory, 'oura.csv'),
+             'BioData': os.path.join(directory, 'biometrics.csv')}
+    cgm.to_csv(files['CGMData'], sep=';', index=False)
+    meals.to_csv(files['mealData'], index=False)
+    exercise.to_csv(files['ExData'], index=False)
+    sleep.to_csv(files['sleepData'], index=False)
+    bio.to_csv(files['BioData'], index=False)
+    return files
+
+
+# python cgmsynth.py <directory> <days> [seed]
+if __name__ == '__main__':
+    files = generate(sys.argv[1], int(sys.argv[2]), seed=int(sys.argv[3]) if len(sys.argv) > 3 else 0)
+    for key, path in files.items():
+        print(key + ': ' + path)
@@ -0,0 +1,99 @@
+import os
+import json
+import pandas as pd
+
+
+# Candidate formats tried when a source does not list its own, day first dates before month first
+DATE_FORMATS = ['%Y-%m-%d', '%d.%m.%Y', '%d-%m-%Y', '%d/%m/%Y', '%m/%d/%Y', '%Y/%m/%d',
+                '%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%d.%m.%Y %H:%M', '%d.%m.%Y %H:%M:%S',
+                '%m/%d/%Y %H:%M', '%m/%d/%Y %H:%M:%S', '%Y-%m-%dT%H:%M:%S']
+TIME_FORMATS = ['%H:%M', '%H:%M:%S', '%I:%M %p', '%I:%M:%S %p']
+INFER = 'infer'
+
+
+# Parses timestamp columns with an explicit format detected once per source key and column from a
+# sample of the values.  Detected formats are remembered (and kept in `path` when given) so later
+# chunks and later runs of the same source skip detection.
+class TimestampParser:
+    def __init__(self, path=None, sample_size=200):
+        self.path = path
+        self.sample_size = sample_size
+        self.formats = {}
+        if self.path and os.path.isfile(self.path):
+            try:
+                with open(self.path, 'r') as stream:
+                    self.formats = json.load(stream)
+            except (OSError, ValueError):
+                self.formats = {}
+
+    def detect(self, values, candidates):
+        sample = values.dropna()
+        sample = sample.iloc[:self.sample_size]
+        for fmt in candidates:
+            if pd.to_datetime(sample, format=fmt, errors='coerce').notna().all():
+                return fmt
+        return INFER
+
+    def format_for(self, key, column, values, candidates):
+        name = key + '/' + column
+        fmt = self.formats.get(name)
+        # a remembered format that no longer fits the sample (new export layout) is detected again
+        if fmt is not None and fmt != INFER and self.detect(values, [fmt]) == INFER:
+            fmt = None
+        if fmt is None:
+            fmt = self.detect(values, candidates)
+            if fmt == INFER:
+                print("No known format for " + name + " values like " + str(values.dropna().head(1).tolist()) + ", inferring")
+            self.formats[name] = fmt
+            self.save()
+        return fmt
+
+    def parse(self, key, column, values, candidates=DATE_FORMATS):
+        fmt = self.format_for(key, column, values, candidates)
+        stamps = pd.to_datetime(values, format=None if fmt == INFER else fmt, errors='coerce', cache=True)
+        if stamps.isna().sum() > values.isna().sum():
+            stamps = self.fill_unparsed(key + '/' + column, values, stamps, fmt, candidates)
+        return stamps
+
+    # Values past the sample the detected format doesn't fit (the layout changes partway through the
+    # file) are parsed with the other candidates in order, values none of them parse are reported
+    # instead of being silently dropped
+    def fill_unparsed(self, name, values, stamps, fmt, candidates):
+        for candidate in [other for other in candidates if other != fmt] + ([INFER] if fmt != INFER else []):
+            unparsed = stamps.isna() & values.notna()
+            if not unparsed.any():
+                break
+            stamps[unparsed] = pd.to_datetime(values[unparsed], format=None if candidate == INFER else candidate, errors='coerce', cache=True)
+        unparsed = stamps.isna() & values.notna()
+        if unparsed.any():
+            print(str(unparsed.sum()) + " values of " + name + " match no known format, like " + str(values[unparsed].head(1).tolist()) + ", dropped")
+        return stamps
+
+    # Time of day as a timedelta since midnight
+    def parse_clock(self, key, column, values, candidates=TIME_FORMATS):
+        clock = self.parse(key, column, values, candidates)
+        return clock - clock.dt.normalize()
+
+    def save(self):
+        if not self.path:
+            return
+        try:
+            with open(self.path, 'w') as stream:
+                json.dump(self.formats, stream)
+        except OSError:
+            pass
+
+
+# ISO timestamps carrying a utc offset (Oura writes '2020-07-06T23:00:00-07:00').  With a timezone the
+# instants are converted to that zone's local time, otherwise each value keeps the wall clock time it
+# was recorded with.  Either way the result is naive datetime64[ns] like every other column.
+def parse_offset_timestamps(values, timezone=None):
+    if timezone:
+        stamps = pd.to_datetime(values, utc=True, errors='coerce')
+        return stamps.dt.tz_convert(timezone).dt.tz_localize(None)
+    return pd.to_datetime(values.str[:19], format='%Y-%m-%dT%H:%M:%S', errors='coerce')
+
+
+# 'HH:MM:SS' strings for a Time (timedelta since midnight) column, used when printing tables
+def clock_strings(values):
+    return (pd.Timestamp(0) + pd.to_timedelta(values)).dt.strftime('%H:%M:%S')
@@ -1,10 +1,11 @@
 import yaml
 import os
+import sys
 
-from cgmprocessing import CGMProcessing
+from cgmprocessing import CGMProcessing, CGMProcessingError
 
-def validate_yaml():
-    with open("config.yaml", 'r') as stream:
+def validate_yaml(path="config.yaml"):
+    with open(path, 'r') as stream:
         try:
             parameters = yaml.safe_load(stream)
         except yaml.YAMLError as exc:
@@ -33,13 +34,24 @@ def validate_yaml():
 
 
 if __name__ == '__main__':
-
-    parameters = validate_yaml()
-
-    instance = CGMProcessing(parameters)
-
-    instance.capture_data()
-    instance.clean_data()
-    instance.process_mealData()
-    instance.deep_analysis()
-
+    # python main.py [config.yaml] [--headless] [--profile] [--trace-memory] [--dashboard]
+    flags = {'--headless': 'headless', '--profile': 'profile', '--trace-memory': 'traceMemory', '--dashboard': 'dashboard'}
+    args = [arg for arg in sys.argv[1:] if arg not in flags]
+    parameters = validate_yaml(*args[:1])
+    for flag, key in flags.items():
+        if flag in sys.argv:
+            parameters[key] = True
+
+    try:
+        instance = CGMProcessing(parameters)
+        if parameters.get('dashboard', False):
+            instance.dashboard()
+            sys.exit(0)
+        manifest = instance.run()
+    except CGMProcessingError as e:
+        print("Processing stopped: " + str(e))
+        sys.exit(1)
+    print(str(len(manifest['files'])) + " files written to " + manifest['outputFileDirectory'] + " in " + str(manifest['seconds']) + " seconds")
+    if manifest['failed']:
+        print(str(len(manifest['failed'])) + " files failed, see manifest.json")
+        sys.exit(1)
@@ -0,0 +1,54 @@
+import os
+import json
+import pytest
+import yaml
+
+from benchmark import benchmark_parameters
+from cgmbatch import cohort_configs, run_cohort
+from cgmsynth import generate
+
+
+def write_config(path, parameters):
+    with open(path, 'w') as stream:
+        yaml.safe_dump(parameters, stream)
+    return str(path)
+
+
+# A directory lists its yaml files, a manifest lists configs relative to itself as a list or by user
+def test_cohort_configs(tmp_path):
+    for name in ('b.yaml', 'a.yml', 'notes.txt'):
+        (tmp_path / name).write_text('')
+    assert cohort_configs(str(tmp_path)) == [('a', str(tmp_path / 'a.yml')), ('b', str(tmp_path / 'b.yaml'))]
+    manifest = tmp_path / 'cohort.yaml'
+    manifest.write_text(yaml.safe_dump(['a.yml', 'sub/c.yaml']))
+    assert cohort_configs(str(manifest)) == [('a', str(tmp_path / 'a.yml')), ('c', str(tmp_path / 'sub' / 'c.yaml'))]
+    manifest.write_text(yaml.safe_dump({'users': {'alice': 'a.yml', 7: 'b.yaml'}}))
+    assert cohort_configs(str(manifest)) == [('alice', str(tmp_path / 'a.yml')), ('7', str(tmp_path / 'b.yaml'))]
+
+
+def test_run_cohort_rejects_shared_names_and_outputs(tmp_path):
+    first = write_config(tmp_path / 'first.yaml', {'outputFileDirectory': str(tmp_path / 'out')})
+    second = write_config(tmp_path / 'second.yaml', {'outputFileDirectory': str(tmp_path / 'out')})
+    with pytest.raises(ValueError, match="share a name"):
+        run_cohort([('u', first), ('u', second)], log_dir=str(tmp_path / 'logs'))
+    with pytest.raises(ValueError, match="share an outputFileDirectory"):
+        run_cohort([('u', first), ('v', second)], log_dir=str(tmp_path / 'logs'))
+
+
+# A user whose data is missing fails alone, the summary adds up the users' manifests
+def test_run_cohort_isolates_failures(tmp_path):
+    users = []
+    for user in ('ok', 'broken'):
+        files = generate(str(tmp_path / user), 2)
+        if user == 'broken':
+            os.remove(files['CGMData'])
+        output = tmp_path / (user + '-out')
+        os.makedirs(output)
+        users.append((user, write_config(tmp_path / (user + '.yaml'), benchmark_parameters(files, str(output), 2, ['bg_heatmap'], 1))))
+    summary = run_cohort(users, workers=2, log_dir=str(tmp_path / 'logs'))
+    results = {result['user']: result for result in summary['results']}
+    assert summary['users'] == 2 and summary['succeeded'] == 1 and summary['failed'] == ['broken']
+    assert results['broken']['status'] == 'failed' and results['broken']['error']
+    with open(tmp_path / 'ok-out' / 'manifest.json') as stream:
+        assert results['ok']['files'] == len(json.load(stream)['files']) == summary['files'] > 0
+    assert os.path.isfile(tmp_path / 'logs' / 'broken.log')
@@ -0,0 +1,41 @@
+import os
+import pandas as pd
+
+from cgmcache import SourceCache, day_digests
+
+
+def write(path, text, mtime=None):
+    with open(path, 'w') as stream:
+        stream.write(text)
+    if mtime is not None:
+        os.utime(path, ns=(mtime, mtime))
+
+
+# A cached frame is reused while the file is unchanged (a touch with the same content included) and
+# dropped when the content, the parser version or the variant change
+def test_cache_fingerprint(tmp_path):
+    source = str(tmp_path / 'meals.csv')
+    write(source, 'Day,Food Name\n2020-07-01,Oatmeal\n', mtime=1_000_000_000_000_000_000)
+    frame = pd.DataFrame({'Food Name': ['Oatmeal']})
+    cache = SourceCache(str(tmp_path / 'cache'), version=1)
+    assert cache.load(source, 'mealData') is None
+    cache.store(source, 'mealData', frame)
+    pd.testing.assert_frame_equal(cache.load(source, 'mealData'), frame)
+
+    os.utime(source, ns=(2_000_000_000_000_000_000, 2_000_000_000_000_000_000))
+    pd.testing.assert_frame_equal(cache.load(source, 'mealData'), frame)
+    assert cache.load(source, 'mealData', variant='2020-07-01/2020-07-08') is None
+    assert SourceCache(str(tmp_path / 'cache'), version=2).load(source, 'mealData') is None
+
+    write(source, 'Day,Food Name\n2020-07-01,Apples\n', mtime=2_000_000_000_000_000_000)
+    assert cache.load(source, 'mealData') is None
+
+
+# Editing one row changes only that day's digest
+def test_day_digests_change_with_rows():
+    df = pd.DataFrame({'Datetime': pd.to_datetime(['2020-07-01 08:00', '2020-07-01 12:00', '2020-07-02 08:00']), 'Value': [1, 2, 3]})
+    before = day_digests(df)
+    df.loc[1, 'Value'] = 5
+    after = day_digests(df)
+    assert list(before) == ['2020-07-01', '2020-07-02']
+    assert before['2020-07-01'] != after['2020-07-01'] and before['2020-07-02'] == after['2020-07-02']
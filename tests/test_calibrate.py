@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+from cgmcalibrate import calibration_ramp, calibration_steps, correct_calibrations
+
+
+# Every reading against every calibration still ahead of it within the window
+def test_calibration_ramp_against_loop():
+    rng = np.random.default_rng(4)
+    start = np.datetime64('2020-07-07T00:00')
+    times = start + np.sort(rng.integers(0, 3 * 24 * 60, 400)).astype('timedelta64[m]')
+    events = start + np.sort(rng.choice(3 * 24 * 60, 12, replace=False)).astype('timedelta64[m]')
+    steps = rng.normal(0, 25, 12)
+    window = pd.Timedelta(hours=6)
+    expected = np.zeros(len(times))
+    for position, time in enumerate(times):
+        for event, step in zip(events, steps):
+            ahead = (event - time) / np.timedelta64(1, 'm')
+            if 0 < ahead < 360:
+                expected[position] += step * (1 - ahead / 360)
+    np.testing.assert_allclose(calibration_ramp(times, events, steps, window), expected, atol=1e-9)
+
+
+def readings(values, start='2020-07-07 06:00'):
+    times = pd.date_range(start, periods=len(values), freq='5min')
+    return pd.DataFrame({'Datetime': times, 'UDT_CGMS': np.asarray(values, dtype=float)})
+
+
+# A level shift on steady glucose is a calibration, a meal rise of the same size is not
+def test_calibration_steps_finds_shift_only():
+    steady = 110 + np.tile([0, 1, -1, 0], 10)
+    shifted = np.r_[steady[:20], steady[20:] + 30]
+    positions, steps = calibration_steps(readings(shifted)['Datetime'].values, shifted)
+    assert positions.tolist() == [20] and np.isclose(steps[0], 30)
+    rise = np.r_[steady[:20], 110 + np.arange(1, 21) * 8.0]
+    assert len(calibration_steps(readings(rise)['Datetime'].values, rise)[0]) == 0
+
+
+# The readings in the window before a calibration ramp up to its step, the raw readings are kept
+def test_correct_calibrations():
+    values = np.r_[np.full(30, 100.0), np.full(10, 124.0)]
+    df = readings(values)
+    df.loc[5, 'UDT_CGMS'] = np.nan
+    corrected, events = correct_calibrations(df, pd.Timedelta(minutes=60))
+    assert list(events) == [df['Datetime'].values[30]]
+    assert corrected['Raw CGMS'].equals(df['UDT_CGMS'])
+    ahead = (30 - np.arange(18, 30)) * 5
+    np.testing.assert_allclose(corrected['UDT_CGMS'].values[18:30], 100 + 24 * (1 - ahead / 60))
+    assert (corrected['UDT_CGMS'].values[30:] == 124).all() and np.isnan(corrected['UDT_CGMS'].values[5])
@@ -0,0 +1,26 @@
+from types import SimpleNamespace
+import pandas as pd
+
+from cgmprocessing import CGMProcessing
+from cgmtime import TimestampParser
+
+
+def clean(df):
+    processing = SimpleNamespace(timestamps=TimestampParser())
+    return CGMProcessing.clean_date_column(processing, df, 'test')
+
+
+# A missing date must not be taken for a date with a time of day and overwrite the Time column
+def test_missing_date_keeps_time():
+    df = pd.DataFrame({'Date': ['2020-07-01', None, '2020-07-02'], 'Time': ['08:30', '12:00', '19:15']})
+    df = clean(df)
+    assert df['Time'].tolist() == ['08:30', '12:00', '19:15']
+    assert df['Date'].isna().tolist() == [False, True, False]
+
+
+def test_dates_with_times_become_time_column():
+    df = pd.DataFrame({'Date': ['2020-07-01 08:30:00', None, '2020-07-02 19:15:00']})
+    df = clean(df)
+    assert df['Date'].tolist()[0] == pd.Timestamp('2020-07-01')
+    assert df['Time'].tolist()[0] == pd.Timedelta('08:30:00')
+    assert df['Time'].tolist()[2] == pd.Timedelta('19:15:00')
@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from cgmcorrelate import correlate, lag_features
+
+
+# Every pair matches scipy on the rows where both values are present
+def test_correlate_against_pairwise_scipy():
+    rng = np.random.default_rng(6)
+    features = pd.DataFrame(rng.normal(size=(40, 3)), columns=['Sleep Score', 'Steps', 'Magnesium'])
+    outcomes = pd.DataFrame({'Mean': 2 * features['Steps'] + rng.normal(size=40), 'iAUC': rng.normal(size=40)})
+    features = features.mask(rng.random((40, 3)) < 0.2)
+    outcomes = outcomes.mask(rng.random((40, 2)) < 0.2)
+    features['Constant'] = 1.0
+    features.loc[:35, 'Magnesium'] = np.nan
+
+    table = correlate(features, outcomes, min_samples=5).set_index(['Feature', 'Outcome'])
+    for feature in features:
+        for outcome in outcomes:
+            both = features[feature].notna() & outcomes[outcome].notna()
+            x, y = features.loc[both, feature], outcomes.loc[both, outcome]
+            if both.sum() < 5 or x.std() == 0:
+                assert (feature, outcome) not in table.index
+                continue
+            fit = stats.linregress(x, y)
+            row = table.loc[(feature, outcome)]
+            assert row['Samples'] == both.sum()
+            assert np.isclose(row['r'], fit.rvalue) and np.isclose(row['Slope'], fit.slope) and np.isclose(row['p'], fit.pvalue)
+    assert list(table['r'].abs()) == sorted(table['r'].abs(), reverse=True)
+
+
+def test_lag_features_shift_by_days():
+    features = pd.DataFrame({'Steps': [1.0, 2.0, 3.0]}, index=pd.date_range('2020-07-01', periods=3))
+    lagged = lag_features(features, 2)
+    assert lagged.columns.tolist() == ['Steps', 'Steps (lag 1)', 'Steps (lag 2)']
+    assert lagged['Steps (lag 2)'].tolist()[2] == 1.0 and np.isnan(lagged['Steps (lag 1)'].iloc[0])
@@ -0,0 +1,47 @@
+import os
+import matplotlib
+from bokeh.document import Document
+
+from benchmark import benchmark_parameters
+from cgmdashboard import Dashboard, LRUCache
+from cgmprocessing import CGMProcessing
+from cgmsynth import generate
+
+matplotlib.use('Agg')
+
+
+# Same hits, misses and kept keys as a plain list ordered by last use
+def test_lru_cache_against_list():
+    cache, used, hits = LRUCache(3), [], 0
+    for key in [1, 2, 3, 1, 4, 2, 5, 1, 1, 3]:
+        assert cache.get(key, lambda: key * 10) == key * 10
+        if key in used:
+            hits += 1
+            used.remove(key)
+        used = (used + [key])[-3:]
+    assert (cache.hits, cache.misses) == (hits, 10 - hits)
+    assert list(cache.values) == used
+
+
+# Pages are prepared on first request only, a day's meal options are the meals of that day
+def test_dashboard_pages(tmp_path):
+    files = generate(str(tmp_path / 'data'), 3)
+    output = str(tmp_path / 'output')
+    os.makedirs(output)
+    processing = CGMProcessing(benchmark_parameters(files, output, 3, ['bg_heatmap'], 1))
+    processing.pipeline.run(['capture_data', 'clean_data'])
+    dashboard = Dashboard(processing, 4)
+    day = str(dashboard.days[1])
+    dashboard.day_page(day)
+    dashboard.day_page(day)
+    assert (dashboard.cache.hits, dashboard.cache.misses) == (1, 1)
+
+    options = dashboard.meal_options(day)
+    meals = dashboard.meals.loc[dashboard.meals['Datetime'].dt.strftime('%Y-%m-%d') == day]
+    assert [label.split(' ', 1)[1] for position, label in options] == list(meals['Food Name'].astype(str))
+    assert options and dashboard.meal_page(int(options[0][0])) is not None
+
+    doc = Document()
+    dashboard.make_document(doc)
+    assert doc.title == 'CGM Dashboard' and len(doc.roots) == 1
+    assert not any(name.endswith('.html') for name in os.listdir(output))
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from cgmdownsample import check_downsampling, downsample, envelope, lttb_indices, min_max_indices
+
+
+def reference_lttb(x, y, budget):
+    n = len(x)
+    edges = np.linspace(1, n - 1, budget - 1).astype(int)
+    chosen, a = [0], 0
+    for bucket in range(budget - 2):
+        if bucket + 1 < budget - 2:
+            following = range(edges[bucket + 1], edges[bucket + 2])
+            avg_x = sum(x[i] for i in following) / len(following)
+            avg_y = sum(y[i] for i in following) / len(following)
+        else:
+            avg_x, avg_y = x[n - 1], y[n - 1]
+        best, best_area = None, -1
+        for i in range(edges[bucket], edges[bucket + 1]):
+            area = abs((x[a] - avg_x) * (y[i] - y[a]) - (x[a] - x[i]) * (avg_y - y[a]))
+            if area > best_area:
+                best, best_area = i, area
+        chosen.append(best)
+        a = best
+    return chosen + [n - 1]
+
+
+def reference_min_max(y, budget):
+    n, buckets = len(y), budget // 2
+    kept = set()
+    for bucket in range(buckets):
+        members = [i for i in range(n) if i * buckets // n == bucket]
+        kept.add(min(members, key=lambda i: y[i]))
+        kept.add(max(members, key=lambda i: y[i]))
+    return sorted(kept)
+
+
+@pytest.mark.parametrize('n, budget', [(1000, 50), (287, 10), (50, 49)])
+def test_lttb_against_loop(n, budget):
+    rng = np.random.default_rng(n)
+    x = np.cumsum(rng.uniform(1, 5, n))
+    y = 120 + rng.normal(0, 5, n).cumsum()
+    assert list(lttb_indices(x, y, budget)) == reference_lttb(x, y, budget)
+
+
+@pytest.mark.parametrize('n, budget', [(1000, 50), (287, 11), (30, 20)])
+def test_min_max_against_loop(n, budget):
+    y = 120 + np.random.default_rng(n).normal(0, 5, n).cumsum()
+    assert list(min_max_indices(np.arange(n), y, budget)) == reference_min_max(y, budget)
+
+
+# Missing readings are not downsampled but the first row of every gap is kept so the line breaks there
+def test_downsample_keeps_gaps():
+    times = pd.date_range('2020-07-07', periods=500, freq='5min')
+    values = 120 + np.sin(np.arange(500) / 10) * 40
+    values[100:130] = np.nan
+    values[300:301] = np.nan
+    df = pd.DataFrame({'Datetime': times, 'UDT_CGMS': values})
+    kept = downsample(df, 'Datetime', 'UDT_CGMS', 60)
+    assert len(kept) <= 62 and kept['UDT_CGMS'].isna().sum() == 2
+    assert {100, 300} <= set(kept.index) and {0, 499} <= set(kept.index)
+    assert kept['Datetime'].is_monotonic_increasing
+    assert downsample(df, 'Datetime', 'UDT_CGMS', 0) is df
+    with pytest.raises(ValueError):
+        check_downsampling('lttb', 5)
+
+
+def test_envelope_against_groupby():
+    times = pd.date_range('2020-07-07', periods=300, freq='5min')
+    values = 120 + np.random.default_rng(1).normal(0, 10, 300)
+    values[40:90] = np.nan
+    df = pd.DataFrame({'Datetime': times, 'UDT_CGMS': values})
+    band = envelope(df, 'Datetime', 'UDT_CGMS', 10)
+    measured = df.dropna()
+    span = (measured['Datetime'].iloc[-1] - measured['Datetime'].iloc[0]).value
+    bucket = np.minimum(((measured['Datetime'] - measured['Datetime'].iloc[0]).astype(np.int64) * 10 // span), 9)
+    expected = measured.groupby(bucket.values)['UDT_CGMS'].agg(['min', 'mean', 'max'])
+    np.testing.assert_allclose(band[['Low', 'Mean', 'High']].values, expected.values)
+    assert len(band) < 10
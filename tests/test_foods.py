@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+from cgmfoods import FoodProfiles, response_curves
+from cgmresponse import extract_responses
+
+
+def cgm(start, days):
+    times = pd.date_range(start, periods=days * 288, freq='5min')
+    return pd.DataFrame({'Datetime': times, 'UDT_CGMS': 100 + 40 * np.sin(np.arange(len(times)) / 10.0)})
+
+
+def meals(rows):
+    df = pd.DataFrame(rows, columns=['Datetime', 'Food Name', 'Net Carbs (g)'])
+    df['Datetime'] = pd.to_datetime(df['Datetime'])
+    return df
+
+
+def update(store, df, readings, start, end):
+    return store.update(df, extract_responses(df, readings, pd.Timedelta(hours=2)), [(pd.Timestamp(start), pd.Timestamp(end))])
+
+
+# A meal deleted or moved in a later export of the same days drops out of its food's profile
+def test_reexport_replaces_meals_of_its_range(tmp_path):
+    readings = cgm('2020-07-01', 3)
+    store = FoodProfiles(str(tmp_path), window=120)
+    first = meals([('2020-07-01 08:00', 'Oatmeal', 40), ('2020-07-02 08:00', 'Oatmeal', 40), ('2020-07-02 12:00', 'Apple', 20)])
+    update(store, first, readings, '2020-07-01', '2020-07-02 23:59')
+    assert store.profile('oatmeal')['Count'] == 2 and store.profile('apple')['Count'] == 1
+
+    # the apple was deleted and the second oatmeal moved to lunch, the first day is not in the export
+    second = meals([('2020-07-02 12:30', 'Oatmeal', 40)])
+    assert update(store, second, readings, '2020-07-02', '2020-07-02 23:59') == 2
+    assert store.profile('apple') is None
+    assert store.profile('oatmeal')['Count'] == 2
+    assert sorted(store.meals['Datetime'].astype(str)) == ['2020-07-01 08:00:00', '2020-07-02 12:30:00']
+    assert FoodProfiles(str(tmp_path)).profile('oatmeal')['Count'] == 2
+
+
+# Every curve is its response interpolated on its own, held at the first sample before it and NaN after the last
+def test_response_curves_against_interp():
+    responses = pd.DataFrame({'Event': [3, 3, 3, 7, 7, 7, 7], 'Minutes': [2.0, 9.0, 20.0, 0.0, 4.0, 11.0, 40.0],
+                              'ZeroedCGMS': [0.0, 14.0, 30.0, 0.0, -5.0, 10.0, 2.0]})
+    minutes = np.arange(0, 45, 5)
+    curves = response_curves(responses, minutes)
+    for event, response in responses.groupby('Event'):
+        expected = np.interp(minutes, response['Minutes'], response['ZeroedCGMS'])
+        expected[minutes > response['Minutes'].max()] = np.nan
+        assert np.allclose(curves.loc[event].values, expected, equal_nan=True)
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from cgmgrid import build_cgm_grid, build_slot_matrix, check_decay, decay_fill, refill_cgm_grid
+
+
+def readings(times, values):
+    times = pd.to_datetime(times)
+    return pd.DataFrame({'Date': times.normalize(), 'Time': times - times.normalize(), 'Datetime': times, 'UDT_CGMS': values})
+
+
+def grid_values(grid, start, end):
+    return grid.loc[start:end, 'UDT_CGMS'].tolist()
+
+
+def test_build_grid_snaps_and_interpolates():
+    df = readings(['2020-07-10 08:01', '2020-07-10 08:19', '2020-07-10 08:22', '2020-07-10 10:00'], [100.0, 130.0, 150.0, 90.0])
+    grid = build_cgm_grid(df, '2020-07-10 08:00', '2020-07-10 10:00', max_gap=60)
+    # 08:20 keeps the closer of the two readings, the slots up to it are interpolated on time, the
+    # 100 minute gap after it is left out
+    assert grid_values(grid, '2020-07-10 08:00', '2020-07-10 08:20') == list(np.round(np.linspace(100, 130, 5)))
+    assert grid['Synthesized'].tolist() == [False, True, True, True, False, False]
+    assert grid['Datetime'].tolist()[-1] == pd.Timestamp('2020-07-10 10:00')
+    assert (grid['Date'] + grid['Time'] == grid['Datetime']).all()
+
+
+# A changed reading just past midnight moves the interpolated samples before midnight as well
+def test_refill_matches_full_rebuild_across_midnight():
+    times = list(pd.date_range('2020-07-10 20:00', '2020-07-10 23:30', freq='5min')) + \
+        list(pd.date_range('2020-07-11 00:10', '2020-07-11 04:00', freq='5min'))
+    before = readings(times, [100.0] * len(times))
+    after = before.copy()
+    after.loc[after['Datetime'] == pd.Timestamp('2020-07-11 00:10'), 'UDT_CGMS'] = 160.0
+    start, end = pd.Timestamp('2020-07-10'), pd.Timestamp('2020-07-11 23:59')
+
+    previous = build_cgm_grid(before, start, end)
+    refilled = refill_cgm_grid(after, previous, [pd.Timestamp('2020-07-11')], start, end)
+    rebuilt = build_cgm_grid(after, start, end)
+    assert grid_values(refilled, '2020-07-10 23:30', '2020-07-11 00:10') == [100, 108, 115, 122, 130, 138, 145, 152, 160]
+    pd.testing.assert_frame_equal(refilled, rebuilt)
+
+
+
+# Every 15 minute slot of the heatmap holds the highest reading inside it, NaN without readings
+def test_slot_matrix_against_loop():
+    rng = np.random.default_rng(2)
+    times = pd.Timestamp('2020-07-10') + pd.to_timedelta(np.sort(rng.integers(0, 2 * 1440, 300)), unit='min')
+    df = readings(times, rng.integers(60, 250, 300).astype(float))
+    df = df.loc[(df['Datetime'] < pd.Timestamp('2020-07-10 03:00')) | (df['Datetime'] >= pd.Timestamp('2020-07-10 05:00'))]
+    matrix = build_slot_matrix(df, '2020-07-10 08:00', 2, period=15)
+    assert len(matrix) == 2 * 96 and matrix.index[0] == pd.Timestamp('2020-07-10')
+    for slot, value in matrix.items():
+        inside = df.loc[(df['Datetime'] >= slot) & (df['Datetime'] < slot + pd.Timedelta(minutes=15)), 'UDT_CGMS']
+        assert (np.isnan(value) and inside.empty) or value == inside.max()
+
+
+# A gap between two readings blends the decay from either side by distance, short gaps are interpolated
+def test_decay_fill_against_reference():
+    index = pd.date_range('2020-07-10 08:00', periods=7, freq='10min')
+    series = pd.Series([200.0, np.nan, np.nan, np.nan, np.nan, np.nan, 100.0], index=index)
+    filled = decay_fill(series, baseline=80, minutes=40, shape='linear')
+    # each side decays linearly to the baseline over 40 minutes, the two are blended by distance
+    for position in range(1, 6):
+        since, until = 10 * position, 60 - 10 * position
+        from_before = 80 + 120 * max(1 - since / 40, 0)
+        from_after = 80 + 20 * max(1 - until / 40, 0)
+        assert np.isclose(filled.iloc[position], (until * from_before + since * from_after) / 60)
+    interpolated = decay_fill(series, baseline=80, minutes=40, max_gap=60)
+    assert np.allclose(interpolated.values, np.linspace(200, 100, 7))
+
+
+# Gaps at either end decay exponentially from the reading next to them, within 5% of the baseline after `minutes`
+def test_decay_fill_edges():
+    index = pd.date_range('2020-07-10 08:00', periods=6, freq='20min')
+    series = pd.Series([np.nan, 180.0, 150.0, np.nan, np.nan, np.nan], index=index)
+    filled = decay_fill(series, baseline=90, minutes=60, shape='exponential')
+    assert np.isclose(filled.iloc[0], 90 + 90 * np.exp(-1))
+    assert np.allclose(filled.iloc[3:].values, [90 + 60 * np.exp(-3 * minutes / 60) for minutes in (20, 40, 60)])
+    assert abs(filled.iloc[5] - 90) < 0.05 * 60
+    assert filled.iloc[1:3].tolist() == [180.0, 150.0]
+    with pytest.raises(ValueError):
+        check_decay(90, 60, 'cubic')
+    with pytest.raises(ValueError):
+        check_decay(90, 0, 'linear')
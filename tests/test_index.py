@@ -0,0 +1,21 @@
+import numpy as np
+import pandas as pd
+
+from cgmindex import DayIndex
+
+
+# Every day's slice holds the rows a filter on the date finds, in time order
+def test_day_slices_against_filter():
+    rng = np.random.default_rng(1)
+    times = pd.Timestamp('2020-07-01') + pd.to_timedelta(rng.integers(0, 4 * 1440, 200), unit='min')
+    df = pd.DataFrame({'Datetime': times, 'Value': np.arange(200)})
+    df.loc[5, 'Datetime'] = pd.NaT
+    index = DayIndex()
+    index.add('events', df)
+
+    assert index.days('events') == sorted(set(np.delete(times, 5).date))
+    for day in pd.date_range('2020-06-30', '2020-07-05'):
+        expected = df.loc[df['Datetime'].dt.normalize() == day].sort_values('Datetime', kind='mergesort')
+        assert index.day('events', day)['Value'].tolist() == expected['Value'].tolist()
+    assert len(index.frame('events')) == 199
+    assert index.frame('missing').empty
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+from cgmingest import event_table, stream_source
+from cgmtime import TimestampParser
+
+
+def write_cgm(path):
+    times = pd.date_range('2020-07-01', periods=2000, freq='5min')
+    glucose = np.where(np.arange(2000) % 97 == 0, np.nan, 100 + np.arange(2000) % 50)
+    pd.DataFrame({'DAY': times.strftime('%d.%m.%Y'), 'TIME': times.strftime('%H:%M'), 'UDT_CGMS': glucose,
+                  'BG_LEVEL': np.nan, 'REMARK': np.nan}).to_csv(path, sep=';', index=False)
+    return times, glucose
+
+
+# Reading in small chunks keeps exactly the readings of the window a whole file read would
+def test_stream_source_against_whole_read(tmp_path):
+    path = str(tmp_path / 'cgm.csv')
+    times, glucose = write_cgm(path)
+    start, end = pd.Timestamp('2020-07-02 03:00'), pd.Timestamp('2020-07-04')
+    df = stream_source(path, 'CGMData', start, end, 128, TimestampParser())
+
+    expected = pd.DataFrame({'Datetime': times, 'UDT_CGMS': glucose}).dropna()
+    expected = expected.loc[(expected['Datetime'] >= start) & (expected['Datetime'] <= end)]
+    assert df.columns.tolist() == ['Date', 'Time', 'UDT_CGMS', 'Datetime']
+    assert df['UDT_CGMS'].dtype == 'float32'
+    assert df['Datetime'].tolist() == expected['Datetime'].tolist()
+    assert df['UDT_CGMS'].tolist() == expected['UDT_CGMS'].tolist()
+    assert (df['Date'] + df['Time'] == df['Datetime']).all()
+
+
+def cleaned(columns, periods=4):
+    times = pd.Series(pd.date_range('2020-07-07 08:00', periods=periods, freq='3h'))
+    return pd.DataFrame(dict({'Date': times.dt.normalize(), 'Time': times - times.dt.normalize()}, **columns, Datetime=times))
+
+
+# Only the timestamps and the declared columns are kept, renamed, typed and categorized as declared
+def test_event_table_columns_and_dtypes():
+    meals = cleaned({'Group': ['Breakfast', 'Lunch', 'Lunch', 'Dinner'], 'Food Name': ['Oats', 'Rice', 'Rice', 'Fish'],
+                     'Amount': ['1 cup'] * 4, 'Energy (kcal)': ['300', '450', 'x', '500'], 'Carbs (g)': [50, 80, 80, 0],
+                     'Net Carbs (g)': [45.0, 78.0, 78.0, 0.0], 'Fiber (g)': [5, 2, 2, 0]})
+    table = event_table(meals, 'mealData')
+    assert table.columns.tolist() == ['Date', 'Time', 'Group', 'Food Name', 'Amount', 'Energy (kcal)', 'Carbs (g)', 'Net Carbs (g)', 'Datetime']
+    assert table['Energy (kcal)'].dtype == 'float32' and np.isnan(table['Energy (kcal)'][2]) and table['Carbs (g)'].dtype == 'float32'
+    assert table['Food Name'].dtype == 'category' and table['Food Name'].tolist() == ['Oats', 'Rice', 'Rice', 'Fish']
+    activities = event_table(cleaned({'Activity Type': ['Running'] * 4, 'Activity Time': ['00:30:00'] * 4, 'Steps': [1] * 4}), 'ExData')
+    assert activities.columns.tolist() == ['Date', 'Time', 'Activity Type', 'Activity Time', 'Datetime']
+    biometrics = event_table(cleaned({'Metric': ['Weight'] * 4, 'Amount': [80.0] * 4, 'Unit': [np.nan] * 4}), 'BioData')
+    assert biometrics.columns.tolist() == ['Date', 'Time', 'Metric', 'Amount', 'Datetime']
+
+
+# A source with no rows in the window still has its timestamps and declared columns for the stages after it
+def test_event_table_empty_source():
+    exercise = event_table(cleaned({'Activity Type': [], 'Activity Time': [], 'Calories': []}, 0), 'ExData')
+    assert exercise.empty and exercise.columns.tolist() == ['Date', 'Time', 'Activity Type', 'Calories', 'Activity Time', 'Datetime']
+    biometrics = event_table(cleaned({'Metric': [], 'Amount': []}, 0), 'BioData')
+    assert biometrics.columns.tolist() == ['Date', 'Time', 'Datetime']
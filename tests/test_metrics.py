@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+
+from cgmmetrics import RANGE_BANDS, day_metrics, meal_metrics, rolling_meal_metrics, rolling_metrics
+
+
+def cgm(days=3, seed=4):
+    rng = np.random.default_rng(seed)
+    times = pd.date_range('2020-07-01', periods=days * 288, freq='5min')
+    glucose = np.round(120 + 50 * np.sin(np.arange(len(times)) / 15.0) + rng.normal(0, 8, len(times)))
+    return pd.DataFrame({'Datetime': times, 'UDT_CGMS': glucose}).sample(frac=1, random_state=seed)
+
+
+def trailing_mean(values, window):
+    return np.array([values[max(0, i - window + 1):i + 1].mean() for i in range(len(values))])
+
+
+# MAGE of one day the plain way: peaks and nadirs between the crossings of the 5 and 32 sample moving
+# averages, the mean of the swings between successive ones larger than the day's SD
+def reference_mage(glucose):
+    sign = np.sign(trailing_mean(glucose, 5) - trailing_mean(glucose, 32))
+    for i in range(1, len(sign)):
+        if sign[i] == 0:
+            sign[i] = sign[i - 1]
+    extremes, start = [], 0
+    for i in range(1, len(sign) + 1):
+        if i == len(sign) or sign[i] != sign[start]:
+            if sign[start] != 0:
+                extremes.append(glucose[start:i].max() if sign[start] > 0 else glucose[start:i].min())
+            start = i
+    swings = np.abs(np.diff(extremes))
+    swings = swings[swings > glucose.std()]
+    return swings.mean() if len(swings) else np.nan
+
+
+def reference_day(glucose):
+    very_low, low, high, very_high = RANGE_BANDS
+    mean = glucose.mean()
+    return {'Samples': len(glucose), 'Mean': mean, 'SD': glucose.std(), 'CV %': 100 * glucose.std() / mean,
+            'GMI %': 3.31 + 0.02392 * mean, 'MAGE': reference_mage(glucose),
+            'TBR <54 %': 100 * np.mean(glucose < very_low), 'TBR 54-70 %': 100 * np.mean((glucose >= very_low) & (glucose < low)),
+            'TIR 70-140 %': 100 * np.mean((glucose >= low) & (glucose <= high)),
+            'TAR 140-180 %': 100 * np.mean((glucose > high) & (glucose <= very_high)), 'TAR >180 %': 100 * np.mean(glucose > very_high)}
+
+
+def test_day_metrics_against_reference():
+    df = cgm()
+    metrics = day_metrics(df)
+    for day, readings in df.sort_values('Datetime').groupby(df['Datetime'].dt.normalize()):
+        expected = reference_day(readings['UDT_CGMS'].values)
+        for column, value in expected.items():
+            assert np.isclose(metrics.loc[day, column], round(value, 2), atol=0.011), column
+
+
+# Rolling metrics pool the readings of the window's days
+def test_rolling_metrics_pool_readings():
+    df = cgm(days=4)
+    rolled = rolling_metrics(df, days=2)
+    for day in rolled.index[1:]:
+        readings = df.loc[(df['Datetime'] >= day - pd.Timedelta(days=1)) & (df['Datetime'] < day + pd.Timedelta(days=1)), 'UDT_CGMS'].values
+        expected = reference_day(readings)
+        for column in ('Samples', 'Mean', 'SD', 'GMI %', 'TIR 70-140 %'):
+            assert np.isclose(rolled.loc[day, column], round(expected[column], 2), atol=0.011), column
+
+
+def test_meal_metrics_against_trapezoid():
+    rng = np.random.default_rng(5)
+    lengths = [25, 37, 1]
+    responses = pd.DataFrame({'Event': np.repeat([0, 2, 5], lengths),
+                              'Minutes': np.concatenate([np.arange(length) * 5.0 for length in lengths]),
+                              'UDT_CGMS': np.round(rng.normal(120, 25, sum(lengths)))})
+    metrics = meal_metrics(responses)
+    assert metrics.index.tolist() == [0, 2, 5]
+    for event, response in responses.groupby('Event'):
+        glucose, minutes = response['UDT_CGMS'].values, response['Minutes'].values
+        above = np.clip(glucose - glucose[0], 0, None)
+        assert np.isclose(metrics.loc[event, 'iAUC'], round(np.trapz(above, minutes), 1))
+        assert metrics.loc[event, 'Peak'] == glucose.max() and metrics.loc[event, 'Delta'] == glucose.max() - glucose[0]
+        assert metrics.loc[event, 'Time to Peak'] == minutes[np.argmax(glucose)]
+
+
+def test_rolling_meal_metrics_average_the_window():
+    times = pd.to_datetime(['2020-07-01 08:00', '2020-07-05 12:00', '2020-07-03 08:00', '2020-07-09 07:00'])
+    metrics = pd.DataFrame({'Baseline': 90.0, 'Peak': [150.0, 130.0, 170.0, 110.0], 'Delta': 0.0, 'Time to Peak': 45.0,
+                            'iAUC': [1000.0, 3000.0, 2000.0, 500.0]}, index=pd.Index([0, 1, 2, 3], name='Event'))
+    rolled = rolling_meal_metrics(metrics, times, days=7)
+    for event, time in enumerate(times):
+        inside = (times > time - pd.Timedelta(days=7)) & (times <= time)
+        assert np.isclose(rolled.loc[event, 'iAUC'], round(metrics.loc[inside, 'iAUC'].mean(), 1))
+        assert np.isclose(rolled.loc[event, 'Peak'], round(metrics.loc[inside, 'Peak'].mean(), 1))
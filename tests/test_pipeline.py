@@ -0,0 +1,67 @@
+import threading
+import time
+
+import pytest
+
+from cgmpipeline import Pipeline, Stage
+
+
+def diamond(log, workers=1, when=None):
+    def step(name, value):
+        def run():
+            time.sleep(0.01)
+            with lock:
+                log.append(name)
+            return value
+        return run
+
+    lock = threading.Lock()
+    return Pipeline([
+        Stage('load', step('load', 1), outputs=['raw']),
+        Stage('left', step('left', 2), inputs=['raw'], outputs=['a']),
+        Stage('right', step('right', 3), inputs=['raw'], outputs=['b'], when=when),
+        Stage('join', step('join', None), inputs=['a', 'b']),
+        Stage('unused', step('unused', 4), outputs=['c']),
+    ], workers=workers)
+
+
+# Only the stages the targets need are planned, every one after the stages producing its inputs
+def test_plan_dependency_order():
+    order = diamond([]).plan(['join'])
+    assert sorted(order) == ['join', 'left', 'load', 'right']
+    assert order[0] == 'load' and order[-1] == 'join'
+
+
+def test_plan_rejects_cycles_and_unknown_stages():
+    with pytest.raises(ValueError, match="Unknown stage"):
+        diamond([]).plan(['missing'])
+    loop = Pipeline([Stage('x', lambda: 1, inputs=['y'], outputs=['x']), Stage('y', lambda: 1, inputs=['x'], outputs=['y'])])
+    with pytest.raises(ValueError, match="depends on itself"):
+        loop.plan(['x'])
+    with pytest.raises(ValueError, match="produced by both"):
+        Pipeline([Stage('x', lambda: 1, outputs=['x']), Stage('y', lambda: 1, outputs=['x'])])
+
+
+# A value asked for twice, or by run after value, is computed once
+def test_value_is_memoized():
+    log = []
+    pipeline = diamond(log)
+    assert pipeline.value('a') == 2 and pipeline.value('a') == 2
+    pipeline.run(['join'])
+    assert log.count('load') == 1 and log.count('left') == 1
+
+
+def test_when_skips_stage():
+    log = []
+    pipeline = diamond(log, when=lambda: False)
+    pipeline.run(['join'])
+    assert 'right' not in log and pipeline.results['b'] is None and 'join' in log
+
+
+# With several workers every stage still starts only after the stages it depends on finished
+def test_parallel_run_respects_dependencies():
+    log = []
+    diamond(log, workers=3).run(['join', 'unused'])
+    assert sorted(log) == ['join', 'left', 'load', 'right', 'unused']
+    assert log.index('load') < min(log.index('left'), log.index('right'))
+    assert log.index('join') > max(log.index('left'), log.index('right'))
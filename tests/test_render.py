@@ -0,0 +1,42 @@
+import os
+import numpy as np
+import pandas as pd
+from bokeh.models import GlyphRenderer, MultiLine, PreText
+
+from cgmrender import RenderScheduler, multiplot_page
+
+
+def text_page(item):
+    if item['title'] == 'broken':
+        raise ValueError('no data')
+    return PreText(text=item['title'])
+
+
+# Every page is written once whether rendered in process or on a pool, a failing page is reported and skipped
+def test_scheduler_writes_every_page(tmp_path):
+    for workers in (1, 2):
+        items = [{'path': str(tmp_path / (str(workers) + '-' + str(n) + '.html')), 'title': 'page ' + str(n)} for n in range(5)]
+        items.append({'path': str(tmp_path / (str(workers) + '-broken.html')), 'title': 'broken'})
+        written, failed = RenderScheduler(workers).run('pages', text_page, items)
+        assert sorted(path for path, seconds in written) == sorted(item['path'] for item in items[:5])
+        assert [path for path, error in failed] == [items[5]['path']]
+        assert all(os.path.isfile(item['path']) for item in items[:5]) and not os.path.exists(items[5]['path'])
+        with open(items[0]['path']) as stream:
+            assert 'page 0' in stream.read()
+
+
+# Every meal is one row of a single shared source, each legend entry draws exactly the rows of its group
+def test_multiplot_shares_one_source():
+    foods = ['Rice, white', 'Apple', 'Rice, brown', 'Bread', 'Apple']
+    responses = pd.DataFrame({'xs': [np.arange(n) * 60000.0 for n in (10, 12, 10, 11, 13)],
+                              'ys': [np.linspace(0, n, n) for n in (10, 12, 10, 11, 13)],
+                              'Food': foods, 'Group': [food.split(', ')[0] for food in foods],
+                              'xname': ['2020-07-07'] * 5, 'yname': ['08:00:00'] * 5,
+                              'bg': ['140'] * 5, 'GD': ['40'] * 5, 'cal': ['300'] * 5, 'carb': ['50'] * 5})
+    p = multiplot_page({'responses': responses})
+    lines = [r for r in p.renderers if isinstance(r, GlyphRenderer) and isinstance(r.glyph, MultiLine)]
+    assert len({id(r.data_source) for r in lines}) == 1
+    source = lines[0].data_source
+    assert list(source.data['Food']) == foods and [len(ys) for ys in source.data['ys']] == [10, 12, 10, 11, 13]
+    groups = {item.label['value']: item.renderers[0].view.filters[0].indices for item in p.legend[0].items}
+    assert groups == {'Rice': [0, 2], 'Apple': [1, 4], 'Bread': [3]}
@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+
+from cgmresponse import extract_responses, window_join
+
+
+def cgm():
+    times = pd.date_range('2020-07-01 06:00', periods=60, freq='5min')
+    return pd.DataFrame({'Datetime': times, 'UDT_CGMS': 90 + np.arange(60.0)})
+
+
+# The sorted join pairs every event with exactly the rows a per event filter finds
+def test_window_join_against_filter():
+    other = cgm()
+    events = pd.DataFrame({'Datetime': pd.to_datetime(['2020-07-01 06:00', '2020-07-01 06:12', '2020-07-01 10:50', '2020-07-01 12:00'])})
+    joined = window_join(events, other, pd.Timedelta(minutes=30), lead=pd.Timedelta(minutes=5))
+    expected = [(event, row) for event, start in enumerate(events['Datetime'] - pd.Timedelta(minutes=5))
+                for row, time in enumerate(other['Datetime']) if start <= time <= start + pd.Timedelta(minutes=30)]
+    assert list(zip(joined['Event'], joined['Row'])) == expected
+
+
+# A missing event time or length gives an empty window instead of one running to the end of the data
+def test_missing_event_time_is_empty():
+    other = cgm()
+    events = pd.DataFrame({'Datetime': pd.to_datetime(['2020-07-01 07:00', None, '2020-07-01 08:00'])})
+    windows = pd.to_timedelta(['00:20:00', '00:20:00', None])
+    joined = window_join(events, other, windows)
+    assert set(joined['Event']) == {0}
+    assert len(joined) == 5
+    responses = extract_responses(events, other, windows)
+    assert responses['Event'].unique().tolist() == [0]
+    assert responses['ZeroedCGMS'].tolist() == [0, 1, 2, 3, 4]
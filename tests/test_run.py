@@ -0,0 +1,40 @@
+import os
+import json
+import matplotlib
+
+from benchmark import benchmark_parameters
+from cgmprocessing import CGMProcessing
+from cgmsynth import generate
+
+matplotlib.use('Agg')
+
+
+def run(tmp_path, stages, **settings):
+    files = generate(str(tmp_path / 'data'), 3)
+    output = str(tmp_path / 'output')
+    os.makedirs(output)
+    return CGMProcessing(dict(benchmark_parameters(files, output, 3, stages, 1), **settings)).run(), output
+
+
+# A headless run lists every file it wrote in manifest.json, and only those
+def test_headless_manifest(tmp_path):
+    manifest, output = run(tmp_path, ['bg_heatmap', 'bg_metrics', 'bg_daily_overview'])
+    with open(os.path.join(output, 'manifest.json')) as stream:
+        assert json.load(stream)['files'] == manifest['files']
+    listed = {entry['file'] for entry in manifest['files']}
+    written = {os.path.join(folder, name) for folder, dirs, names in os.walk(output) for name in names if name.endswith(('.html', '.csv'))}
+    assert manifest['failed'] == [] and manifest['error'] is None
+    assert listed == written
+    assert sum(path.endswith('.html') and 'Daily Overview' in path for path in listed) == 3
+
+
+# Every stage gets a record, stages run inside another one name it as their parent, rows and memory are counted
+def test_run_report_stages(tmp_path):
+    manifest, output = run(tmp_path, ['bg_heatmap'], traceMemory=True)
+    records = {record['stage']: record for record in manifest['stages']}
+    assert {'capture_data', 'clean_data', 'fill_missing_CGM_data', 'period_cgm', 'bg_heatmap', 'deep_analysis'} <= set(records)
+    assert records['fill_missing_CGM_data']['parent'] == 'clean_data' and records['clean_data']['parent'] is None
+    assert records['clean_data']['seconds'] >= records['fill_missing_CGM_data']['seconds']
+    assert records['capture_data']['rows'] == sum(count for item, count in records['capture_data']['items'].items() if item.endswith(' rows'))
+    assert records['bg_heatmap']['items']['days'] == 3 and records['bg_heatmap']['items']['files written'] == 1
+    assert all(record['peak_mb'] > 0 for record in manifest['stages'])
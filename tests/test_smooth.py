@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+from scipy.signal import savgol_filter
+
+from cgmsmooth import check_smoothing, smooth_windows
+
+
+# The batched filter gives every window what filtering it on its own gives
+@pytest.mark.parametrize('window, order', [(0, 9), (7, 2), (41, 3)])
+def test_smooth_windows_against_single_windows(window, order):
+    rng = np.random.default_rng(3)
+    lengths = [37, 2, 37, 12, 25, 37]
+    ids = np.repeat(np.arange(len(lengths)), lengths)
+    values = 100 + rng.normal(0, 10, len(ids)).cumsum()
+    smoothed = smooth_windows(values, ids, window, order)
+    for event, length in enumerate(lengths):
+        part = values[ids == event]
+        if length < 3:
+            expected = part
+        else:
+            span = length - 1 if (length - 1) % 2 else length - 2
+            window_length = span if not window or window > span else window
+            expected = savgol_filter(part, window_length, min(order, window_length - 1))
+        assert np.allclose(smoothed[ids == event], expected)
+
+
+def test_check_smoothing():
+    assert check_smoothing(0, 9) == (0, 9)
+    for window, order in ((4, 2), (5, 5), (-1, 2), (5, True)):
+        with pytest.raises(ValueError):
+            check_smoothing(window, order)
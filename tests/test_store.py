@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+from cgmstore import HealthStore
+
+
+def events(start, periods):
+    times = pd.date_range(start, periods=periods, freq='6h')
+    return pd.DataFrame({'Date': times.normalize(), 'Time': times - times.normalize(), 'Datetime': times,
+                         'Food Name': pd.Categorical(['Rice', None, 'Apple', 'Rice'] * (periods // 4)),
+                         'Carbs (g)': np.arange(periods, dtype=float), 'Servings': np.arange(periods, dtype=np.int64),
+                         'Note': ['a', None] * (periods // 2),
+                         'Ended': pd.Series(times + pd.Timedelta(minutes=30)).where(np.arange(periods) % 3 > 0).values})
+
+
+# What is saved is read back with the same values and dtypes, missing values and timestamps included
+def test_round_trip(tmp_path):
+    store = HealthStore(str(tmp_path / 'h.sqlite'))
+    df = events('2020-07-07', 16)
+    assert store.save('mealData', df, '2020-07-07', '2020-07-10 23:59') == 16
+    back = store.query('mealData')
+    pd.testing.assert_frame_equal(back.reset_index(drop=True), df)
+    assert back['Ended'].isna().sum() == df['Ended'].isna().sum() > 0
+    assert store.data_sets() == ['mealData']
+
+
+# Saving a range replaces only the rows of that range, a query reads only the rows of its range
+def test_save_replaces_range(tmp_path):
+    store = HealthStore(str(tmp_path / 'h.sqlite'))
+    store.save('mealData', events('2020-07-07', 16), '2020-07-07', '2020-07-10 23:59')
+    newer = events('2020-07-08', 4).assign(**{'Carbs (g)': 100.0})
+    store.save('mealData', newer, '2020-07-08', '2020-07-08 23:59')
+    back = store.query('mealData')
+    day = back['Datetime'].dt.strftime('%Y-%m-%d')
+    assert len(back) == 16 and (back.loc[day == '2020-07-08', 'Carbs (g)'] == 100).all()
+    assert (back.loc[day != '2020-07-08', 'Carbs (g)'] < 100).all()
+    ranged = store.query('mealData', '2020-07-09', '2020-07-10', 'Carbs (g)', 9)
+    assert list(ranged['Carbs (g)']) == [9.0, 10.0, 11.0, 12.0]
+    assert store.query('CGMData').empty
+
+
+def test_source_fingerprint(tmp_path):
+    path = str(tmp_path / 'h.sqlite')
+    store = HealthStore(path)
+    assert store.source('mealData') is None
+    fingerprint = {'path': 'servings.csv', 'size': 10, 'hash': 'abc', 'start': '2020-07-07'}
+    store.save_source('mealData', events('2020-07-07', 4), '2020-07-07', '2020-07-07 23:59', fingerprint)
+    store.close()
+    store = HealthStore(path)
+    assert store.source('mealData') == fingerprint and len(store.query('mealData')) == 4
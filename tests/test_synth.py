@@ -0,0 +1,14 @@
+import filecmp
+
+from cgmsynth import generate
+
+
+# The same seed always writes the same files, another seed different ones
+def test_generate_is_deterministic(tmp_path):
+    first = generate(str(tmp_path / 'a'), 5, seed=3)
+    second = generate(str(tmp_path / 'b'), 5, seed=3)
+    other = generate(str(tmp_path / 'c'), 5, seed=4)
+    assert sorted(first) == sorted(second) == sorted(other)
+    for key in first:
+        assert filecmp.cmp(first[key], second[key], shallow=False)
+    assert not filecmp.cmp(first['CGMData'], other['CGMData'], shallow=False)
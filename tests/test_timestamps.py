@@ -0,0 +1,11 @@
+import pandas as pd
+
+from cgmtime import TimestampParser
+
+
+# Values past the sample in another layout are parsed with the next candidate instead of becoming NaT
+def test_layout_change_after_sample():
+    values = pd.Series(['2020-07-01', '2020-07-02', '03.07.2020', None])
+    stamps = TimestampParser(sample_size=2).parse('test', 'Date', values)
+    assert stamps.tolist()[:3] == [pd.Timestamp('2020-07-01'), pd.Timestamp('2020-07-02'), pd.Timestamp('2020-07-03')]
+    assert pd.isna(stamps.iloc[3])